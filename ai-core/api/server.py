@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import os
 import time
+import threading
 import yaml
 from typing import Dict, Any, Optional, List, Literal
 
@@ -16,8 +17,13 @@ from builder.query_builder import LLMQueryBuilder            # uses Ollama HTTP
 from connectors.sql_connector import SQLConnector
 from connectors.rest_connector import RESTConnector
 from connectors.files_connector import FilesConnector
+from connectors.tabular_connector import TabularConnector
+from connectors.registry import ConnectorRegistry
+from connectors import sql_cache, rest_cache
 from llm_interface.llm_client import LLMClient               # uses Ollama HTTP API
 
+from indexer.embeddings import registry_status
+
 # --- Governance (trace/audit) ---
 from governance.trace_logger import (
     init_logger,
@@ -64,6 +70,9 @@ if "sql_connector" in _conf:
     _connectors["sql_connector"] = SQLConnector("sql_connector", _conf["sql_connector"])
 if "rest_connector" in _conf:
     _connectors["rest_connector"] = RESTConnector("rest_connector", _conf["rest_connector"])
+for _name, _spec in _conf.items():
+    if str(_spec.get("type", "")).lower() == "tabular":
+        _connectors[_name] = TabularConnector(_name, _spec)
 
 # LLM-powered query builder (Ollama by default)
 _builder = LLMQueryBuilder(
@@ -87,7 +96,7 @@ _llm = LLMClient(
 
 class ConnectorSpec(BaseModel):
     name: str
-    type: Literal["sql", "rest", "files"]
+    type: Literal["sql", "rest", "files", "tabular"]
     config: Dict[str, Any]
 
 class QueryRequest(BaseModel):
@@ -108,25 +117,43 @@ class QueryResponse(BaseModel):
 # Helpers
 # ===============================
 
+_CONNECTOR_CLASSES = {
+    "sql": SQLConnector,
+    "rest": RESTConnector,
+    "files": FilesConnector,
+    "tabular": TabularConnector,
+}
+
+# Per-request connectors, reused across requests with the same (type, config)
+_registry = ConnectorRegistry()
+
+
 def build_connectors_from_specs(specs: List[ConnectorSpec]) -> Dict[str, Any]:
     """
     Build a transient connectors map from request-provided specs.
-    Does NOT mutate global _connectors.
+    Does NOT mutate global _connectors; instances are borrowed from the
+    registry, so a repeated spec reuses its engine pool / ingested corpus.
+    Hand the map to release_connectors() when the request is done.
     """
     tmp: Dict[str, Any] = {}
-    for s in specs:
-        t = s.type.lower()
-        if t == "sql":
-            tmp[s.name] = SQLConnector(s.name, s.config)
-        elif t == "rest":
-            tmp[s.name] = RESTConnector(s.name, s.config)
-        elif t == "files":
-            tmp[s.name] = FilesConnector(s.name, s.config)
-        else:
-            raise ValueError(f"Unsupported connector type: {s.type}")
+    try:
+        for s in specs:
+            t = s.type.lower()
+            cls = _CONNECTOR_CLASSES.get(t)
+            if cls is None:
+                raise ValueError(f"Unsupported connector type: {s.type}")
+            tmp[s.name] = _registry.get_or_create(t, s.config, lambda cls=cls, s=s: cls(s.name, s.config))
+    except Exception:
+        release_connectors(tmp)
+        raise
     return tmp
 
 
+def release_connectors(connectors: Dict[str, Any] | None):
+    for conn in (connectors or {}).values():
+        _registry.release(conn)
+
+
 # ===============================
 # Lifecycle
 # ===============================
@@ -138,6 +165,32 @@ def _startup():
     trace_path = os.getenv("TRACE_PATH", "data/traces.db" if trace_backend == "sqlite" else "data/traces.jsonl")
     init_logger(backend=trace_backend, path=trace_path)
 
+    # Stream file changes into the live index for connectors with `watch: true`
+    for name, conn in _connectors.items():
+        if getattr(conn, "watch", False):
+            _orch.indexer.watch_files(name, conn, conn.watch_interval_s)
+
+    # Load the embedding model off the request path; /ready reports when it is warm
+    if os.getenv("CB_EMBED_WARMUP", "1") == "1":
+        threading.Thread(target=_warm_up_embedder, name="embed-warmup", daemon=True).start()
+
+
+_warmup_error: Optional[str] = None
+
+def _warm_up_embedder():
+    global _warmup_error
+    try:
+        _orch.indexer.embedder.warm_up()
+    except Exception as e:
+        _warmup_error = f"{type(e).__name__}: {e}"
+        print(f"[server] Embedding warm-up failed: {_warmup_error}")
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    _orch.indexer.stop_watching()
+    _registry.close_all()
+
 
 # ===============================
 # Routes
@@ -147,6 +200,29 @@ def _startup():
 async def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def ready():
+    """200 once the embedding model is loaded, 503 while it is still warming up."""
+    warm = _orch.indexer.embedder.is_loaded
+    body = {"status": "ready" if warm else "warming", "models": registry_status()}
+    if _warmup_error and not warm:
+        body["error"] = _warmup_error
+    if not warm:
+        raise HTTPException(status_code=503, detail=body)
+    return body
+
+@app.get("/metrics")
+async def metrics():
+    """Embedding batcher, embedding cache, connector registry and SQL/REST result cache counters."""
+    cache = _orch.indexer.embedder.cache
+    return {
+        "embedding_batcher": _orch.indexer.batcher.stats(),
+        "embedding_cache": cache.stats() if cache is not None else None,
+        "connector_registry": _registry.stats(),
+        "sql_cache": sql_cache.get_default_cache().stats() if sql_cache.get_default_cache() else None,
+        "rest_cache": rest_cache.get_default_cache().stats() if rest_cache.get_default_cache() else None,
+    }
+
 @app.get("/schema")
 async def schema():
     """Return schemas/endpoints of all configured (YAML) connectors."""
@@ -175,9 +251,9 @@ async def query(req: QueryRequest, request: Request):
     
     print("Received query request:", req)
 
+    connectors_override = None
     try:
         # Per-request connector override (optional; no global mutation)
-        connectors_override = None
         if req.connectors:
             print(f"[API] request provided connectors: {[c.name for c in req.connectors]}")
             connectors_override = build_connectors_from_specs(req.connectors)
@@ -212,6 +288,7 @@ async def query(req: QueryRequest, request: Request):
             "model": os.getenv("OLLAMA_MODEL", "llama3"),
             "answer": ans.get("answer", ""),
             "elapsed_ms": elapsed_ms,
+            "cache": pack.get("cache"),
         })
 
         return QueryResponse(
@@ -226,6 +303,17 @@ async def query(req: QueryRequest, request: Request):
     except Exception as e:
         # Surface a friendly error to the client; logs are in the server console
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
+    finally:
+        release_connectors(connectors_override)
+
+
+@app.post("/index/reload")
+async def reload_index():
+    """Swap in the current corpus snapshot (e.g. after `python -m indexer.build_snapshot`)."""
+    loaded = _orch.indexer.reload_snapshot()
+    if not loaded:
+        raise HTTPException(status_code=404, detail="No snapshot found")
+    return {"status": "reloaded", "docs": len(_orch.indexer.store)}
 
 
 @app.get("/trace/{trace_id}")
@@ -0,0 +1,139 @@
+# benchmarks/ann_recall.py
+"""
+Recall-vs-latency report for the FaissStore ANN backends.
+
+Builds each backend over the same vectors, sweeps its query-time knob
+(efSearch for hnsw, nprobe for ivf/ivfpq) and reports recall@k against the
+exact flat index together with per-query latency. Use it to pick
+CB_FAISS_EF_SEARCH / CB_FAISS_NPROBE from data.
+
+Usage:
+    python -m benchmarks.ann_recall --emb data/corpus_emb.npy --out report.md
+    python -m benchmarks.ann_recall --corpus                # embed files_connector docs
+    python -m benchmarks.ann_recall --synthetic 200000      # clustered random vectors
+"""
+
+import argparse
+import time
+import numpy as np
+import yaml
+
+from indexer.storage_faiss import build_index, set_search_params
+
+EF_SEARCH_GRID = [16, 32, 64, 128, 256]
+NPROBE_GRID = [1, 4, 8, 16, 32, 64]
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.ascontiguousarray(x, dtype="float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
+    return x
+
+
+def synthetic_vectors(n: int, dim: int = 384, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors; closer to real text embeddings than pure noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    x = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    return _normalize(x)
+
+
+def corpus_vectors(connectors_yaml: str = "connectors/connectors.yaml") -> np.ndarray:
+    """Embed every chunk of the configured files_connector."""
+    from connectors.files_connector import FilesConnector
+    from indexer.embeddings import EmbeddingModel
+
+    conf = yaml.safe_load(open(connectors_yaml, "r"))["connectors"]["files_connector"]
+    rows = FilesConnector("files_connector", conf).list_all()
+    return EmbeddingModel().embed([r["text"] for r in rows])
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / float(truth.shape[0] * k)
+
+
+def _timed_search(index, xq: np.ndarray, k: int):
+    t0 = time.perf_counter()
+    # one query at a time, like ContextIndexer does per request
+    found = np.vstack([index.search(xq[i:i + 1], k)[1] for i in range(xq.shape[0])])
+    ms = (time.perf_counter() - t0) * 1000.0 / xq.shape[0]
+    return found, ms
+
+
+def run(xb: np.ndarray, n_queries: int = 500, k: int = 10, seed: int = 1) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    dim = xb.shape[1]
+    # queries: perturbed corpus points (a question lands near, not on, its answer)
+    picks = rng.choice(xb.shape[0], size=min(n_queries, xb.shape[0]), replace=False)
+    xq = _normalize(xb[picks] + 0.3 * rng.standard_normal((len(picks), dim)).astype("float32"))
+
+    rows = []
+    flat = build_index("flat", dim)
+    flat.add(xb)
+    truth, flat_ms = _timed_search(flat, xq, k)
+    rows.append({"backend": "flat", "param": "-", "recall": 1.0, "ms": flat_ms, "build_s": 0.0})
+
+    for kind, knob, grid in (("hnsw", "efSearch", EF_SEARCH_GRID),
+                             ("ivf", "nprobe", NPROBE_GRID),
+                             ("ivfpq", "nprobe", NPROBE_GRID)):
+        t0 = time.perf_counter()
+        try:
+            index = build_index(kind, dim, xb)
+        except ValueError as e:
+            print(f"[ann_recall] skip {kind}: {e}")
+            continue
+        index.add(xb)
+        build_s = time.perf_counter() - t0
+        for v in grid:
+            if knob == "efSearch":
+                set_search_params(index, ef_search=v)
+            else:
+                set_search_params(index, nprobe=v)
+            found, ms = _timed_search(index, xq, k)
+            rows.append({"backend": kind, "param": f"{knob}={v}", "recall": _recall(found, truth),
+                         "ms": ms, "build_s": build_s})
+    return rows
+
+
+def to_markdown(rows: list[dict], n: int, dim: int, k: int) -> str:
+    lines = [
+        f"# ANN recall vs latency (n={n}, dim={dim}, recall@{k})",
+        "",
+        "| backend | param | recall | ms/query | build s |",
+        "|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(f"| {r['backend']} | {r['param']} | {r['recall']:.3f} | {r['ms']:.3f} | {r['build_s']:.1f} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--emb", help="path to an (n, dim) float32 .npy of corpus embeddings")
+    src.add_argument("--corpus", action="store_true", help="embed the files_connector corpus")
+    src.add_argument("--synthetic", type=int, default=100000, help="number of synthetic vectors")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--out", help="write the markdown report here")
+    args = ap.parse_args()
+
+    if args.emb:
+        xb = _normalize(np.load(args.emb))
+    elif args.corpus:
+        xb = corpus_vectors()
+    else:
+        xb = synthetic_vectors(args.synthetic)
+
+    report = to_markdown(run(xb, args.queries, args.k), xb.shape[0], xb.shape[1], args.k)
+    print(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
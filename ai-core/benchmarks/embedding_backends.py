@@ -0,0 +1,118 @@
+# benchmarks/embedding_backends.py
+"""
+Throughput and cosine drift of the EmbeddingModel backends vs. PyTorch fp32.
+
+Embeds the same texts with every backend, reports load time, texts/second
+and the cosine similarity of each vector to the torch reference (mean, p1,
+min), plus how often the top-10 neighbours of a query sample stay the same.
+
+Usage:
+    python -m benchmarks.embedding_backends                     # files_connector corpus
+    python -m benchmarks.embedding_backends --texts lines.txt   # one text per line
+    python -m benchmarks.embedding_backends --backends torch onnx-int8 --out report.md
+"""
+
+import argparse
+import time
+import numpy as np
+import yaml
+
+from indexer.embeddings import BACKENDS, DEFAULT_MODEL, load_sentence_transformer
+
+
+def corpus_texts(connectors_yaml: str = "connectors/connectors.yaml") -> list[str]:
+    from connectors.files_connector import FilesConnector
+
+    conf = yaml.safe_load(open(connectors_yaml, "r"))["connectors"]["files_connector"]
+    return [r["text"] for r in FilesConnector("files_connector", conf).list_all()]
+
+
+def _encode(model, texts, batch_size: int) -> np.ndarray:
+    emb = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return np.asarray(emb, dtype="float32")
+
+
+def _topk_overlap(ref: np.ndarray, emb: np.ndarray, k: int = 10, n_queries: int = 200) -> float:
+    q = np.arange(min(n_queries, ref.shape[0]))
+    k = min(k, ref.shape[0])
+    ref_top = np.argsort(-(ref[q] @ ref.T), axis=1)[:, :k]
+    emb_top = np.argsort(-(emb[q] @ emb.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, emb_top)]))
+
+
+def run(texts: list[str], backends: list[str], model_name: str = DEFAULT_MODEL,
+        batch_size: int = 64, repeats: int = 2) -> list[dict]:
+    rows, ref = [], None
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        t0 = time.perf_counter()
+        try:
+            model = load_sentence_transformer(model_name, backend)
+        except Exception as e:
+            print(f"[embedding_backends] skip {backend}: {type(e).__name__}: {e}")
+            continue
+        load_s = time.perf_counter() - t0
+
+        _encode(model, texts[:batch_size], batch_size)  # warm-up
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            emb = _encode(model, texts, batch_size)
+            best = min(best, time.perf_counter() - t0)
+
+        if ref is None:
+            ref = emb
+        cos = np.sum(ref * emb, axis=1)
+        rows.append({
+            "backend": backend,
+            "load_s": load_s,
+            "texts_per_s": len(texts) / best,
+            "cos_mean": float(cos.mean()),
+            "cos_p1": float(np.percentile(cos, 1)),
+            "cos_min": float(cos.min()),
+            "top10_overlap": _topk_overlap(ref, emb),
+        })
+    return rows
+
+
+def to_markdown(rows: list[dict], n: int, model_name: str) -> str:
+    lines = [
+        f"# Embedding backends vs torch fp32 ({model_name}, {n} texts)",
+        "",
+        "| backend | load s | texts/s | speedup | cos mean | cos p1 | cos min | top-10 overlap |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    base = rows[0]["texts_per_s"] if rows else 1.0
+    for r in rows:
+        lines.append(
+            f"| {r['backend']} | {r['load_s']:.1f} | {r['texts_per_s']:.0f} | {r['texts_per_s'] / base:.2f}x "
+            f"| {r['cos_mean']:.5f} | {r['cos_p1']:.5f} | {r['cos_min']:.5f} | {r['top10_overlap']:.3f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--texts", help="file with one text per line (default: files_connector corpus)")
+    ap.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--limit", type=int, default=5000, help="max texts to embed")
+    ap.add_argument("--out", help="write the markdown report here")
+    args = ap.parse_args()
+
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [ln.strip() for ln in f if ln.strip()]
+    else:
+        texts = corpus_texts()
+    texts = texts[: args.limit]
+
+    report = to_markdown(run(texts, args.backends, args.model, args.batch_size), len(texts), args.model)
+    print(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/rest_client.py
+"""
+RESTConnector latency/throughput: one requests.get per call in a worker
+thread (the previous behaviour) vs the pooled clients.
+
+Paths measured:
+    requests.get    new connection per call, via asyncio.to_thread
+    session         RESTConnector.execute() (keep-alive requests.Session), via to_thread
+    httpx async     RESTConnector.execute_async() (pooled httpx.AsyncClient)
+
+Starts mock_api/rest_server.py in a uvicorn subprocess on a free port unless --base-url
+points at a running server (use a remote/TLS endpoint to see handshake
+savings; on localhost only TCP setup is saved).
+
+Usage:
+    python -m benchmarks.rest_client
+    python -m benchmarks.rest_client --requests 2000 --concurrency 1 16 64 --out report.md
+    python -m benchmarks.rest_client --base-url https://api.example.com --query "GET /items"
+"""
+
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+import statistics
+import requests
+
+from connectors.rest_connector import RESTConnector
+
+DEFAULT_QUERY = "GET /customers?region=Europe"
+
+
+def start_mock_server():
+    """Run the mock API in a separate uvicorn process; returns (base_url, process)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mock_api.rest_server:app", "--port", str(port), "--log-level", "warning"]
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while True:
+        try:
+            requests.get(base_url + "/customers", timeout=1)
+            return base_url, proc
+        except requests.ConnectionError:
+            if time.time() > deadline or proc.poll() is not None:
+                proc.kill()
+                raise RuntimeError("mock server did not start")
+            time.sleep(0.1)
+
+
+async def _round(call, n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    lat = []
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await call()
+            lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n)])
+    wall = time.perf_counter() - t0
+    return {
+        "rps": n / wall,
+        "p50_ms": statistics.median(lat) * 1000,
+        "p95_ms": statistics.quantiles(lat, n=20)[-1] * 1000 if len(lat) > 1 else lat[0] * 1000,
+    }
+
+
+async def run(args, base_url: str) -> list[dict]:
+    conn = RESTConnector("bench", {"base_url": base_url, "cache": False, "pool": {"per_host": args.per_host},
+                                   "http2": args.http2})
+    url = conn._url(args.query)
+
+    def plain_get():
+        r = requests.get(url, timeout=conn.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    paths = {
+        "requests.get": lambda: asyncio.to_thread(plain_get),
+        "session": lambda: asyncio.to_thread(conn.execute, args.query),
+        "httpx async": lambda: conn.execute_async(args.query),
+    }
+    rows = []
+    for path, call in paths.items():
+        await call()  # warm-up (opens the pooled connection)
+        for c in args.concurrency:
+            r = await _round(call, args.requests, c)
+            rows.append({"path": path, "concurrency": c, **r})
+            print(f"[rest_client] {path:13s} c={c:<4d} {r['rps']:8.0f} req/s  p50 {r['p50_ms']:.2f} ms")
+    if conn._client is not None:
+        await conn._client.aclose()
+        conn._client = None
+    conn.close()
+    return rows
+
+
+def to_markdown(rows: list[dict], args, base_url: str) -> str:
+    lines = [
+        f"# RESTConnector clients ({args.requests} requests/round against {base_url})",
+        "",
+        f"Query: `{args.query}`",
+        "",
+        "| path | concurrency | req/s | p50 ms | p95 ms |",
+        "|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(f"| {r['path']} | {r['concurrency']} | {r['rps']:.0f} | {r['p50_ms']:.2f} | {r['p95_ms']:.2f} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", help="default: start mock_api/rest_server.py in a subprocess")
+    ap.add_argument("--query", default=DEFAULT_QUERY)
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--per-host", type=int, default=10, help="per-host cap for the pooled client")
+    ap.add_argument("--http2", action="store_true")
+    ap.add_argument("--out", help="write the markdown report here")
+    args = ap.parse_args()
+
+    base_url, proc = (args.base_url, None) if args.base_url else start_mock_server()
+    try:
+        report = to_markdown(asyncio.run(run(args, base_url)), args, base_url)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    print(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
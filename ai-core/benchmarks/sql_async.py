@@ -0,0 +1,126 @@
+# benchmarks/sql_async.py
+"""
+Concurrent-request throughput of SQLConnector.execute_async(): native
+async engine vs the asyncio.to_thread fallback.
+
+Each round fires `--requests` queries with at most `--concurrency` in
+flight. `--background` adds that many blocking to_thread tasks (standing
+in for REST calls and file seeding) running alongside, so the report also
+shows how much each path delays other users of the default thread pool.
+The result cache is off, so every query reaches the database.
+
+Usage:
+    python -m benchmarks.sql_async
+    python -m benchmarks.sql_async --concurrency 8 32 128 --background 16 --out report.md
+    python -m benchmarks.sql_async --connection-string postgresql://user:pw@localhost/db --query "SELECT ..."
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+import yaml
+
+from connectors.sql_connector import SQLConnector
+
+DEFAULT_QUERY = "SELECT * FROM students WHERE gpa > 3.0"
+
+
+def _config(args, native: bool) -> dict:
+    if args.connection_string:
+        cfg = {"connection_string": args.connection_string}
+    else:
+        with open("connectors/connectors.yaml", "r", encoding="utf-8") as f:
+            cfg = dict(yaml.safe_load(f)["connectors"]["sql_connector"])
+    cfg.update({"cache": False, "async": native, "pool": {"size": args.pool_size, "max_overflow": args.pool_size}})
+    return cfg
+
+
+async def _round(conn: SQLConnector, query: str, n: int, concurrency: int, background: int,
+                 background_s: float) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    lat, bg_lat = [], []
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await conn.execute_async(query)
+            lat.append(time.perf_counter() - t0)
+
+    async def other_work():
+        # blocking work queued on the same default executor; its latency is what the SQL path costs others
+        t0 = time.perf_counter()
+        await asyncio.to_thread(time.sleep, background_s)
+        bg_lat.append(time.perf_counter() - t0 - background_s)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n)], *[other_work() for _ in range(background)])
+    wall = time.perf_counter() - t0
+    return {
+        "qps": n / wall,
+        "p50_ms": statistics.median(lat) * 1000,
+        "p95_ms": statistics.quantiles(lat, n=20)[-1] * 1000 if len(lat) > 1 else lat[0] * 1000,
+        "bg_wait_ms": statistics.mean(bg_lat) * 1000 if bg_lat else 0.0,
+    }
+
+
+async def run(args) -> list[dict]:
+    rows = []
+    for native in (False, True):
+        conn = SQLConnector("bench", _config(args, native))
+        if native and conn.async_engine is None:
+            print("[sql_async] no async driver installed (pip install aiosqlite / asyncpg); skipping native path")
+            conn.close()
+            continue
+        path = "native async" if native else "to_thread"
+        await conn.execute_async(args.query)  # open the pool / warm the page cache
+        for c in args.concurrency:
+            r = await _round(conn, args.query, args.requests, c, args.background, args.background_s)
+            rows.append({"path": path, "concurrency": c, **r})
+            print(f"[sql_async] {path:12s} c={c:<4d} {r['qps']:8.0f} q/s  p50 {r['p50_ms']:.1f} ms")
+        if conn.async_engine is not None:
+            await conn.async_engine.dispose()
+            conn.async_engine = None
+        conn.close()
+    return rows
+
+
+def to_markdown(rows: list[dict], args) -> str:
+    lines = [
+        f"# SQLConnector.execute_async: native async vs to_thread ({args.requests} requests/round, "
+        f"{args.background} background to_thread tasks)",
+        "",
+        f"Query: `{args.query}`",
+        "",
+        "| path | concurrency | q/s | p50 ms | p95 ms | background queue wait ms |",
+        "|---|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(
+            f"| {r['path']} | {r['concurrency']} | {r['qps']:.0f} | {r['p50_ms']:.1f} | {r['p95_ms']:.1f} "
+            f"| {r['bg_wait_ms']:.1f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--connection-string", help="default: sql_connector in connectors/connectors.yaml")
+    ap.add_argument("--query", default=DEFAULT_QUERY)
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    ap.add_argument("--pool-size", type=int, default=10)
+    ap.add_argument("--background", type=int, default=0, help="blocking to_thread tasks run alongside")
+    ap.add_argument("--background-s", type=float, default=0.05, help="duration of each background task")
+    ap.add_argument("--out", help="write the markdown report here")
+    args = ap.parse_args()
+
+    report = to_markdown(asyncio.run(run(args)), args)
+    print(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
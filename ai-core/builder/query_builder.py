@@ -4,6 +4,7 @@ import re
 import json
 import requests
 from builder.prompt_templates import SQL_PROMPT_TEMPLATE, REST_PROMPT_TEMPLATE
+from connectors.schema_catalog import CompiledSchema, format_schema
 
 class LLMQueryBuilder:
     """
@@ -19,18 +20,11 @@ class LLMQueryBuilder:
 
     # ---------- helpers ----------
 
-    def _read_schema(self, schema_dict: dict) -> str:
-        """Format schema dict into an LLM-friendly text block."""
-        lines = []
-        for name, details in schema_dict.items():
-            if "fields" in details:
-                fields = ", ".join(details["fields"])
-                lines.append(f"{name}({fields})")
-            elif "params" in details:
-                params = ", ".join(details["params"])
-                # REST endpoints may be keys like '/customers'; reflect that
-                lines.append(f"{name}?{params}")
-        return "\n".join(lines)
+    def _read_schema(self, schema) -> str:
+        """LLM-friendly text block for a schema dict; a CompiledSchema already carries it."""
+        if isinstance(schema, CompiledSchema):
+            return schema.text
+        return format_schema(schema)
 
     def _extract_query_text(self, raw: str, connector_type: str) -> str:
         """
@@ -142,11 +136,12 @@ class LLMQueryBuilder:
 
     # ---------- public API ----------
 
-    def build_query(self, user_query: str, schema_dict: dict, connector_type: str) -> str:
+    def build_query(self, user_query: str, schema: dict | CompiledSchema, connector_type: str) -> str:
         """
         Generate a SQL or REST query using a local LLM through Ollama.
+        `schema` is a connector's schema dict or its compiled_schema().
         """
-        schema_text = self._read_schema(schema_dict)
+        schema_text = self._read_schema(schema)
 
         if connector_type == "sql":
             system = "You write safe, read-only SQL queries (SELECT only). Output ONLY the SQL, no explanations."
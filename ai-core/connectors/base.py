@@ -1,5 +1,7 @@
 # connectors/base.py
 from abc import ABC, abstractmethod
+from typing import Set
+from connectors.schema_catalog import CompiledSchema, compile_schema
 
 class BaseConnector(ABC):
     """Abstract base class for all connectors."""
@@ -13,7 +15,30 @@ class BaseConnector(ABC):
         """Return the schema or endpoint structure."""
         pass
 
+    def compiled_schema(self) -> CompiledSchema:
+        """schema() with its prompt text and hash precomputed; rebuilt only when schema() returns a new dict."""
+        schema = self.schema()
+        compiled = getattr(self, "_compiled_schema", None)
+        if compiled is None or compiled.tables is not schema:
+            compiled = self._compiled_schema = compile_schema(schema)
+        return compiled
+
     @abstractmethod
     def execute(self, query: str):
         """Execute a validated query (SQL or REST call)."""
         pass
+
+    # the event loop only keeps weak references to tasks; hold close() tasks until they finish
+    _closing: Set = set()
+
+    def _close_on_loop(self, loop, coro):
+        """Run a cleanup coroutine as a task on the running `loop`, holding it until done."""
+        task = loop.create_task(coro)
+        BaseConnector._closing.add(task)
+        task.add_done_callback(self._closed)
+
+    def _closed(self, task):
+        BaseConnector._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            print(f"[{type(self).__name__}] {self.name}: close failed: {type(e).__name__}: {e}")
@@ -0,0 +1,75 @@
+# connectors/file_manifest.py
+"""
+Change manifest for passive file corpora: {path: {size, mtime, hash}}.
+
+scan() stats every file and only re-hashes the ones whose size or mtime
+moved, so polling a large, mostly unchanged tree is cheap. diff() turns two
+manifests into the files to re-ingest and the files that are gone.
+stat_etag() is a stat-only version tag for "has anything changed at all?".
+current_hash() lets a parser reuse a scan's hash instead of reading the
+file a second time.
+"""
+
+import os
+import hashlib
+from typing import Dict, List, Tuple
+
+_HASH_BLOCK = 1 << 20
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def current_hash(path: str, entry: dict | None = None) -> str:
+    """entry["hash"] if the file still has entry's size and mtime, else a fresh hash."""
+    if entry and entry.get("hash"):
+        st = os.stat(path)
+        if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime"):
+            return entry["hash"]
+    return file_hash(path)
+
+
+def scan(paths: List[str], previous: Dict[str, dict] | None = None) -> Dict[str, dict]:
+    """Manifest for `paths`, reusing hashes from `previous` where size and mtime match."""
+    previous = previous or {}
+    out: Dict[str, dict] = {}
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue  # vanished between walk and stat
+        entry = {"size": st.st_size, "mtime": st.st_mtime_ns}
+        old = previous.get(p)
+        if old and old.get("size") == entry["size"] and old.get("mtime") == entry["mtime"]:
+            entry["hash"] = old.get("hash")
+        else:
+            try:
+                entry["hash"] = file_hash(p)
+            except OSError:
+                continue
+        out[p] = entry
+    return out
+
+
+def stat_etag(paths: List[str]) -> str:
+    """Cheap version tag of a file set: stats only, never reads content."""
+    h = hashlib.sha1()
+    for p in sorted(paths):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        h.update(f"{p}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", errors="surrogateescape"))
+    return h.hexdigest()
+
+
+def diff(previous: Dict[str, dict], current: Dict[str, dict]) -> Tuple[List[str], List[str]]:
+    """(added or content-changed paths, deleted paths). A touch without edits is not a change."""
+    changed = [p for p, e in current.items() if (previous.get(p) or {}).get("hash") != e.get("hash")]
+    deleted = [p for p in previous if p not in current]
+    return changed, deleted
@@ -1,10 +1,16 @@
 # connectors/files_connector.py
 import os
 import re
+import time
+import signal
 import asyncio
-from typing import List, Dict, Tuple, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from connectors.base import BaseConnector
-from indexer.embeddings import EmbeddingModel
+from connectors import file_manifest, text_cache
+from connectors.text_cache import TextCache
 
 try:
     import PyPDF2
@@ -12,9 +18,10 @@ except ImportError:
     PyPDF2 = None
 
 try:
+    import numpy as np
     import pandas as pd
 except ImportError:
-    pd = None
+    np = pd = None
     
 
 try:
@@ -58,6 +65,10 @@ def _doc_line(file_path: str, loc: str, text: str) -> str:
     return f"[files] {os.path.basename(file_path)} • {loc} • {text}"
 
 
+def _rows(file_path: str, chunks: List[Tuple[str, str]]) -> List[Dict]:
+    return [{"file": file_path, "loc": loc, "text": _doc_line(file_path, loc, text)} for loc, text in chunks]
+
+
 def _ingest_txt(path: str, max_chunk_chars: int = 800) -> List[Tuple[str, str]]:
     lines = []
     try:
@@ -89,45 +100,297 @@ def _ingest_pdf(path: str, max_chunk_chars: int = 1000) -> List[Tuple[str, str]]
     return out
 
 
-def _ingest_csv(path: str, max_rows: int = 500) -> List[Tuple[str, str]]:
+_SCHEMA = {"list_all": {"description": "returns all local documents"}}
+
+# CSV ingestion defaults; override per connector under `csv:` in connectors.yaml
+CSV_DEFAULTS = {
+    "mode": "head",         # head | sample (uniform over the whole file) | group (aggregate per group_by value)
+    "max_rows": 500,        # rows (or groups) turned into docs per file
+    "max_cols": 8,          # leading columns kept
+    "max_cell_chars": 60,
+    "group_by": None,       # column for mode=group
+    "chunksize": 50000,     # rows per read in sample/group mode
+    "seed": 0,              # sample mode: fixed so the same file yields the same docs
+}
+
+
+def _format_rows(df, max_cell_chars: int) -> "pd.Series":
+    """'col=value; col=value' per row, skipping empty cells, without per-row Python loops."""
+    out = pd.Series("", index=df.index, dtype=object)
+    for c in df.columns:
+        v = df[c]
+        present = v.notna()
+        if not present.any():
+            continue
+        v = v[present].astype(str)
+        long = v.str.len() > max_cell_chars
+        if long.any():
+            v = v.where(~long, v.str[: max_cell_chars - 3] + "...")
+        out[present] = out[present] + f"{c}=" + v + "; "
+    return out.str[:-2]
+
+
+def _csv_head(path: str, usecols: list, opts: dict):
+    return pd.read_csv(path, usecols=usecols, nrows=opts["max_rows"], dtype=str)
+
+
+def _csv_sample(path: str, usecols: list, opts: dict):
+    """Bottom-k sample on random keys: uniform over all rows, one streaming pass."""
+    k = opts["max_rows"]
+    rng = np.random.default_rng(opts["seed"])
+    kept = None
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=str, chunksize=opts["chunksize"]):
+        chunk = chunk.assign(_key=rng.random(len(chunk)))
+        kept = chunk if kept is None else pd.concat([kept, chunk])
+        if len(kept) > k:
+            kept = kept.nsmallest(k, "_key")
+    if kept is None:
+        return None
+    return kept.drop(columns="_key").sort_index()
+
+
+def _csv_groups(path: str, usecols: list, opts: dict):
+    """One row per group_by value: row count plus min/mean/max of numeric columns."""
+    key = opts["group_by"]
+    cols = [c for c in usecols if c != key]
+    numeric = None  # decided once, from the first chunk, so every chunk aggregates the same columns
+    counts, filled, sums, mins, maxs = [], [], [], [], []
+    for chunk in pd.read_csv(path, usecols=[key] + cols, chunksize=opts["chunksize"]):
+        if numeric is None:
+            numeric = list(chunk[cols].select_dtypes("number").columns)
+        # a stray non-numeric cell in a later chunk becomes NaN instead of dropping the column
+        num = chunk[numeric].apply(pd.to_numeric, errors="coerce")
+        g = chunk[[key]].join(num).groupby(key, dropna=False)
+        counts.append(g.size())
+        if numeric:
+            filled.append(g.count())
+            sums.append(g.sum(min_count=1))
+            mins.append(g.min())
+            maxs.append(g.max())
+    if not counts:
+        return None
+    n = pd.concat(counts).groupby(level=0, dropna=False).sum()
+    out = pd.DataFrame({"rows": n})
+    if sums:
+        seen = pd.concat(filled).groupby(level=0, dropna=False).sum()  # non-null values per column
+        total = pd.concat(sums).groupby(level=0, dropna=False).sum(min_count=1)
+        lo = pd.concat(mins).groupby(level=0, dropna=False).min()
+        hi = pd.concat(maxs).groupby(level=0, dropna=False).max()
+        for c in numeric:
+            out[f"{c}_min"] = lo[c]
+            out[f"{c}_mean"] = (total[c] / seen[c].where(seen[c] > 0)).round(3)
+            out[f"{c}_max"] = hi[c]
+    out = out.sort_values("rows", ascending=False).head(opts["max_rows"])
+    out.index = [f"{key}={v}" for v in out.index]
+    return out
+
+
+def _ingest_csv(path: str, opts: Dict | None = None) -> List[Tuple[str, str]]:
     if pd is None:
         return []
+    opts = {**CSV_DEFAULTS, **(opts or {})}
     try:
-        df = pd.read_csv(path)
+        header = pd.read_csv(path, nrows=0).columns
+        usecols = list(header[: opts["max_cols"]])
+        mode = opts["mode"]
+        if mode == "group" and opts["group_by"] not in header:
+            mode = "sample"  # nothing to group on
+        if mode == "group":
+            df = _csv_groups(path, usecols, opts)
+            loc_fmt = "group {}"
+        else:
+            df = (_csv_sample if mode == "sample" else _csv_head)(path, usecols, opts)
+            loc_fmt = "row {}"
     except Exception:
         return []
-    lines = []
-    cols = list(df.columns)
-    for idx, row in df.head(max_rows).iterrows():
-        pairs = []
-        for c in cols[:8]:
-            v = row.get(c)
-            if pd.isna(v):
-                continue
-            v = str(v)
-            if len(v) > 60:
-                v = v[:57] + "..."
-            pairs.append(f"{c}={v}")
-        if pairs:
-            lines.append((f"row {idx}", "; ".join(pairs)))
-    return lines
+    if df is None or df.empty:
+        return []
+    lines = _format_rows(df, opts["max_cell_chars"])
+    return [(loc_fmt.format(idx), line) for idx, line in lines.items() if line]
+
+
+def _extractor_id(kind: str) -> Optional[str]:
+    """Cache tag for an extractor: bump the trailing version when chunking/cleaning changes."""
+    if kind == "pdf" and PyPDF2 is not None:
+        return f"pdf:PyPDF2-{getattr(PyPDF2, '__version__', '?')}:v1"
+    if kind == "docx" and docx is not None:
+        return f"docx:python-docx-{getattr(docx, '__version__', '?')}:v1"
+    return None  # cheap to parse (txt/csv) or extractor missing: don't cache
+
+
+def _ingest_file(path: str, text_cache_dir: str = "", csv_opts: Dict | None = None,
+                 manifest_entry: Dict | None = None) -> List[Tuple[str, str]]:
+    """
+    (loc, text) chunks of one file, by extension; [] if unreadable.
+    `manifest_entry` (from file_manifest.scan) saves re-hashing a file the scan just hashed.
+    """
+    kind = path.lower().rsplit(".", 1)[-1]
+    extractor = _extractor_id(kind) if text_cache_dir else None
+    if extractor:
+        cache = TextCache(text_cache_dir)
+        try:
+            content_hash = file_manifest.current_hash(path, manifest_entry)
+        except OSError:
+            return []
+        cached = cache.get(content_hash, extractor)
+        if cached is not None:
+            return cached
+    try:
+        if kind == "txt":
+            chunks = _ingest_txt(path)
+        elif kind == "pdf":
+            chunks = _ingest_pdf(path)
+        elif kind == "csv":
+            chunks = _ingest_csv(path, csv_opts)
+        elif kind == "docx":
+            chunks = _ingest_docx(path)
+        else:
+            chunks = []
+    except Exception:
+        return []
+    if extractor:
+        cache.put(content_hash, extractor, chunks)
+    return chunks
+
+
+def _report_pid(pids):
+    pids.put(os.getpid())
+
+
+class _ParsePool:
+    """
+    Process pool that knows its worker PIDs, so a stuck worker can be killed.
+    Workers are spawned, not forked: parse_files runs on threads of a process
+    that also runs uvicorn, torch/faiss threads and SQLite connections, and a
+    forked child can deadlock on a lock one of those threads held.
+    """
+
+    def __init__(self, workers: int):
+        ctx = multiprocessing.get_context("spawn")
+        self._pids = ctx.SimpleQueue()  # each worker reports its PID once, at start
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                            initializer=_report_pid, initargs=(self._pids,))
+
+    def submit(self, fn, *args):
+        return self.executor.submit(fn, *args)
+
+    def kill(self):
+        """Stop the pool now; shutdown() alone would wait for the stuck worker."""
+        if hasattr(self.executor, "terminate_workers"):  # Python 3.14+
+            self.executor.terminate_workers()
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        while not self._pids.empty():
+            try:
+                os.kill(self._pids.get(), signal.SIGTERM)
+            except OSError:
+                pass  # already exited
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
 
 
-class _InMemoryFileIndex:
-    """Simple index storing docs + metas (used for list_all)."""
-    def __init__(self):
-        self.docs: List[str] = []
-        self.metas: List[Dict] = []
+def parse_files(paths: Iterable[str], workers: int = 0, timeout_s: float = 60.0,
+                text_cache_dir: str = "", csv_opts: Dict | None = None,
+                manifest: Dict[str, dict] | None = None) -> Iterator[Tuple[str, List[Tuple[str, str]]]]:
+    """
+    Yield (path, chunks) for each path, in completion order.
+
+    workers <= 1 parses in-process. Otherwise files are parsed in a process
+    pool with at most `workers` in flight; a file still running after
+    timeout_s yields [] and the pool is restarted (the stuck process is
+    killed) with the other in-flight files resubmitted. If a worker crashes,
+    the files that were in flight are retried one at a time and the one
+    that crashes on its own yields []. PDF/DOCX text is read from / written
+    to the text cache in `text_cache_dir` ("" = off), keyed by the hashes
+    in `manifest` where the file is unchanged since.
+    """
+    paths = list(paths)
+    manifest = manifest or {}
+    if workers <= 1 or len(paths) <= 1:
+        for p in paths:
+            yield p, _ingest_file(p, text_cache_dir, csv_opts, manifest.get(p))
+        return
+
+    todo = list(reversed(paths))
+    alone = set()  # in flight when a worker crashed: retried one at a time to find the culprit
+    pool = _ParsePool(workers)
+    inflight = {}  # future -> (path, deadline)
+    try:
+        while todo or inflight:
+            while todo and len(inflight) < workers:
+                if inflight and (todo[-1] in alone or any(p in alone for p, _ in inflight.values())):
+                    break
+                p = todo.pop()
+                try:
+                    fut = pool.submit(_ingest_file, p, text_cache_dir, csv_opts, manifest.get(p))
+                except BrokenProcessPool:
+                    todo.append(p)  # a worker died; the in-flight futures fail below
+                    break
+                inflight[fut] = (p, time.monotonic() + timeout_s)
+            if not inflight:
+                pool.kill()
+                pool = _ParsePool(workers)
+                continue
+
+            next_deadline = min(d for _, d in inflight.values())
+            done, _ = wait(inflight, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            crashed = []
+            for fut in done:
+                p, _ = inflight.pop(fut)
+                try:
+                    chunks = fut.result()
+                except BrokenProcessPool:
+                    crashed.append(p)
+                    continue
+                except Exception as e:
+                    print(f"[FilesConnector] Failed to parse {p}: {type(e).__name__}: {e}")
+                    chunks = []
+                yield p, chunks
+
+            if crashed:
+                # the whole pool is gone; unless one file ran alone we can't tell which one did it
+                crashed.extend(p for p, _ in inflight.values())
+                inflight.clear()
+                if len(crashed) == 1:
+                    print(f"[FilesConnector] Gave up on {crashed[0]}: its parse worker crashed")
+                    yield crashed[0], []
+                else:
+                    alone.update(crashed)
+                    todo.extend(reversed(crashed))
+                pool.kill()
+                pool = _ParsePool(workers)
+                continue
 
-    def add(self, docs: List[str], metas: List[Dict]):
-        self.docs.extend(docs)
-        self.metas.extend(metas)
+            now = time.monotonic()
+            expired = [f for f, (_, d) in inflight.items() if d <= now and not f.done()]
+            if expired:
+                for fut in expired:
+                    p, _ = inflight.pop(fut)
+                    print(f"[FilesConnector] Gave up on {p} after {timeout_s}s")
+                    yield p, []
+                # the others restart with a fresh deadline in the new pool
+                todo.extend(p for p, _ in inflight.values())
+                inflight.clear()
+                pool.kill()
+                pool = _ParsePool(workers)
+    finally:
+        if inflight:
+            pool.kill()
+        else:
+            pool.shutdown()
 
 
 class FilesConnector(BaseConnector):
     """
     Passive connector that loads and serves local TXT/PDF/CSV files.
     It is NOT queried by the LLM; all docs are pre-indexed once.
+
+    Chunks are kept per file next to a change manifest (see
+    connectors/file_manifest.py), so scan_changes()/iter_rows() let the
+    indexer re-ingest only files that were added, edited or deleted.
+    iter_rows()/iter_chunks() stream rows file by file without holding the
+    corpus, and etag() tells callers whether anything changed at all.
     """
 
     is_passive = True
@@ -137,54 +400,84 @@ class FilesConnector(BaseConnector):
         self.root_dir = config["root_dir"]
         self.exts = tuple(config.get("extensions", [".txt", ".pdf", ".csv"]))
         self.top_k_default = int(config.get("top_k_default", 5))
-        self._index: Optional[_InMemoryFileIndex] = None
+        # parse_workers > 1: parse in a process pool (PDF extraction is CPU-bound)
+        self.parse_workers = int(config.get("parse_workers", 0))
+        self.parse_timeout_s = float(config.get("parse_timeout_s", 60))
+        # extracted PDF/DOCX text, shared across restarts and workers ("" disables)
+        self.text_cache_dir = config.get("text_cache_dir", text_cache.DEFAULT_DIR) or ""
+        self.csv_opts = {**CSV_DEFAULTS, **(config.get("csv") or {})}
+        self.watch = bool(config.get("watch", False))
+        self.watch_interval_s = float(config.get("watch_interval_s", 5))
+        self._chunks: Dict[str, List[Tuple[str, str]]] = {}  # path -> [(loc, text)]
         self._loaded = False
 
     def schema(self):
-        return {"list_all": {"description": "returns all local documents"}}
+        return _SCHEMA
 
     # -------------- Ingestion --------------
     def _ensure_loaded(self):
         if self._loaded:
             return
-        idx = _InMemoryFileIndex()
         paths = _walk_files(self.root_dir, self.exts)
+        self._chunks = dict(self.iter_parsed(paths))
+        self._loaded = True
+        n = sum(len(c) for c in self._chunks.values())
+        print(f"[FilesConnector] Loaded {n} chunks from {len(paths)} files under {self.root_dir}")
 
-        for p in paths:
-            lp = p.lower()
-            try:
-                if lp.endswith(".txt"):
-                    chunks = _ingest_txt(p)
-                elif lp.endswith(".pdf"):
-                    chunks = _ingest_pdf(p)
-                elif lp.endswith(".csv"):
-                    chunks = _ingest_csv(p)
-                elif lp.endswith(".docx"):
-                    chunks = _ingest_docx(p)
-                else:
-                    chunks = []
-            except Exception:
-                chunks = []
+    def iter_parsed(self, paths: Iterable[str], manifest: Dict[str, dict] | None = None):
+        """(path, [(loc, text)]) per file as each finishes parsing; `manifest` from scan_changes()."""
+        return parse_files(paths, self.parse_workers, self.parse_timeout_s,
+                           self.text_cache_dir, self.csv_opts, manifest)
 
-            for loc, text in chunks:
-                idx.add([_doc_line(p, loc, text)], [{"file": p, "loc": loc}])
+    def scan_changes(self, previous: Dict[str, dict] | None = None):
+        """
+        Stat the tree against `previous` (a manifest from an earlier scan).
+        Returns (manifest, changed_paths, deleted_paths); nothing is parsed.
+        """
+        current = file_manifest.scan(_walk_files(self.root_dir, self.exts), previous)
+        changed, deleted = file_manifest.diff(previous or {}, current)
+        return current, changed, deleted
 
-        self._index = idx
-        self._loaded = True
-        print(f"[FilesConnector] Loaded {len(idx.docs)} chunks from {len(paths)} files under {self.root_dir}")
+    def iter_rows(self, paths: Iterable[str] | None = None,
+                  manifest: Dict[str, dict] | None = None) -> Iterator[Dict]:
+        """
+        Stream rows of `paths` (default: every file under root_dir) as files
+        finish parsing. Refreshes the list_all() cache only if it was built.
+        Pass the scan_changes() manifest so PDF/DOCX aren't hashed again.
+        """
+        if paths is None:
+            paths = _walk_files(self.root_dir, self.exts)
+        for p, chunks in self.iter_parsed(paths, manifest):
+            if self._loaded:
+                self._chunks[p] = chunks
+            yield from _rows(p, chunks)
+
+    def iter_chunks(self, batch_size: int = 256) -> Iterator[List[Dict]]:
+        """All rows in pages of up to batch_size, parsed as they are consumed."""
+        page = []
+        for row in self.iter_rows():
+            page.append(row)
+            if len(page) >= batch_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def etag(self) -> str:
+        """Version of the corpus (paths, sizes, mtimes); equal etag = nothing to re-ingest."""
+        return file_manifest.stat_etag(_walk_files(self.root_dir, self.exts))
+
+    def forget(self, paths: List[str]):
+        for p in paths:
+            self._chunks.pop(p, None)
 
     # -------------- Passive Access --------------
     def list_all(self):
-        """Return all documents (used by orchestrator to seed corpus)."""
+        """Return all documents as one list (prefer iter_chunks() for seeding)."""
         self._ensure_loaded()
         rows = []
-        for i, text in enumerate(self._index.docs):
-            meta = self._index.metas[i]
-            rows.append({
-                "file": meta.get("file"),
-                "loc": meta.get("loc"),
-                "text": text,
-            })
+        for p, chunks in self._chunks.items():
+            rows.extend(_rows(p, chunks))
         return rows
 
     async def list_all_async(self):
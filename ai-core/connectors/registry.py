@@ -0,0 +1,155 @@
+# connectors/registry.py
+"""
+Process-wide cache of connectors built from per-request specs.
+
+Connectors are keyed by a canonical hash of (type, config), so a request
+that repeats a spec gets the same instance: a warm SQLAlchemy pool, an
+already-walked file corpus, and so on. Entries are evicted least recently
+used beyond `max_entries`, or once idle for `ttl_s`. get_or_create()
+lends the connector out and every call is paired with release(): an
+evicted connector still in use by a request is closed (engines disposed,
+when it has a close() method) only after its last borrower releases it.
+
+Environment overrides:
+    CB_CONNECTOR_CACHE_MAX   = max cached connectors        (default 32)
+    CB_CONNECTOR_CACHE_TTL_S = idle seconds before eviction (default 900)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+_DEFAULT_MAX_ENTRIES = int(os.getenv("CB_CONNECTOR_CACHE_MAX", "32"))
+_DEFAULT_TTL_S = float(os.getenv("CB_CONNECTOR_CACHE_TTL_S", "900"))
+
+
+def config_key(ctype: str, config: Dict[str, Any]) -> str:
+    """Canonical hash: key order and whitespace in the spec don't matter."""
+    blob = json.dumps({"type": ctype.lower(), "config": config}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def close_connector(conn):
+    close = getattr(conn, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as e:
+        print(f"[ConnectorRegistry] close failed for {getattr(conn, 'name', conn)}: {type(e).__name__}: {e}")
+
+
+class _Entry:
+    __slots__ = ("conn", "last_used", "refs")
+
+    def __init__(self, conn, now: float):
+        self.conn = conn
+        self.last_used = now
+        self.refs = 0  # requests currently using conn
+
+
+class ConnectorRegistry:
+    def __init__(self, max_entries: int = _DEFAULT_MAX_ENTRIES, ttl_s: float = _DEFAULT_TTL_S):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._borrowed: Dict[int, _Entry] = {}  # id(conn) -> entry, cached or evicted, while refs > 0
+        self._retired: Dict[int, _Entry] = {}   # evicted but still borrowed; closed on last release
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, ctype: str, config: Dict[str, Any], factory: Callable[[], Any]):
+        """Borrow the cached connector for (ctype, config); `factory()` builds it on a miss. Pair with release()."""
+        key = config_key(ctype, config)
+        now = time.time()
+        to_close = []
+        with self._lock:
+            to_close += self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._borrow(entry, now)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            conn = factory()  # outside the lock: may connect / walk a directory
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:  # built concurrently by another request; keep the first
+                    to_close.append(conn)
+                else:
+                    entry = self._entries[key] = _Entry(conn, now)
+                self._borrow(entry, now)
+                while len(self._entries) > self.max_entries:
+                    to_close += self._retire(self._entries.popitem(last=False)[1])
+                    self.evictions += 1
+        for old in to_close:
+            close_connector(old)
+        return entry.conn
+
+    def release(self, conn):
+        """Return a connector from get_or_create(); closes it if it was evicted meanwhile."""
+        with self._lock:
+            entry = self._borrowed.get(id(conn))
+            if entry is None:
+                return
+            entry.refs -= 1
+            entry.last_used = time.time()
+            if entry.refs > 0:
+                return
+            del self._borrowed[id(conn)]
+            retired = self._retired.pop(id(conn), None)
+        if retired is not None:
+            close_connector(conn)
+
+    def _borrow(self, entry: _Entry, now: float):
+        entry.last_used = now
+        entry.refs += 1
+        self._borrowed[id(entry.conn)] = entry
+
+    def _retire(self, entry: _Entry) -> list:
+        """Connectors to close now; borrowed ones wait for their last release()."""
+        if entry.refs > 0:
+            self._retired[id(entry.conn)] = entry
+            return []
+        return [entry.conn]
+
+    def _expire(self, now: float) -> list:
+        if self.ttl_s <= 0:
+            return []
+        stale = [k for k, e in self._entries.items() if e.refs == 0 and now - e.last_used > self.ttl_s]
+        self.evictions += len(stale)
+        return [self._entries.pop(k).conn for k in stale]
+
+    def close_all(self):
+        """Close everything, borrowed or not (shutdown)."""
+        with self._lock:
+            conns = [e.conn for e in self._entries.values()] + [e.conn for e in self._retired.values()]
+            self._entries.clear()
+            self._retired.clear()
+            self._borrowed.clear()
+        for conn in conns:
+            close_connector(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size, borrowed, retired = len(self._entries), len(self._borrowed), len(self._retired)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "borrowed": borrowed,
+            "retired_in_use": retired,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
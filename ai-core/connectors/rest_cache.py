@@ -0,0 +1,190 @@
+# connectors/rest_cache.py
+"""
+HTTP response cache for RESTConnector, keyed by the normalised URL.
+Freshness follows Cache-Control / Expires (see freshness()); stale entries
+with an ETag or Last-Modified are revalidated, and a 304 renews them.
+"""
+
+from __future__ import annotations
+import os
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from typing import Dict, Optional
+
+from utils.shared_cache import CacheStats, SharedCache
+
+_DEFAULT_MAX_BYTES = int(os.getenv("CB_REST_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # compressed; 0 disables
+_DEFAULT_MAX_ENTRIES = int(os.getenv("CB_REST_CACHE_MAX_ENTRIES", "4096"))
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Canonical URL: case-folded scheme/host, no default port, sorted query, no fragment."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def parse_cache_control(value: str | None) -> Dict[str, str | None]:
+    """{directive (lower-case): value or None}."""
+    out = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            out[name.lower()] = arg.strip().strip('"') or None
+    return out
+
+
+def freshness(headers, default_ttl_s: float = 0.0) -> Optional[float]:
+    """
+    Seconds the response stays fresh; None when it must not be stored
+    (no-store / private: this cache is shared). no-cache means 0, i.e.
+    revalidate on every use; s-maxage / max-age minus Age, then Expires,
+    then `default_ttl_s`. `headers` is case-insensitive (requests / httpx).
+    """
+    cc = parse_cache_control(headers.get("cache-control"))
+    if "no-store" in cc or "private" in cc:
+        return None
+    if "no-cache" in cc:
+        return 0.0
+    age = _to_float(headers.get("age")) or 0.0
+    for directive in ("s-maxage", "max-age"):
+        if cc.get(directive) is not None:
+            max_age = _to_float(cc[directive])
+            if max_age is not None:
+                return max(0.0, max_age - age)
+    expires = headers.get("expires")
+    if expires:
+        try:
+            exp = parsedate_to_datetime(expires).timestamp()
+            date = headers.get("date")
+            now = parsedate_to_datetime(date).timestamp() if date else time.time()
+            return max(0.0, exp - now)
+        except (TypeError, ValueError):
+            return 0.0  # invalid Expires means "already expired"
+    return max(0.0, float(default_ttl_s or 0.0))
+
+
+def _to_float(v) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "expires_at", "size")
+
+    def __init__(self, content: bytes, etag: str | None, last_modified: str | None, ttl_s: float):
+        self.body = zlib.compress(content, 1)
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = time.time() + ttl_s
+        self.size = len(self.body)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def content(self) -> bytes:
+        return zlib.decompress(self.body)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class RESTResponseCache(CacheStats):
+    def __init__(self, max_bytes: int = _DEFAULT_MAX_BYTES, max_entries: int = _DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0          # served fresh, no request
+        self.revalidated = 0   # 304: served from cache after a conditional request
+        self.misses = 0        # full response fetched
+
+    served_counters = ("hits", "revalidated")
+    lookup_counters = ("hits", "revalidated", "misses")
+
+    def record(self, outcome: str):
+        """Count a lookup: "hit" | "revalidated" | "miss"."""
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """The entry for `key`, fresh or stale (callers revalidate stale ones)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, content: bytes, headers, default_ttl_s: float = 0.0) -> Optional[CachedResponse]:
+        """Store a 200 response if its headers allow it; returns the entry (or None)."""
+        ttl = freshness(headers, default_ttl_s)
+        etag, last_modified = headers.get("etag"), headers.get("last-modified")
+        if ttl is None or (ttl <= 0 and not (etag or last_modified)):
+            self.drop(key)
+            return None  # nothing to gain: neither fresh nor revalidatable
+        entry = CachedResponse(content, etag, last_modified, ttl)
+        if entry.size > self.max_bytes // 4:
+            self.drop(key)
+            return None
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def renew(self, key: str, entry: CachedResponse, headers, default_ttl_s: float = 0.0):
+        """Apply a 304's headers to `entry` (new expiry, updated validators)."""
+        ttl = freshness(headers, default_ttl_s)
+        if ttl is None:
+            self.drop(key)
+            return
+        entry.expires_at = time.time() + ttl
+        entry.etag = headers.get("etag") or entry.etag
+        entry.last_modified = headers.get("last-modified") or entry.last_modified
+
+    def drop(self, key: str):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _usage(self) -> dict:
+        with self._lock:
+            size, nbytes = len(self._entries), self._bytes
+        return {"entries": size, "bytes": nbytes, "max_bytes": self.max_bytes, "max_entries": self.max_entries}
+
+
+_default = SharedCache("RESTResponseCache", RESTResponseCache, enabled=_DEFAULT_MAX_BYTES > 0)
+get_default_cache = _default.get
@@ -1,15 +1,77 @@
 # connectors/rest_connector.py
+import json
 import asyncio
+import importlib.util
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 from connectors.base import BaseConnector
+from connectors.results import RowList
+from connectors.rest_cache import CachedResponse, RESTResponseCache, get_default_cache, normalize_url
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# connection pool defaults; override per connector under `pool:` in connectors.yaml
+POOL_DEFAULTS = {
+    "max_connections": 100,     # open connections across all hosts
+    "max_keepalive": 20,        # idle connections kept for reuse
+    "keepalive_expiry_s": 30,   # idle connection lifetime
+    "per_host": 10,             # concurrent requests per host; 0 = no cap
+}
+
 
 class RESTConnector(BaseConnector):
+    """
+    Connector for read-only REST APIs.
+
+    Requests go through one pooled client per connector, so calls reuse
+    kept-alive connections instead of opening (and TLS-handshaking) a new
+    one each time. execute_async() uses an httpx.AsyncClient when httpx is
+    installed, and runs execute() in a worker thread otherwise; execute()
+    uses a requests.Session. GET responses go through the HTTP-aware
+    response cache (connectors/rest_cache.py): fresh entries skip the
+    request, stale ones are revalidated with ETag / Last-Modified. Config:
+        base_url:    API root
+        timeout:     seconds per request (default 8)
+        endpoints:   {route: {method, params, cache_ttl_s}} or a list of {route, method, params, cache_ttl_s}
+        pool:        max_connections / max_keepalive / keepalive_expiry_s / per_host
+        http2:       negotiate HTTP/2 when the server offers it (needs `pip install h2`)
+        cache:       false disables the response cache for this connector
+        cache_ttl_s: freshness for responses without max-age/Expires (default 0;
+                     an endpoint's cache_ttl_s takes precedence)
+    """
+
     def __init__(self, name, config):
         super().__init__(name, config)
         self.base_url = config["base_url"]
         self.timeout = float(config.get("timeout", 8.0))
+        self._endpoints = self._normalize_endpoints(config.get("endpoints", {}))
+        self.pool = {**POOL_DEFAULTS, **(config.get("pool") or {})}
+        self.http2 = bool(config.get("http2", False))
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            print(f"[RESTConnector] {name}: http2 requested but the 'h2' package is missing; using HTTP/1.1")
+            self.http2 = False
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=int(self.pool["max_keepalive"]))  # kept-alive connections per host
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._client = None        # httpx.AsyncClient, bound to the loop that created it
+        self._client_loop = None
+        self._host_sems = {}       # host -> asyncio.Semaphore (per_host cap)
+        self.cache: RESTResponseCache | None = get_default_cache() if config.get("cache", True) else None
+        self.cache_ttl_s = float(config.get("cache_ttl_s", 0))
+        self._base_path = urlsplit(self.base_url).path.rstrip("/")
 
     def schema(self):
+        """Endpoints keyed by route (normalised once from the config)."""
+        return self._endpoints
+
+    @staticmethod
+    def _normalize_endpoints(eps) -> dict:
         """
         Return endpoints as a dict keyed by route, regardless of input shape.
         Accepts either:
@@ -25,16 +87,13 @@ class RESTConnector(BaseConnector):
                 ...
               ]
         """
-        eps = self.config.get("endpoints", {})
         if isinstance(eps, dict):
             # Normalize methods/params casing just in case
             out = {}
             for route, spec in eps.items():
                 if not isinstance(spec, dict):
                     continue
-                method = str(spec.get("method", "GET")).upper()
-                params = list(spec.get("params", []))
-                out[str(route)] = {"method": method, "params": params}
+                out[str(route)] = RESTConnector._endpoint(spec)
             return out
 
         # If provided as a list, normalize to dict
@@ -46,17 +105,24 @@ class RESTConnector(BaseConnector):
                 route = (e.get("route") or e.get("path") or "").strip()
                 if not route:
                     continue
-                method = str(e.get("method", "GET")).upper()
-                params = list(e.get("params", []))
-                out[route] = {"method": method, "params": params}
+                out[route] = RESTConnector._endpoint(e)
             return out
 
         # Fallback
         return {}
 
-    def execute(self, query: str):
+    @staticmethod
+    def _endpoint(spec: dict) -> dict:
+        out = {"method": str(spec.get("method", "GET")).upper(), "params": list(spec.get("params", []))}
+        if spec.get("description"):
+            out["description"] = str(spec["description"])
+        if spec.get("cache_ttl_s") is not None:
+            out["cache_ttl_s"] = float(spec["cache_ttl_s"])
+        return out
+
+    def _url(self, query: str) -> str:
         """
-        Executes REST GET requests.
+        URL for a builder query.
         Accepts slightly malformed queries like '/customers' or 'customers?region=EU'.
         """
         q = (query or "").strip()
@@ -85,17 +151,123 @@ class RESTConnector(BaseConnector):
 
         url = self.base_url + path
         print(f"[RESTConnector] Raw query from builder: {q!r} -> URL: {url}")
+        return url
 
-        r = requests.get(url, timeout=self.timeout)
-        r.raise_for_status()
-
+    @staticmethod
+    def _decode(content: bytes, status: str | None = None):
         try:
-            return r.json()
+            data = json.loads(content)
         except Exception:
             # fallback: some mock APIs return plain text
-            return [{"response": r.text}]
+            data = [{"response": content.decode("utf-8", errors="replace")}]
+        if status is not None and isinstance(data, list):
+            data = RowList(data)
+            data.cache = status
+        return data
+
+    # ---------------- Response cache ----------------
+    def _ttl_for(self, url: str) -> float:
+        path = urlsplit(url).path
+        if self._base_path and path.startswith(self._base_path):
+            path = path[len(self._base_path):]
+        return self._endpoints.get(path, {}).get("cache_ttl_s", self.cache_ttl_s)
+
+    def _lookup(self, url: str):
+        """(cache key, entry or None); the key is None when caching is off."""
+        if self.cache is None:
+            return None, None
+        key = normalize_url(url)
+        return key, self.cache.get(key)
+
+    def _from_cache(self, entry: CachedResponse, status: str):
+        self.cache.record(status)
+        return self._decode(entry.content(), status)
+
+    def _handle(self, url: str, key, entry: CachedResponse | None, r):
+        """Decode a requests/httpx response, renewing or storing the cache entry."""
+        if entry is not None and r.status_code == 304:
+            self.cache.renew(key, entry, r.headers, self._ttl_for(url))
+            return self._from_cache(entry, "revalidated")
+        r.raise_for_status()
+        if key is None:
+            return self._decode(r.content)
+        self.cache.record("miss")
+        if r.status_code == 200:
+            self.cache.put(key, r.content, r.headers, self._ttl_for(url))
+        else:
+            self.cache.drop(key)
+        return self._decode(r.content, "miss")
+
+    @staticmethod
+    def _request_headers(entry: CachedResponse | None):
+        return entry.conditional_headers() if entry is not None and entry.revalidatable else None
+
+    def execute(self, query: str):
+        """Executes REST GET requests over the connector's keep-alive session."""
+        url = self._url(query)
+        key, entry = self._lookup(url)
+        if entry is not None and entry.fresh:
+            return self._from_cache(entry, "hit")
+        r = self._session.get(url, timeout=self.timeout, headers=self._request_headers(entry))
+        return self._handle(url, key, entry, r)
+
+    # ---------------- Async client ----------------
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # an AsyncClient's connections belong to one event loop
+            limits = httpx.Limits(
+                max_connections=int(self.pool["max_connections"]),
+                max_keepalive_connections=int(self.pool["max_keepalive"]),
+                keepalive_expiry=float(self.pool["keepalive_expiry_s"]),
+            )
+            # requests.Session follows redirects; keep execute_async() consistent with it
+            self._client = httpx.AsyncClient(limits=limits, http2=self.http2, timeout=self.timeout,
+                                             follow_redirects=True)
+            self._client_loop = loop
+            self._host_sems = {}
+        return self._client
+
+    def _host_sem(self, url: str):
+        cap = int(self.pool["per_host"])
+        if cap <= 0:
+            return None
+        host = urlsplit(url).netloc
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(cap)
+        return sem
 
-    # --- Minimal async support: run the same sync code in a worker thread ---
     async def execute_async(self, query: str):
-        """Async wrapper around execute(), using a background thread."""
-        return await asyncio.to_thread(self.execute, query)
+        """execute() on the pooled httpx client; a worker thread runs execute() without httpx."""
+        if httpx is None:
+            return await asyncio.to_thread(self.execute, query)
+        url = self._url(query)
+        key, entry = self._lookup(url)
+        if entry is not None and entry.fresh:
+            return self._from_cache(entry, "hit")
+        client = self._async_client()
+        headers = self._request_headers(entry)
+        sem = self._host_sem(url)
+        if sem is None:
+            r = await client.get(url, headers=headers)
+        else:
+            async with sem:
+                r = await client.get(url, headers=headers)
+        return self._handle(url, key, entry, r)
+
+    def close(self):
+        """Close the session and the async client's pooled connections."""
+        self._session.close()
+        client, loop = self._client, self._client_loop
+        self._client = self._client_loop = None
+        if client is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._close_on_loop(loop, client.aclose())
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
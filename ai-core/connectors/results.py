@@ -0,0 +1,64 @@
+# connectors/results.py
+"""
+Column-oriented query results.
+
+ColumnarResult keeps column names plus one value list per column, instead
+of one dict per row. It still behaves like a list of row dicts (len,
+truthiness, iteration, indexing, slicing) for code that expects rows, but
+Textifier reads the columns directly and never builds the dicts.
+RowList is the plain list-of-dicts form carrying the same flags.
+"""
+
+from typing import Any, Dict, Iterator, List, Sequence
+
+
+class RowList(list):
+    """list of row dicts plus the result flags of ColumnarResult."""
+    truncated = False
+    cache = None
+
+
+class ColumnarResult:
+    __slots__ = ("columns", "data", "truncated", "cache")
+
+    def __init__(self, columns: Sequence[str], data: List[List[Any]] | None = None, truncated: bool = False):
+        self.columns = list(columns)
+        self.data = data if data is not None else [[] for _ in self.columns]
+        self.truncated = truncated  # True when a row budget stopped the read early
+        self.cache = None           # "hit" | "miss" when served through a result cache
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Sequence[Sequence[Any]], truncated: bool = False):
+        data = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+        return cls(columns, data, truncated)
+
+    def extend(self, rows: Sequence[Sequence[Any]]):
+        """Append a fetchmany() batch (sequence of row tuples)."""
+        for i, col in enumerate(zip(*rows)):
+            self.data[i].extend(col)
+
+    def __len__(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {c: col[i] for c, col in zip(self.columns, self.data)}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ColumnarResult(self.columns, [col[key] for col in self.data], self.truncated)
+        return self.row(key)
+
+    def to_rows(self) -> RowList:
+        rows = RowList(self)
+        rows.truncated, rows.cache = self.truncated, self.cache
+        return rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"columns": self.columns, "data": self.data, "truncated": self.truncated}
+
+    def __repr__(self):
+        return f"ColumnarResult({len(self)} rows x {len(self.columns)} cols{', truncated' if self.truncated else ''})"
@@ -0,0 +1,205 @@
+# connectors/schema_catalog.py
+"""
+Compiled connector schemas.
+
+A CompiledSchema is a connector's schema dict together with everything a
+request derives from it: the prompt text used by LLMQueryBuilder and the
+indexer, a content hash of that text, and the connector kind (sql/rest).
+It is built once and then shared by every request.
+
+SchemaCatalog (opt-in per connector with `reflect:`) builds the SQL schema
+from the database itself: tables and columns come from the SQLAlchemy
+inspector, and the `schema:` block in connectors.yaml adds descriptions.
+Reflection runs on a background thread: the catalog is warmed when the
+connector is built, and every recheck_s a cheap schema version is checked
+(while the current schema keeps being served), reflecting again only when
+it moves:
+    - SQLite:     PRAGMA schema_version
+    - PostgreSQL: md5 over information_schema.columns of the current schema
+    - MySQL:      count + CRC32 sum over information_schema.columns
+    - others:     reflected once
+
+Environment overrides:
+    CB_SCHEMA_RECHECK_S = seconds between schema version checks (default 30)
+"""
+
+from __future__ import annotations
+import os
+import time
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import inspect
+
+_DEFAULT_RECHECK_S = float(os.getenv("CB_SCHEMA_RECHECK_S", "30"))
+
+_VERSION_QUERIES = {
+    "sqlite": "PRAGMA schema_version",
+    "postgresql": (
+        "SELECT md5(string_agg(table_name || '.' || column_name || ':' || data_type, ',' "
+        "ORDER BY table_name, ordinal_position)) "
+        "FROM information_schema.columns WHERE table_schema = current_schema()"
+    ),
+    "mysql": (
+        "SELECT concat(count(*), ':', coalesce(sum(crc32(concat_ws('.', table_name, column_name, column_type))), 0)) "
+        "FROM information_schema.columns WHERE table_schema = database()"
+    ),
+}
+_VERSION_QUERIES["mariadb"] = _VERSION_QUERIES["mysql"]
+
+
+def format_schema(schema: dict) -> str:
+    """
+    Schema dict as prompt text: `table(col, ...)` for SQL, `/endpoint?param, ...`
+    for REST, followed by `  -- description` when there is one.
+    """
+    lines = []
+    for name, detail in schema.items():
+        if "fields" in detail:
+            line = f"{name}({', '.join(detail['fields'])})"
+        elif "params" in detail:
+            # REST endpoints may be keys like '/customers'; reflect that
+            line = f"{name}?{', '.join(detail['params'])}"
+        else:
+            continue
+        desc = " ".join(str(detail.get("description") or "").split())
+        lines.append(f"{line}  -- {desc}" if desc else line)
+    return "\n".join(lines)
+
+
+def schema_kind(schema: dict) -> str:
+    """'sql' or 'rest', judged by the first entry that has fields or params."""
+    for detail in schema.values():
+        if "fields" in detail:
+            return "sql"
+        if "params" in detail:
+            return "rest"
+    return "sql"
+
+
+class CompiledSchema:
+    __slots__ = ("tables", "text", "hash", "kind", "version")
+
+    def __init__(self, tables: dict, version: Any = None):
+        self.tables = tables
+        self.text = format_schema(tables)
+        self.hash = hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+        self.kind = schema_kind(tables)
+        self.version = version
+
+    def __repr__(self):
+        return f"CompiledSchema({len(self.tables)} entries, {self.kind}, hash={self.hash[:12]})"
+
+
+def compile_schema(schema: dict, version: Any = None) -> CompiledSchema:
+    return CompiledSchema(schema or {}, version)
+
+
+class SchemaCatalog:
+    """
+    Reflected schema of one SQL database, merged with YAML descriptions.
+        mode: "yaml" - only tables listed in YAML; columns are checked against
+                       the database (a YAML `fields` list stays an allow-list)
+              "all"  - every table and view; YAML adds descriptions
+        exclude: table names left out of the prompt
+    """
+
+    def __init__(self, engine, overrides: Dict[str, dict] | None = None, mode: str = "yaml",
+                 exclude=None, recheck_s: float = _DEFAULT_RECHECK_S):
+        self.engine = engine
+        self.overrides = overrides or {}
+        self.mode = mode
+        self.exclude = {t.lower() for t in (exclude or [])}
+        self.recheck_s = float(recheck_s)
+        self._lock = threading.Lock()          # held while reflecting
+        self._thread_lock = threading.Lock()   # guards _refreshing only; never waits on reflection
+        self._compiled: Optional[CompiledSchema] = None
+        self._checked_at = 0.0
+        self._reflected = False
+        self._refreshing: Optional[threading.Thread] = None
+        self.reflections = 0
+
+    @property
+    def ready(self) -> bool:
+        """True once compiled() can answer without touching the database."""
+        return self._compiled is not None
+
+    def warm(self):
+        """Reflect in the background so the first request doesn't wait for it."""
+        self._refresh_in_background()
+
+    def compiled(self) -> CompiledSchema:
+        """
+        The current compiled schema. Only a cold catalog reflects in the caller's
+        thread; a due version check runs in the background meanwhile.
+        """
+        cur = self._compiled
+        if cur is None:
+            return self._refresh()
+        if time.time() - self._checked_at >= self.recheck_s:
+            self._refresh_in_background()
+        return cur
+
+    def _refresh_in_background(self):
+        with self._thread_lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self._refresh, name="schema-refresh", daemon=True)
+            self._refreshing.start()
+
+    def _refresh(self) -> CompiledSchema:
+        now = time.time()
+        with self._lock:
+            if self._compiled is not None and now - self._checked_at < self.recheck_s:
+                return self._compiled
+            try:
+                version = self._version()
+                if not self._reflected or version != self._compiled.version:
+                    self._compiled = CompiledSchema(self._reflect(), version)
+                    self._reflected = True
+                    self.reflections += 1
+                    print(f"[SchemaCatalog] Reflected {len(self._compiled.tables)} tables "
+                          f"(hash {self._compiled.hash[:12]}, version {version})")
+            except Exception as e:
+                print(f"[SchemaCatalog] Reflection failed: {type(e).__name__}: {e}")
+                if self._compiled is None:
+                    # keep serving the hand-written schema until the database answers
+                    self._compiled = CompiledSchema(dict(self.overrides), None)
+            self._checked_at = now
+            return self._compiled
+
+    def invalidate(self):
+        """Reflect again at the next check, whatever the schema version says."""
+        with self._lock:
+            self._reflected = False
+            self._checked_at = 0.0
+
+    def _version(self):
+        sql = _VERSION_QUERIES.get(self.engine.dialect.name)
+        if sql is None:
+            return None
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql(sql).scalar()
+
+    def _reflect(self) -> Dict[str, dict]:
+        insp = inspect(self.engine)
+        names = list(insp.get_table_names()) + list(insp.get_view_names())
+        wanted = {t.lower(): t for t in self.overrides}
+        tables = {}
+        for name in names:
+            low = name.lower()
+            if low.startswith("sqlite_") or low in self.exclude:
+                continue
+            if self.mode != "all" and low not in wanted:
+                continue
+            override = self.overrides.get(wanted.get(low, name)) or {}
+            fields = [c["name"] for c in insp.get_columns(name)]
+            if self.mode != "all" and override.get("fields"):
+                allowed = {f.lower() for f in override["fields"]}
+                fields = [f for f in fields if f.lower() in allowed]  # YAML-hidden columns stay hidden
+            tables[name] = {"description": override.get("description", ""), "fields": fields}
+        missing = sorted(set(wanted) - {t.lower() for t in tables} - self.exclude)
+        if missing:
+            print(f"[SchemaCatalog] YAML tables not found in the database: {', '.join(missing)}")
+        return tables
@@ -0,0 +1,151 @@
+# connectors/sql_cache.py
+"""
+Result cache for SQLConnector, keyed by (connection string, normalised SQL,
+row budget). A hit needs an unexpired TTL and an unchanged data version:
+PRAGMA data_version plus db/-wal stats for SQLite files, the connector's
+`version_queries` elsewhere (TTL only when there are none).
+"""
+
+from __future__ import annotations
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from utils.shared_cache import CacheStats, SharedCache
+
+_DEFAULT_MAX_ENTRIES = int(os.getenv("CB_SQL_CACHE_MAX_ENTRIES", "256"))  # 0 disables
+_DEFAULT_MAX_ROWS = int(os.getenv("CB_SQL_CACHE_MAX_ROWS", "200000"))      # across all entries
+_DEFAULT_TTL_S = float(os.getenv("CB_SQL_CACHE_TTL_S", "300"))
+
+# string literals, quoted identifiers, or runs of anything else
+_SQL_PART_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[^'\"]+")
+
+def normalize_sql(query: str) -> str:
+    """Whitespace-collapsed, lower-cased SQL with quoted literals/identifiers kept verbatim."""
+    parts = []
+    for m in _SQL_PART_RE.finditer((query or "").strip().rstrip(";").strip()):
+        part = m.group(0)
+        parts.append(part if part[0] in "'\"" else re.sub(r"\s+", " ", part).lower())
+    return "".join(parts)
+
+
+class DataVersion:
+    """Cheap "has the data changed?" probe for one connector's database."""
+
+    def __init__(self, engine, version_queries: Dict[str, str] | None = None):
+        self.engine = engine
+        self.version_queries = {k.lower(): v for k, v in (version_queries or {}).items()}
+        self._lock = threading.Lock()
+        self._sqlite_path = None
+        self._sqlite_con = None
+        url = engine.url
+        if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+            self._sqlite_path = url.database
+
+    def _sqlite_version(self) -> Tuple:
+        stats = []
+        for p in (self._sqlite_path, self._sqlite_path + "-wal"):
+            try:
+                st = os.stat(p)
+                stats.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                stats.append(None)
+        with self._lock:
+            try:
+                if self._sqlite_con is None:
+                    # data_version only moves for commits made by *other* connections,
+                    # so it needs its own long-lived, read-only connection
+                    self._sqlite_con = sqlite3.connect(f"file:{self._sqlite_path}?mode=ro", uri=True,
+                                                       check_same_thread=False)
+                dv = self._sqlite_con.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error:
+                dv = None
+        return (dv, tuple(stats))
+
+    def current(self, sql: str) -> Any:
+        """Version tag for the data `sql` reads; None means "unknown, rely on TTL"."""
+        if self._sqlite_path:
+            return self._sqlite_version()
+        if not self.version_queries:
+            return None
+        used = sorted(t for t in self.version_queries if re.search(rf"\b{re.escape(t)}\b", sql))
+        if not used:
+            return None
+        from sqlalchemy import text
+        with self.engine.connect() as conn:
+            return tuple((t, conn.execute(text(self.version_queries[t])).scalar()) for t in used)
+
+    def close(self):
+        with self._lock:
+            if self._sqlite_con is not None:
+                self._sqlite_con.close()
+                self._sqlite_con = None
+
+
+class SQLResultCache(CacheStats):
+    def __init__(self, max_entries: int = _DEFAULT_MAX_ENTRIES, max_rows: int = _DEFAULT_MAX_ROWS,
+                 ttl_s: float = _DEFAULT_TTL_S):
+        self.max_entries = max(1, int(max_entries))
+        self.max_rows = int(max_rows)
+        self.ttl_s = float(ttl_s)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (version, expires_at, result)
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    extra_counters = ("invalidations",)
+
+    @staticmethod
+    def key(connection_string: str, sql: str, max_rows: int) -> str:
+        blob = f"{connection_string}\0{normalize_sql(sql)}\0{max_rows}"
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, version: Any):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_version, expires_at, result = entry
+                if expires_at > now and stored_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self._drop(key)
+                if stored_version != version:
+                    self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: str, version: Any, result, ttl_s: float | None = None):
+        n = len(result)
+        if n > self.max_rows:
+            return
+        ttl = self.ttl_s if ttl_s is None else float(ttl_s)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (version, time.time() + ttl, result)
+            self._rows += n
+            while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= len(entry[2])
+
+    def _usage(self) -> dict:
+        with self._lock:
+            size, rows = len(self._entries), self._rows
+        return {"entries": size, "rows": rows, "max_entries": self.max_entries,
+                "max_rows": self.max_rows, "ttl_s": self.ttl_s}
+
+
+_default = SharedCache("SQLResultCache", SQLResultCache, enabled=_DEFAULT_MAX_ENTRIES > 0)
+get_default_cache = _default.get
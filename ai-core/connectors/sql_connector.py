@@ -1,31 +1,220 @@
 # connectors/sql_connector.py
 import asyncio
+import importlib.util
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from connectors.base import BaseConnector
+from connectors.results import ColumnarResult
+from connectors.sql_cache import DataVersion, SQLResultCache, get_default_cache
+from connectors.sql_guard import SQLGuard
+from connectors.schema_catalog import CompiledSchema, SchemaCatalog
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError:
+    create_async_engine = None
+
+# backend -> async DBAPI driver used by execute_async()
+_ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def _async_url(connection_string: str):
+    """The async-driver form of a connection string, or None when its driver isn't installed."""
+    url = make_url(connection_string)
+    backend = url.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if create_async_engine is None or driver is None:
+        return None
+    for mod in (driver, "greenlet"):
+        if importlib.util.find_spec(mod) is None:
+            return None
+    return url.set(drivername=f"{backend}+{driver}")
+
+
+def _pool_kwargs(url, pool_cfg: dict | None) -> dict:
+    """create_engine() pool arguments from the connector's `pool:` block."""
+    cfg = pool_cfg or {}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}  # in-memory SQLite uses a single static connection
+    kwargs = {"pool_pre_ping": bool(cfg.get("pre_ping", False))}
+    for key, arg in (("size", "pool_size"), ("max_overflow", "max_overflow"),
+                     ("timeout_s", "pool_timeout"), ("recycle_s", "pool_recycle")):
+        if cfg.get(key) is not None:
+            kwargs[arg] = cfg[key]
+    return kwargs
+
 
 class SQLConnector(BaseConnector):
-    """Connector for relational databases (SQLite in this case)."""
+    """
+    Connector for relational databases (SQLite in this case).
+
+    Results are streamed with fetchmany() and reading stops at the
+    connector's row budget, so an unbounded SELECT never pulls a whole
+    table. Before running, SQLGuard (connectors/sql_guard.py) injects a
+    LIMIT, rejects queries whose plan is over budget and bounds execution
+    time. Repeated SELECTs are served from the result cache (see
+    connectors/sql_cache.py) until the data version changes. The schema is
+    reflected from the database (connectors/schema_catalog.py); the YAML
+    `schema:` block adds table descriptions.
+    execute_async() runs on a native async engine (aiosqlite / asyncpg /
+    aiomysql) when the driver is installed, so concurrent queries wait on
+    the event loop instead of occupying the default thread pool; without
+    one it falls back to execute() in a worker thread. Config:
+        max_rows:        row budget per query (default 1000)
+        fetch_size:      rows per fetchmany() (default 500)
+        result_format:   "rows" (list of dicts) | "columnar" (ColumnarResult)
+        cache:           false disables the result cache for this connector
+        cache_ttl_s:     TTL override for this connector's entries
+        version_queries: {table: "SELECT ..."} data-version probes (non-SQLite)
+        guard:           cost guard limits (see connectors/sql_guard.py)
+        async:           false keeps execute_async() on the thread fallback
+        pool:            size / max_overflow / timeout_s / recycle_s / pre_ping,
+                         applied to both the sync and the async engine
+        reflect:         false (default: YAML schema as written) | "yaml" (YAML tables, columns
+                         checked against the DB) | "all" (every table and column in the DB)
+        exclude_tables:  tables left out of the reflected schema
+    """
 
     def __init__(self, name, config):
         super().__init__(name, config)
-        self.engine = create_engine(config["connection_string"], echo=False)
+        self.connection_string = config["connection_string"]
+        pool = _pool_kwargs(make_url(self.connection_string), config.get("pool"))
+        self.engine = create_engine(self.connection_string, echo=False, **pool)
+        self.async_engine = None
+        async_url = _async_url(self.connection_string) if config.get("async", True) else None
+        if async_url is not None:
+            self.async_engine = create_async_engine(async_url, echo=False, **pool)
+        self.max_rows = int(config.get("max_rows", 1000))
+        self.fetch_size = max(1, int(config.get("fetch_size", 500)))
+        self.result_format = config.get("result_format", "rows")
+        self.cache: SQLResultCache | None = get_default_cache() if config.get("cache", True) else None
+        self.cache_ttl_s = config.get("cache_ttl_s")
+        self.data_version = DataVersion(self.engine, config.get("version_queries"))
+        self.guard = SQLGuard(self.engine.dialect.name, config.get("guard"))
+        reflect = config.get("reflect", False)
+        self.catalog = None
+        if reflect:
+            self.catalog = SchemaCatalog(self.engine, config.get("schema"), reflect, config.get("exclude_tables"))
+            self.catalog.warm()
+
+    @property
+    def schema_ready(self) -> bool:
+        """False while a cold schema catalog would have to reflect in the caller's thread."""
+        return self.catalog is None or self.catalog.ready
 
     def schema(self):
         """Return schema info (for LLM QueryBuilder)."""
-        return self.config.get("schema", {})
+        if self.catalog is None:
+            return self.config.get("schema", {})
+        return self.catalog.compiled().tables
 
-    def execute(self, query: str):
-        """Execute a SQL SELECT query and return results."""
+    def compiled_schema(self) -> CompiledSchema:
+        if self.catalog is None:
+            return super().compiled_schema()
+        return self.catalog.compiled()
+
+    def execute(self, query: str, columnar: bool | None = None):
+        """Execute a SQL SELECT query and return at most max_rows results."""
+        query, columnar = self._prepare(query, columnar)
+        key, version = self._version(query)
+        out = self._cache_get(key, version)
+        if out is None:
+            out = self._fetch(query)
+            self._cache_put(key, version, out)
+        return out if columnar else out.to_rows()
+
+    async def execute_async(self, query: str, columnar: bool | None = None):
+        """execute() on the async engine; a worker thread runs execute() when there is none."""
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.execute, query, columnar)
+        query, columnar = self._prepare(query, columnar)
+        if self.data_version.version_queries:
+            # version probes are queries on the sync engine; keep them off the event loop
+            key, version = await asyncio.to_thread(self._version, query)
+        else:
+            key, version = self._version(query)  # SQLite: file stat + PRAGMA, microseconds
+        out = self._cache_get(key, version)
+        if out is None:
+            async with self.async_engine.connect() as conn:
+                # the guard/read code is sync; run_sync drives it over the async driver
+                out = await conn.run_sync(self._fetch_on, query)
+            self._cache_put(key, version, out)
+        return out if columnar else out.to_rows()
+
+    # ---------------- Shared steps ----------------
+    def _prepare(self, query: str, columnar: bool | None):
         if not query or not query.strip().lower().startswith("select"):
             raise ValueError("Only SELECT statements are allowed.")
+        if columnar is None:
+            columnar = self.result_format == "columnar"
+        # one row past the budget tells _read whether the result was cut
+        return self.guard.prepare(query, self.max_rows + 1), columnar
+
+    def _version(self, query: str):
+        """(cache key, data version); the key is None when the cache is off or bypassed."""
+        if self.cache is None:
+            return None, None
+        try:
+            version = self.data_version.current(query.lower())
+        except Exception as e:
+            print(f"[SQLConnector] {self.name}: data version probe failed, bypassing cache: {type(e).__name__}: {e}")
+            return None, None
+        return SQLResultCache.key(self.connection_string, query, self.max_rows), version
+
+    def _cache_get(self, key, version):
+        if key is None:
+            return None
+        out = self.cache.get(key, version)
+        if out is not None:
+            # cached objects are shared: hand out a shallow copy carrying this call's status
+            out = ColumnarResult(out.columns, out.data, out.truncated)
+            out.cache = "hit"
+        return out
 
+    def _cache_put(self, key, version, out: ColumnarResult):
+        if key is not None:
+            self.cache.put(key, version, out, self.cache_ttl_s)
+            out.cache = "miss"
+
+    def _fetch(self, query: str) -> ColumnarResult:
         with self.engine.connect() as conn:
-            result = conn.execute(text(query))
-            columns = result.keys()
-            rows = [dict(zip(columns, row)) for row in result.fetchall()]
-            return rows
-
-    # --- Minimal async support: run the same sync code in a worker thread ---
-    async def execute_async(self, query: str):
-        """Async wrapper around execute(), using a background thread."""
-        return await asyncio.to_thread(self.execute, query)
+            return self._fetch_on(conn, query)
+
+    def _fetch_on(self, conn, query: str) -> ColumnarResult:
+        self.guard.check(conn, query)
+        with self.guard.statement_timeout(conn):
+            return self._read(conn, query)
+
+    def _read(self, conn, query: str) -> ColumnarResult:
+        # server-side cursor where the driver has one; fetchmany keeps memory bounded either way
+        result = conn.execution_options(stream_results=True).execute(text(query))
+        columns = list(result.keys())
+        out = ColumnarResult(columns)
+        budget = self.max_rows
+        while budget > 0:
+            batch = result.fetchmany(min(self.fetch_size, budget))
+            if not batch:
+                break
+            out.extend(batch)
+            budget -= len(batch)
+        if budget <= 0 and result.fetchone() is not None:
+            out.truncated = True
+            print(f"[SQLConnector] {self.name}: row budget {self.max_rows} reached; stopped reading")
+        result.close()
+        return out
+
+    def close(self):
+        """Dispose of the engines' connection pools."""
+        self.data_version.close()
+        self.engine.dispose()
+        if self.async_engine is not None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(self.async_engine.dispose())
+            else:
+                self._close_on_loop(loop, self.async_engine.dispose())
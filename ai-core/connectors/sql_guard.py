@@ -0,0 +1,212 @@
+# connectors/sql_guard.py
+"""
+Pre-execution cost guard for LLM-generated SQL.
+
+Before a SELECT runs, SQLGuard:
+    1. adds a LIMIT when there is none (or lowers one above the row budget),
+    2. asks the planner for the plan and rejects queries over the
+       connector's limit:
+         - SQLite: EXPLAIN QUERY PLAN; every full "SCAN" in the same loop
+           nest multiplies the table's estimated row count (cross joins
+           and unindexed joins explode, indexed SEARCHes don't)
+         - PostgreSQL / MySQL: the planner's total cost from EXPLAIN (JSON)
+         - other engines: no plan check
+    3. bounds execution time (statement_timeout_s) with the engine's own
+       mechanism (DuckDB: interrupt() from a timer), so one bad query
+       cannot hold a DB core for the whole request timeout.
+
+Config (connectors.yaml, per SQL connector, under `guard:`):
+    inject_limit:        true
+    max_plan_rows:       row visits allowed by the SQLite estimate (default 10,000,000)
+    max_plan_cost:       planner cost units allowed on PostgreSQL/MySQL (default 1,000,000)
+    statement_timeout_s: wall-clock limit per query (default 5)
+"""
+
+from __future__ import annotations
+import re
+import json
+import time
+import inspect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.util import await_only
+
+from connectors.sql_cache import normalize_sql
+
+# string literals and quoted identifiers (kept) or comments (dropped)
+_COMMENT_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?(?:\*/|$)", re.S)
+# group 1 is the row count: `LIMIT n`, `LIMIT n OFFSET m` or MySQL's `LIMIT offset, n`
+_TRAILING_LIMIT_RE = re.compile(r"\blimit\s+(?:\d+\s*,\s*)?(\d+)(?:\s+offset\s+\d+)?\s*$", re.I)
+_FROM_LIST_RE = re.compile(r"\bfrom\s+(?!\()(.+?)(?=\b(?:where|group|order|limit|having|union|except|intersect|window|"
+                           r"join|inner|left|right|cross|natural|full|on)\b|\)|$)", re.I | re.S)
+_JOIN_RE = re.compile(r"\bjoin\s+(.+?)(?=\b(?:on|using|where|group|order|limit|join|inner|left|right|cross|"
+                      r"natural|full)\b|\)|,|$)", re.I | re.S)
+_TABLE_REF_RE = re.compile(r'^\s*"?([\w.]+)"?(?:\s+(?:as\s+)?"?(\w+)"?)?\s*$', re.I)
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+_NOT_ALIASES = {"where", "join", "on", "left", "right", "inner", "outer", "cross", "natural", "full",
+                "group", "order", "limit", "union", "using", "having", "window", "except", "intersect"}
+_ROWCOUNT_TTL_S = 60.0
+
+
+class QueryRejected(ValueError):
+    """The guard refused to run a query."""
+
+
+def strip_comments(sql: str) -> str:
+    """SQL without -- and /* */ comments; quoted text is left alone."""
+    return _COMMENT_RE.sub(lambda m: m.group(0) if m.group(0)[0] in "'\"" else " ", sql)
+
+
+def add_limit(sql: str, limit: int) -> str:
+    """Append LIMIT when missing; lower a trailing LIMIT above `limit`."""
+    # a trailing `-- comment` would swallow an appended LIMIT
+    body = strip_comments(sql).strip().rstrip(";").rstrip()
+    m = _TRAILING_LIMIT_RE.search(normalize_sql(body))
+    if m is None:
+        return f"{body} LIMIT {limit}"
+    if int(m.group(1)) > limit:
+        m2 = _TRAILING_LIMIT_RE.search(body)
+        if m2 is not None:
+            return body[: m2.start(1)] + str(limit) + body[m2.end(1):]
+    return body
+
+
+def _table_aliases(sql: str) -> Dict[str, str]:
+    """{name or alias (lower-case): table} for tables in FROM lists and JOINs."""
+    refs = [part for m in _FROM_LIST_RE.finditer(sql) for part in m.group(1).split(",")]
+    refs += [m.group(1) for m in _JOIN_RE.finditer(sql)]
+    aliases = {}
+    for ref in refs:
+        m = _TABLE_REF_RE.match(ref)
+        if m is None:
+            continue  # subquery or expression
+        table, alias = m.group(1).split(".")[-1], m.group(2)
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+class SQLGuard:
+    def __init__(self, dialect: str, config: Dict | None = None):
+        cfg = config or {}
+        self.dialect = dialect  # SQLAlchemy dialect name, or "duckdb"
+        self.inject_limit = bool(cfg.get("inject_limit", True))
+        self.max_plan_rows = float(cfg.get("max_plan_rows", 10_000_000))
+        self.max_plan_cost = float(cfg.get("max_plan_cost", 1_000_000))
+        self.statement_timeout_s = float(cfg.get("statement_timeout_s", 5))
+        self._rowcounts: Dict[str, tuple] = {}  # table -> (estimate, measured_at)
+
+    # ---------------- Rewrite ----------------
+    def prepare(self, sql: str, limit: int) -> str:
+        return add_limit(sql, limit) if self.inject_limit else sql.strip().rstrip(";")
+
+    # ---------------- Plan check ----------------
+    def check(self, conn, sql: str):
+        """Raise QueryRejected if the plan is over this connector's limits."""
+        if self.dialect == "sqlite":
+            est = self._sqlite_estimate(conn, sql)
+            if est is not None and est > self.max_plan_rows:
+                raise QueryRejected(
+                    f"query rejected by cost guard: ~{int(est):,} row visits > {int(self.max_plan_rows):,} "
+                    "(full scans / unindexed joins); add filters or join conditions"
+                )
+        elif self.dialect in ("postgresql", "mysql", "mariadb"):
+            cost = self._planner_cost(conn, sql)
+            if cost is not None and cost > self.max_plan_cost:
+                raise QueryRejected(
+                    f"query rejected by cost guard: planner cost {cost:,.0f} > {self.max_plan_cost:,.0f}"
+                )
+
+    def _sqlite_estimate(self, conn, sql: str) -> Optional[float]:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        aliases = _table_aliases(sql)
+
+        # rows sharing a parent are nested loops of one SELECT: multiply; separate SELECTs add up
+        nests: Dict[int, float] = {}
+        for _id, parent, _unused, detail in plan:
+            m = _SCAN_RE.match(detail)
+            if m is None:
+                continue  # SEARCH (index lookup), temp b-trees, co-routines...
+            table = aliases.get(m.group(1).lower())
+            rows = self._rowcount(conn, table) if table else None
+            if rows is None:
+                continue  # subquery / CTE / unknown: its own plan rows are counted where they scan
+            nests[parent] = nests.get(parent, 1.0) * max(rows, 1)
+        return sum(nests.values()) if nests else None
+
+    def _rowcount(self, conn, table: str) -> Optional[int]:
+        cached = self._rowcounts.get(table)
+        if cached and time.time() - cached[1] < _ROWCOUNT_TTL_S:
+            return cached[0]
+        try:
+            # max(rowid) is an O(log n) upper bound; count(*) would itself be a full scan
+            est = int(conn.exec_driver_sql(f'SELECT max(rowid) FROM "{table}"').scalar() or 0)
+        except Exception:
+            est = None  # view or WITHOUT ROWID table
+        self._rowcounts[table] = (est, time.time())
+        return est
+
+    def _planner_cost(self, conn, sql: str) -> Optional[float]:
+        try:
+            if self.dialect == "postgresql":
+                raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+                plan = raw if isinstance(raw, list) else json.loads(raw)
+                return float(plan[0]["Plan"]["Total Cost"])
+            raw = conn.exec_driver_sql(f"EXPLAIN FORMAT=JSON {sql}").scalar()
+            return float(json.loads(raw)["query_block"]["cost_info"]["query_cost"])
+        except Exception as e:
+            print(f"[SQLGuard] EXPLAIN failed, skipping plan check: {type(e).__name__}: {e}")
+            return None
+
+    # ---------------- Timeout ----------------
+    @contextmanager
+    def statement_timeout(self, conn):
+        """Abort the statement(s) run inside this block after statement_timeout_s."""
+        limit = self.statement_timeout_s
+        if limit <= 0:
+            yield
+            return
+        if self.dialect == "duckdb":
+            # conn is a DuckDB cursor; interrupt() aborts its running query from another thread
+            timer = threading.Timer(limit, conn.interrupt)
+            timer.daemon = True
+            timer.start()
+            try:
+                yield
+            finally:
+                timer.cancel()
+            return
+        if self.dialect == "sqlite":
+            set_handler = conn.connection.driver_connection.set_progress_handler
+            if inspect.iscoroutinefunction(set_handler):
+                # aiosqlite, reached through AsyncConnection.run_sync()
+                set_handler = lambda *args, _set=set_handler: await_only(_set(*args))
+            deadline = time.monotonic() + limit
+            # called every N VM instructions; a non-zero return interrupts the query
+            set_handler(lambda: int(time.monotonic() > deadline), 10000)
+            try:
+                yield
+            finally:
+                set_handler(None, 0)
+            return
+        if self.dialect == "postgresql":
+            # SET LOCAL ends with the transaction, before the connection returns to the pool
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(limit * 1000)}"))
+            yield
+            return
+        if self.dialect in ("mysql", "mariadb"):
+            # session variables outlive this query on a pooled connection: restore in finally
+            var, value = (("max_statement_time", limit) if self.dialect == "mariadb"
+                          else ("max_execution_time", int(limit * 1000)))
+            previous = conn.execute(text(f"SELECT @@SESSION.{var}")).scalar()
+            conn.execute(text(f"SET SESSION {var} = {value}"))
+            try:
+                yield
+            finally:
+                conn.execute(text(f"SET SESSION {var} = {previous}"))
+            return
+        yield
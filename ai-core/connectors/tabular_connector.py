@@ -0,0 +1,152 @@
+# connectors/tabular_connector.py
+"""
+CSV/Parquet files as SQL tables, queried in-process with DuckDB.
+
+Every file under root_dir becomes a view named after the file
+(`dues_2024.csv` -> dues_2024) that scans the file on each query, so
+aggregates ("total dues per department") run vectorised over the whole
+file instead of over a few hundred embedded row snippets. schema() uses the
+same {"table": {"description", "fields"}} format as SQLConnector, so
+LLMQueryBuilder treats this connector as SQL.
+
+Queries come from the LLM, so the DuckDB connection is sandboxed: file
+access is limited to root_dir (no read_text('/etc/passwd')), external
+access is off and the configuration is locked. Each query also goes
+through SQLGuard for the LIMIT/row budget and statement timeout.
+"""
+
+import os
+import re
+import asyncio
+import threading
+from typing import Dict, List
+
+from connectors.base import BaseConnector
+from connectors.results import RowList
+from connectors.sql_guard import SQLGuard
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+_READERS = {
+    ".csv": "read_csv_auto",
+    ".tsv": "read_csv_auto",
+    ".parquet": "read_parquet",
+}
+
+
+def _table_name(path: str, taken: set) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = re.sub(r"\W+", "_", stem).strip("_").lower() or "table"
+    if name[0].isdigit():
+        name = f"t_{name}"
+    base, i = name, 2
+    while name in taken:
+        name, i = f"{base}_{i}", i + 1
+    return name
+
+
+def _quote(s: str) -> str:
+    return s.replace("'", "''")
+
+
+class TabularConnector(BaseConnector):
+    """
+    Active connector over local tabular files. Config:
+        root_dir:    directory scanned for files
+        extensions:  default [".csv", ".parquet"]
+        max_rows:    cap on rows returned per query (default 500)
+        materialize: load files into DuckDB tables once instead of scanning them per query
+        tables:      optional {table: {description: ...}} overrides
+        guard:       inject_limit / statement_timeout_s (see connectors/sql_guard.py)
+    """
+
+    def __init__(self, name, config):
+        super().__init__(name, config)
+        if duckdb is None:
+            raise ImportError("[TabularConnector] requires the 'duckdb' package")
+        self.root_dir = config["root_dir"]
+        self.exts = tuple(config.get("extensions", [".csv", ".parquet"]))
+        self.max_rows = int(config.get("max_rows", 500))
+        self.materialize = bool(config.get("materialize", False))
+        self.guard = SQLGuard("duckdb", config.get("guard"))
+        self._con = duckdb.connect(database=":memory:")
+        self._sandbox()
+        self._lock = threading.Lock()
+        self._tables: Dict[str, str] = {}   # table -> file path
+        self._schema: Dict[str, dict] = {}
+        self.refresh()
+
+    def _sandbox(self):
+        """Only root_dir is readable; settings can't be changed back by a query."""
+        root = _quote(os.path.abspath(self.root_dir))
+        self._con.execute(f"SET allowed_directories = ['{root}']")
+        self._con.execute("SET enable_external_access = false")
+        self._con.execute("SET lock_configuration = true")
+
+    # -------------- Registration --------------
+    def refresh(self):
+        """(Re)register every tabular file under root_dir."""
+        paths = []
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for fn in sorted(filenames):
+                if fn.lower().endswith(self.exts):
+                    paths.append(os.path.join(dirpath, fn))
+
+        overrides = self.config.get("tables") or {}
+        tables, schema = {}, {}
+        with self._lock:
+            for old in self._tables:
+                self._con.execute(f'DROP VIEW IF EXISTS "{old}"')
+                self._con.execute(f'DROP TABLE IF EXISTS "{old}"')
+            for p in sorted(paths):
+                reader = _READERS.get(os.path.splitext(p)[1].lower())
+                if reader is None:
+                    continue
+                name = _table_name(p, set(tables))
+                kind = "TABLE" if self.materialize else "VIEW"
+                try:
+                    self._con.execute(f"CREATE {kind} \"{name}\" AS SELECT * FROM {reader}('{_quote(os.path.abspath(p))}')")
+                    cols = [row[0] for row in self._con.execute(f'DESCRIBE "{name}"').fetchall()]
+                except Exception as e:
+                    print(f"[TabularConnector] Skipping {p}: {type(e).__name__}: {e}")
+                    continue
+                tables[name] = p
+                desc = (overrides.get(name) or {}).get("description") or f"Rows of {os.path.basename(p)}"
+                schema[name] = {"description": desc, "fields": cols}
+            self._tables, self._schema = tables, schema
+        print(f"[TabularConnector] Registered {len(tables)} tables under {self.root_dir}")
+
+    def schema(self):
+        """Tables and columns in the SQL `fields` format (for LLM QueryBuilder)."""
+        return self._schema
+
+    # -------------- Queries --------------
+    def execute(self, query: str) -> List[dict]:
+        """Run a SELECT over the registered files; at most max_rows rows come back."""
+        if not query or not query.strip().lower().startswith("select"):
+            raise ValueError("Only SELECT statements are allowed.")
+        # one row past the budget tells us whether the result was cut
+        query = self.guard.prepare(query, self.max_rows + 1)
+
+        with self._lock:
+            cur = self._con.cursor()  # per-call cursor; DuckDB connections aren't shared across threads
+        try:
+            with self.guard.statement_timeout(cur):
+                result = cur.execute(query)
+                columns = [d[0] for d in result.description]
+                fetched = result.fetchmany(self.max_rows + 1)
+        finally:
+            cur.close()
+        rows = RowList(dict(zip(columns, row)) for row in fetched[: self.max_rows])
+        rows.truncated = len(fetched) > self.max_rows
+        return rows
+
+    async def execute_async(self, query: str):
+        return await asyncio.to_thread(self.execute, query)
+
+    def close(self):
+        with self._lock:
+            self._con.close()
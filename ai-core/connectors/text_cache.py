@@ -0,0 +1,106 @@
+# connectors/text_cache.py
+"""
+On-disk cache of extracted document text (PDF/DOCX).
+
+Each entry is one file named after sha1(file content) and the extractor
+version, so an edited file, a PyPDF2 upgrade or a chunking change all miss
+naturally and nothing needs invalidating. The payload is the cleaned
+(loc, text) chunk list as length-prefixed UTF-8 strings, compressed with
+zstd when `zstandard` is installed (zlib otherwise). Writes go through a
+temp file + rename, so API workers and pool processes can share one cache
+directory.
+
+Environment overrides:
+    CB_TEXT_CACHE_DIR = "data/text_cache"  ("" disables the cache)
+"""
+
+import os
+import zlib
+import struct
+import hashlib
+from typing import List, Optional, Tuple
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+DEFAULT_DIR = os.getenv("CB_TEXT_CACHE_DIR", "data/text_cache")
+
+_MAGIC = b"CBTX"
+_FORMAT = 1
+_CODEC_ZLIB, _CODEC_ZSTD = 0, 1
+_LEN = struct.Struct("<I")
+
+
+def _encode(chunks: List[Tuple[str, str]]) -> bytes:
+    parts = [_LEN.pack(len(chunks))]
+    for loc, text in chunks:
+        for s in (loc, text):
+            b = s.encode("utf-8")
+            parts.append(_LEN.pack(len(b)))
+            parts.append(b)
+    return b"".join(parts)
+
+
+def _decode(raw: bytes) -> List[Tuple[str, str]]:
+    (n,), pos = _LEN.unpack_from(raw, 0), _LEN.size
+    out = []
+    for _ in range(n):
+        pair = []
+        for _ in range(2):
+            (size,) = _LEN.unpack_from(raw, pos)
+            pos += _LEN.size
+            pair.append(raw[pos:pos + size].decode("utf-8"))
+            pos += size
+        out.append((pair[0], pair[1]))
+    return out
+
+
+class TextCache:
+    def __init__(self, root: str = DEFAULT_DIR):
+        self.root = root
+
+    def _path(self, content_hash: str, extractor: str) -> str:
+        tag = hashlib.sha1(extractor.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.root, content_hash[:2], f"{content_hash}-{tag}.bin")
+
+    def get(self, content_hash: str, extractor: str) -> Optional[List[Tuple[str, str]]]:
+        try:
+            with open(self._path(content_hash, extractor), "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        try:
+            if blob[:4] != _MAGIC or blob[4] != _FORMAT:
+                return None
+            body = blob[6:]
+            if blob[5] == _CODEC_ZSTD:
+                if zstd is None:
+                    return None
+                raw = zstd.ZstdDecompressor().decompress(body)
+            else:
+                raw = zlib.decompress(body)
+            return _decode(raw)
+        except Exception:
+            return None  # truncated/corrupt entry: treat as a miss, it gets rewritten
+
+    def put(self, content_hash: str, extractor: str, chunks: List[Tuple[str, str]]):
+        path = self._path(content_hash, extractor)
+        raw = _encode(chunks)
+        if zstd is not None:
+            codec, body = _CODEC_ZSTD, zstd.ZstdCompressor(level=3).compress(raw)
+        else:
+            codec, body = _CODEC_ZLIB, zlib.compress(raw, 6)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(_MAGIC + bytes((_FORMAT, codec)) + body)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[TextCache] write failed for {path}: {type(e).__name__}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -81,7 +81,8 @@ def log_trace(data: Dict[str, Any]) -> str:
           "context": " • client: ACME; amount: 1200 ...",
           "model": "llama3",
           "answer": "ACME owes 1200. Sources: ...",
-          "elapsed_ms": 1234
+          "elapsed_ms": 1234,
+          "cache": {"sources": {"sql_connector": "hit"}, "hits": 1, "misses": 0, "hit_rate": 1.0}
         }
     """
     logger = _ensure_logger()
@@ -99,6 +100,7 @@ def log_trace(data: Dict[str, Any]) -> str:
         "model": data.get("model"),
         "answer": data.get("answer"),
         "elapsed_ms": int(data.get("elapsed_ms") or 0),
+        "cache": data.get("cache") or {},
     }
     logger.write(record)
     return trace_id
@@ -155,17 +157,22 @@ class _SQLiteLogger(_BaseLogger):
                     context     TEXT,
                     model       TEXT,
                     answer      TEXT,
-                    elapsed_ms  INTEGER
+                    elapsed_ms  INTEGER,
+                    cache       TEXT   -- JSON
                 );
             """)
+            # databases created before the cache column existed
+            cols = {row[1] for row in con.execute("PRAGMA table_info(traces);")}
+            if "cache" not in cols:
+                con.execute("ALTER TABLE traces ADD COLUMN cache TEXT;")
             con.execute("CREATE INDEX IF NOT EXISTS idx_traces_ts ON traces(ts);")
 
     def write(self, record: Dict[str, Any]) -> None:
         with self._conn() as con:
             con.execute("""
                 INSERT OR REPLACE INTO traces
-                (trace_id, ts, user, query, profile, queries, citations, context, model, answer, elapsed_ms)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                (trace_id, ts, user, query, profile, queries, citations, context, model, answer, elapsed_ms, cache)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """, (
                 record.get("trace_id"),
                 record.get("ts"),
@@ -178,6 +185,7 @@ class _SQLiteLogger(_BaseLogger):
                 record.get("model"),
                 record.get("answer"),
                 int(record.get("elapsed_ms") or 0),
+                json.dumps(record.get("cache") or {}, ensure_ascii=False),
             ))
 
     def read(self, trace_id: str) -> Optional[Dict[str, Any]]:
@@ -191,6 +199,7 @@ class _SQLiteLogger(_BaseLogger):
             # de-jsonify
             rec["queries"]   = json.loads(rec.get("queries") or "{}")
             rec["citations"] = json.loads(rec.get("citations") or "[]")
+            rec["cache"]     = json.loads(rec.get("cache") or "{}")
             return rec
 
     def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
@@ -206,6 +215,7 @@ class _SQLiteLogger(_BaseLogger):
                 rec = dict(zip(cols, row))
                 rec["queries"]   = json.loads(rec.get("queries") or "{}")
                 rec["citations"] = json.loads(rec.get("citations") or "[]")
+                rec["cache"]     = json.loads(rec.get("cache") or "{}")
                 out.append(rec)
             return out
 
@@ -0,0 +1,139 @@
+# indexer/batcher.py
+"""
+Async micro-batching front-end for EmbeddingModel.
+
+Concurrent requests call `await batcher.embed(texts)`. Their texts are
+collected for up to CB_EMBED_MAX_WAIT_MS (or until CB_EMBED_BATCH_SIZE texts
+are pending), encoded as one batch on a dedicated worker thread, and the
+vectors are handed back to each caller. The event loop never blocks on
+encode(), and many small encode() calls become a few large ones.
+
+Environment overrides:
+    CB_EMBED_BATCH_SIZE  = texts per encode() call before flushing early (default 64)
+    CB_EMBED_MAX_WAIT_MS = how long to wait for more texts            (default 5)
+    CB_EMBED_MAX_QUEUE   = pending embed() calls before callers wait  (default 1024)
+"""
+
+from __future__ import annotations
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+_DEFAULT_MAX_BATCH = int(os.getenv("CB_EMBED_BATCH_SIZE", "64"))
+_DEFAULT_MAX_WAIT_MS = float(os.getenv("CB_EMBED_MAX_WAIT_MS", "5"))
+_DEFAULT_MAX_QUEUE = int(os.getenv("CB_EMBED_MAX_QUEUE", "1024"))
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        embedder,
+        max_batch: int = _DEFAULT_MAX_BATCH,
+        max_wait_ms: float = _DEFAULT_MAX_WAIT_MS,
+        max_queue: int = _DEFAULT_MAX_QUEUE,
+    ):
+        self.embedder = embedder
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batcher")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # metrics
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.encode_ms = 0.0
+        self.wait_ms = 0.0
+
+    # ---------------- Public API ----------------
+    async def embed(self, texts) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        if not texts:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.embedder.embed, texts)
+
+        queue = self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        await queue.put((texts, fut, time.perf_counter()))
+        return await fut
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_encode_ms": round(self.encode_ms / self.batches, 2) if self.batches else 0.0,
+            "avg_queue_wait_ms": round(self.wait_ms / self.requests, 2) if self.requests else 0.0,
+        }
+
+    # ---------------- Worker ----------------
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def _next_batch(self) -> List[Tuple[list, asyncio.Future, float]]:
+        queue = self._queue
+        batch = [await queue.get()]
+        pending = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while pending < self.max_batch:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            pending += len(item[0])
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            flat = [t for texts, _, _ in batch for t in texts]
+            t0 = time.perf_counter()
+            try:
+                vecs = await loop.run_in_executor(self._executor, self.embedder.embed, flat)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            t1 = time.perf_counter()
+
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(flat))
+            self.encode_ms += (t1 - t0) * 1000.0
+            offset = 0
+            for texts, fut, queued_at in batch:
+                self.requests += 1
+                self.texts += len(texts)
+                self.wait_ms += (t0 - queued_at) * 1000.0
+                if not fut.done():
+                    fut.set_result(vecs[offset:offset + len(texts)])
+                offset += len(texts)
@@ -0,0 +1,38 @@
+# indexer/build_snapshot.py
+"""
+Build a fresh corpus snapshot offline from the passive connectors in
+connectors.yaml, then atomically make it current. A running API picks it up
+with POST /index/reload (ContextIndexer.reload_snapshot()).
+
+Usage:
+    python -m indexer.build_snapshot [--connectors connectors/connectors.yaml] [--out data/context_store]
+"""
+
+import argparse
+import yaml
+
+from connectors.files_connector import FilesConnector
+from indexer.indexer import ContextIndexer, _DEFAULT_SNAPSHOT_DIR
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--connectors", default="connectors/connectors.yaml")
+    ap.add_argument("--out", default=_DEFAULT_SNAPSHOT_DIR or "data/context_store")
+    args = ap.parse_args()
+
+    conf = yaml.safe_load(open(args.connectors, "r"))["connectors"]
+    indexer = ContextIndexer(llm_builder=None, snapshot_dir=args.out, load_snapshot=False)
+
+    for name, spec in conf.items():
+        if str(spec.get("type", "")).lower() != "files":
+            continue
+        conn = FilesConnector(name, spec)
+        indexer.sync_files(name, conn, persist=False, etag=conn.etag())
+
+    snap_dir = indexer.save_snapshot()
+    print(f"[build_snapshot] {len(indexer.store)} docs -> {snap_dir}")
+
+
+if __name__ == "__main__":
+    main()
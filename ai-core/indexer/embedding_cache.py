@@ -0,0 +1,123 @@
+# indexer/embedding_cache.py
+"""
+Persistent embedding cache: vectors in SQLite keyed by (model, sha1(text)),
+reused across requests, processes and restarts; LRU-evicted past max_entries.
+"""
+
+from __future__ import annotations
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable
+
+import numpy as np
+
+from utils.shared_cache import CacheStats, SharedCache
+
+_DEFAULT_PATH = os.getenv("CB_EMBED_CACHE_PATH", "data/embedding_cache.db")  # "" disables
+_DEFAULT_MAX_ENTRIES = int(os.getenv("CB_EMBED_CACHE_MAX", "500000"))      # ~770MB at dim 384
+
+_SQL_BATCH = 500          # stay below SQLite's bound-parameter limit
+_EVICT_SLACK = 0.1        # evict down to 90% of max so we don't evict on every put
+
+def text_key(text: str) -> str:
+    """Content hash used as cache key (model name is stored alongside)."""
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingCache(CacheStats):
+    def __init__(self, path: str, max_entries: int = _DEFAULT_MAX_ENTRIES):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._init_db()
+        self._count = self._con.execute("SELECT COUNT(*) FROM embeddings;").fetchone()[0]
+
+    def _init_db(self):
+        with self._con:
+            self._con.execute("PRAGMA journal_mode=WAL;")
+            self._con.execute("PRAGMA synchronous=NORMAL;")
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    id         INTEGER PRIMARY KEY,
+                    model      TEXT NOT NULL,
+                    key        TEXT NOT NULL,
+                    dim        INTEGER NOT NULL,
+                    vec        BLOB NOT NULL,   -- float32, little endian
+                    last_used  INTEGER NOT NULL
+                );
+            """)
+            self._con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_key ON embeddings(model, key);")
+            self._con.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings(last_used);")
+
+    def __len__(self):
+        return self._count
+
+    def get_many(self, model: str, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return {key: vector} for the keys present; refreshes their LRU stamp."""
+        keys = list(dict.fromkeys(keys))
+        out: Dict[str, np.ndarray] = {}
+        if not keys:
+            return out
+        now = time.time_ns()
+        with self._lock, self._con:
+            for i in range(0, len(keys), _SQL_BATCH):
+                chunk = keys[i:i + _SQL_BATCH]
+                marks = ",".join("?" * len(chunk))
+                rows = self._con.execute(
+                    f"SELECT id, key, vec FROM embeddings WHERE model = ? AND key IN ({marks});",
+                    [model, *chunk],
+                ).fetchall()
+                for _, key, vec in rows:
+                    out[key] = np.frombuffer(vec, dtype="<f4")
+                if rows:
+                    self._con.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE id = ?;",
+                        [(now, rid) for rid, _, _ in rows],
+                    )
+            self.hits += len(out)
+            self.misses += len(keys) - len(out)
+        return out
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        now = time.time_ns()
+        rows = [
+            (model, key, int(vec.shape[-1]), np.asarray(vec, dtype="<f4").tobytes(), now)
+            for key, vec in items.items()
+        ]
+        with self._lock, self._con:
+            before = self._con.total_changes
+            self._con.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, key, dim, vec, last_used) VALUES (?, ?, ?, ?, ?);",
+                rows,
+            )
+            self._count += self._con.total_changes - before
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        target = int(self.max_entries * (1 - _EVICT_SLACK))
+        n = self._count - target
+        self._con.execute(
+            "DELETE FROM embeddings WHERE id IN (SELECT id FROM embeddings ORDER BY last_used LIMIT ?);",
+            (n,),
+        )
+        self._count = self._con.execute("SELECT COUNT(*) FROM embeddings;").fetchone()[0]
+
+    def _usage(self) -> dict:
+        return {"entries": self._count, "max_entries": self.max_entries}
+
+
+_default = SharedCache("EmbeddingCache", lambda: EmbeddingCache(_DEFAULT_PATH, _DEFAULT_MAX_ENTRIES),
+                       enabled=bool(_DEFAULT_PATH))
+get_default_cache = _default.get
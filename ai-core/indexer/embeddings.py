@@ -1,13 +1,186 @@
 # indexer/embeddings.py
-from sentence_transformers import SentenceTransformer
+"""
+Sentence embeddings for indexing and retrieval.
+
+Inference backends (CB_EMBED_BACKEND or EmbeddingModel(backend=...)):
+    torch          - PyTorch fp32 (reference)
+    onnx           - ONNX Runtime fp32
+    onnx-int8      - ONNX Runtime, dynamically quantized int8 weights
+    openvino       - OpenVINO fp32
+    openvino-int8  - OpenVINO int8
+
+The ONNX/OpenVINO variants use the exported files shipped in the model repo
+(sentence-transformers >= 3.2, `pip install sentence-transformers[onnx]` or
+`[openvino]`). CB_EMBED_MODEL_FILE overrides which exported file is loaded.
+See benchmarks/embedding_backends.py for throughput and drift vs. torch.
+
+Models are loaded on first use, not at import or construction, and
+get_embedding_model() hands every caller in the process the same instance,
+so importing the API server stays cheap and the weights live in memory once.
+"""
+
+import os
+import time
+import threading
 import numpy as np
 
+from indexer.embedding_cache import EmbeddingCache, get_default_cache, text_key
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+
+_DEFAULT_BACKEND = os.getenv("CB_EMBED_BACKEND", "torch").lower()
+_MODEL_FILE = os.getenv("CB_EMBED_MODEL_FILE", "")
+
+
+def _cpu_flags() -> set:
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def _int8_onnx_file() -> str:
+    """Pick the quantized export matching this CPU's int8 instructions."""
+    flags = _cpu_flags()
+    if "avx512_vnni" in flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx512f" in flags or "avx512bw" in flags:
+        return "onnx/model_qint8_avx512.onnx"
+    if "avx2" in flags:
+        return "onnx/model_quint8_avx2.onnx"
+    return "onnx/model_qint8_arm64.onnx"
+
+
+def load_sentence_transformer(model_name: str, backend: str, model_file: str = ""):
+    """Instantiate SentenceTransformer for one of BACKENDS."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend!r} (use one of {BACKENDS})")
+    from sentence_transformers import SentenceTransformer  # heavy (torch); import on first load
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    engine, _, precision = backend.partition("-")
+    file_name = model_file
+    if not file_name and precision == "int8":
+        file_name = _int8_onnx_file() if engine == "onnx" else "openvino/openvino_model_qint8_quantized.xml"
+    model_kwargs = {"file_name": file_name} if file_name else None
+    return SentenceTransformer(model_name, backend=engine, model_kwargs=model_kwargs)
+
+
 class EmbeddingModel:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    """
+    SentenceTransformer wrapper. When a cache is available (see
+    indexer/embedding_cache.py), embed() only encodes texts it has not seen.
+    Pass cache=False to always encode.
+
+    The model itself is loaded on first encode (or warm_up()); use
+    get_embedding_model() rather than constructing one per component.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL,
+                 cache: EmbeddingCache | bool | None = None,
+                 backend: str | None = None, model_file: str | None = None):
+        self.model_name = model_name
+        self.backend = (backend or _DEFAULT_BACKEND).lower()
+        self.model_file = _MODEL_FILE if model_file is None else model_file
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.load_s: float | None = None
+        # vectors differ slightly per backend, so each gets its own cache namespace
+        self.cache_key = model_name if self.backend == "torch" else f"{model_name}@{self.backend}:{self.model_file}"
+        self._cache = cache  # None/True: the process-wide default, resolved on first use
+
+    @property
+    def cache(self) -> EmbeddingCache | None:
+        if self._cache is None or self._cache is True:
+            # opening the default cache touches disk; don't do it at construction
+            self._cache = get_default_cache() or False
+        return self._cache or None
+
+    @cache.setter
+    def cache(self, cache: EmbeddingCache | bool | None):
+        self._cache = cache
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    t0 = time.perf_counter()
+                    model = load_sentence_transformer(self.model_name, self.backend, self.model_file)
+                    self.load_s = time.perf_counter() - t0
+                    self._model = model
+                    print(f"[EmbeddingModel] Loaded {self.cache_key} in {self.load_s:.1f}s")
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self):
+        """Load the model and run one encode so the first request pays nothing."""
+        self._encode(["warm-up"])
+
+    def _encode(self, texts):
+        emb = self.model.encode(texts, normalize_embeddings=True)
+        return np.array(emb, dtype="float32")
 
     def embed(self, texts):
         if isinstance(texts, str):
             texts = [texts]
-        emb = self.model.encode(texts, normalize_embeddings=True)
-        return np.array(emb, dtype="float32")
+        cache = self.cache
+        if cache is None or not texts:
+            return self._encode(texts)
+
+        keys = [text_key(t) for t in texts]
+        try:
+            found = cache.get_many(self.cache_key, keys)
+        except Exception as e:
+            print(f"[EmbeddingModel] cache read failed: {type(e).__name__}: {e}")
+            return self._encode(texts)
+
+        # encode each missing text once, even if it repeats within the batch
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            vecs = self._encode(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vecs))
+            found.update(fresh)
+            try:
+                cache.put_many(self.cache_key, fresh)
+            except Exception as e:
+                print(f"[EmbeddingModel] cache write failed: {type(e).__name__}: {e}")
+
+        return np.vstack([found[k] for k in keys]).astype("float32", copy=False)
+
+
+# ---------------- Shared registry ----------------
+_REGISTRY: dict = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_embedding_model(model_name: str = DEFAULT_MODEL, backend: str | None = None,
+                        model_file: str | None = None) -> EmbeddingModel:
+    """Process-wide EmbeddingModel for (model, backend, file); created lazily, loaded on first use."""
+    backend = (backend or _DEFAULT_BACKEND).lower()
+    model_file = _MODEL_FILE if model_file is None else model_file
+    key = (model_name, backend, model_file)
+    with _REGISTRY_LOCK:
+        model = _REGISTRY.get(key)
+        if model is None:
+            model = _REGISTRY[key] = EmbeddingModel(model_name, backend=backend, model_file=model_file)
+        return model
+
+
+def registry_status() -> list:
+    with _REGISTRY_LOCK:
+        models = list(_REGISTRY.values())
+    return [{"model": m.cache_key, "loaded": m.is_loaded, "load_s": m.load_s} for m in models]
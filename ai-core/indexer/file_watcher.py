@@ -0,0 +1,74 @@
+# indexer/file_watcher.py
+"""
+Background sync of a file connector into the live corpus store.
+
+A daemon thread calls ContextIndexer.sync_files() every `interval_s`
+seconds (a stat-only scan when nothing changed). If the optional `watchdog`
+package is installed, filesystem events (inotify on Linux) trigger a sync
+right away, debounced so an editor's save burst becomes one sync. Parsing
+and embedding happen on this thread; queries only wait for the brief
+store add/remove.
+"""
+
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+_DEBOUNCE_S = 0.5
+
+
+class _Poke(FileSystemEventHandler):
+    def __init__(self, wake: threading.Event):
+        self.wake = wake
+
+    def on_any_event(self, event):
+        self.wake.set()
+
+
+class FileWatcher(threading.Thread):
+    def __init__(self, indexer, source: str, conn, interval_s: float = 5.0):
+        super().__init__(name=f"file-watch-{source}", daemon=True)
+        self.indexer = indexer
+        self.source = source
+        self.conn = conn
+        self.interval_s = max(0.1, float(interval_s))
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._observer = None
+
+    def _start_observer(self):
+        if Observer is None:
+            return
+        try:
+            self._observer = Observer()
+            self._observer.schedule(_Poke(self._wake), self.conn.root_dir, recursive=True)
+            self._observer.start()
+        except Exception as e:
+            self._observer = None
+            print(f"[FileWatcher] {self.source}: no fs events, polling only ({type(e).__name__}: {e})")
+
+    def run(self):
+        self._start_observer()
+        mode = "events + polling" if self._observer is not None else "polling"
+        print(f"[FileWatcher] Watching {self.conn.root_dir} for {self.source} ({mode}, every {self.interval_s}s)")
+        while not self._stop_event.is_set():
+            try:
+                # taken before the scan, so an edit during the sync moves it again
+                etag = self.conn.etag() if hasattr(self.conn, "etag") else None
+                self.indexer.sync_files(self.source, self.conn, etag=etag)
+            except Exception as e:
+                print(f"[FileWatcher] {self.source} sync failed: {type(e).__name__}: {e}")
+            if self._wake.wait(self.interval_s):
+                self._stop_event.wait(_DEBOUNCE_S)
+                self._wake.clear()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
@@ -1,42 +1,196 @@
 # indexer/indexer.py
-import hashlib
-from typing import List, Dict
+import os
+import queue
+import asyncio
+import threading
+from typing import Dict, Iterable, List
 from indexer.textifier import Textifier
-from indexer.embeddings import EmbeddingModel
-from indexer.storage_faiss import FaissStore
+from indexer.embeddings import get_embedding_model
+from indexer.batcher import EmbeddingBatcher
+from indexer.storage_faiss import FaissStore, doc_id
+from indexer.lexical import entity_terms, tokenize
+from indexer.file_watcher import FileWatcher
+
+# Where the passive corpus is snapshotted; "" disables persistence
+_DEFAULT_SNAPSHOT_DIR = os.getenv("CB_SNAPSHOT_DIR", "data/context_store")
+# "hybrid" (BM25 + vector, RRF-fused) | "vector" | "lexical"
+_DEFAULT_RETRIEVAL_MODE = os.getenv("CB_RETRIEVAL_MODE", "hybrid").lower()
+_RRF_K = 60  # standard reciprocal-rank-fusion damping constant
+# Corpus seeding streams docs through embed+add in batches of this size,
+# with at most this many batches buffered ahead of the embedder
+_SEED_BATCH_SIZE = int(os.getenv("CB_SEED_BATCH_SIZE", "256"))
+_SEED_QUEUE_BATCHES = int(os.getenv("CB_SEED_QUEUE_BATCHES", "4"))
 
 
 class ContextIndexer:
     """
     Handles indexing and retrieval for all connectors.
     Supports both active sources (SQL/REST) and passive sources (e.g. files).
+
+    Passive sources live in a long-lived corpus store (``self.store``).
+    Active results are indexed into a per-request scratch store returned by
+    ``index_results`` and merged with the corpus at retrieval time, so rows
+    from one request never accumulate in (or leak into) the next one.
+
+    The corpus store is snapshotted to ``snapshot_dir`` after each seed and
+    memory-mapped back on start, so a restart skips re-parsing/re-embedding.
     """
 
-    def __init__(self, llm_builder, dim: int = 384):
+    def __init__(self, llm_builder, dim: int = 384, snapshot_dir: str | None = None, load_snapshot: bool = True):
+        self.dim = dim
         self.textifier = Textifier(llm_builder)
-        self.embedder = EmbeddingModel()
-        self.store = FaissStore(dim)
+        self.embedder = get_embedding_model()  # shared across indexers, loaded on first embed
+        self.batcher = EmbeddingBatcher(self.embedder)  # coalesces embeds from concurrent requests
+        self.snapshot_dir = _DEFAULT_SNAPSHOT_DIR if snapshot_dir is None else snapshot_dir
+        self.retrieval_mode = _DEFAULT_RETRIEVAL_MODE
+        self.store = FaissStore(dim, path=self.snapshot_dir)  # long-lived passive corpus
         self._seeded_sources = set()
-        self._doc_seen = set()  # prevent duplicate embedding of same file chunks
+        self._file_manifests: Dict[str, dict] = {}  # source -> manifest the store reflects
+        self._source_etags: Dict[str, str] = {}     # source -> connector etag the store reflects
+        self._sync_lock = threading.Lock()
+        self._watchers: Dict[str, FileWatcher] = {}
+        if self.snapshot_dir and load_snapshot:
+            self.reload_snapshot()
+
+    # ---------------- Snapshots ----------------
+    def save_snapshot(self) -> str | None:
+        """Persist the corpus store (and which sources it holds) as a new snapshot."""
+        if not self.snapshot_dir:
+            return None
+        return self.store.save(extra={
+            "seeded_sources": sorted(self._seeded_sources),
+            "file_manifests": self._file_manifests,
+            "source_etags": self._source_etags,
+        })
+
+    def reload_snapshot(self) -> bool:
+        """
+        Swap in the current on-disk snapshot (e.g. one freshly built by
+        `python -m indexer.build_snapshot`). The old store keeps serving until
+        the new one is fully opened. Returns False if there is none.
+        """
+        if not self.snapshot_dir:
+            return False
+        store = FaissStore(self.dim, path=self.snapshot_dir)
+        try:
+            if not store.load():
+                return False
+        except Exception as e:
+            print(f"[ContextIndexer] Ignoring unreadable snapshot in {self.snapshot_dir}: {type(e).__name__}: {e}")
+            return False
+        old, self.store = self.store, store
+        old.close()
+        self._seeded_sources = set(store.snapshot_extra.get("seeded_sources", []))
+        self._file_manifests = dict(store.snapshot_extra.get("file_manifests", {}))
+        self._source_etags = dict(store.snapshot_extra.get("source_etags", {}))
+        return True
+
+    # ---------------- Maintenance ----------------
+    def forget_source(self, source: str) -> int:
+        """Remove every corpus document of `source` so it is re-seeded on next use."""
+        removed = self.store.remove_where(source=source)
+        self._seeded_sources.discard(source)
+        self._file_manifests.pop(source, None)
+        self._source_etags.pop(source, None)
+        print(f"[ContextIndexer] Removed {removed} docs of {source}")
+        return removed
 
-    # ---------------- Utility ----------------
-    def _hash_doc(self, text: str, meta: dict) -> str:
-        h = hashlib.sha1()
-        h.update(text.encode("utf-8", errors="ignore"))
-        h.update(str(meta.get("file", "")).encode())
-        h.update(str(meta.get("loc", "")).encode())
-        h.update(str(meta.get("source", "")).encode())
-        return h.hexdigest()
+    def prune(self, max_age_s: float, source: str | None = None) -> int:
+        """Remove corpus documents not (re-)indexed within the last max_age_s seconds."""
+        removed = self.store.remove_where(source=source, older_than=max_age_s)
+        print(f"[ContextIndexer] Pruned {removed} docs older than {max_age_s}s")
+        return removed
 
     # ---------------- Passive Corpus Seeding ----------------
-    def seed_static_corpus(self, source: str, rows: list[dict], schema_text: str = ""):
+    def is_seeded(self, source: str) -> bool:
+        return source in self._seeded_sources
+
+    def source_etag(self, source: str) -> str | None:
+        """Connector etag recorded when `source` was last seeded/synced (None if unknown)."""
+        return self._source_etags.get(source)
+
+    def seed_static_corpus(self, source: str, rows: Iterable[dict], schema_text: str = "",
+                           persist: bool = True, etag: str | None = None):
         """
         Seed a static (passive) corpus like local files into the FAISS store once.
+        `rows` may be a generator; it is consumed in batches (see _index_stream).
+        With persist=True a new snapshot is written afterwards.
         """
         if source in self._seeded_sources or not rows:
             return
 
-        texts, metas = [], []
+        added, _ = self._index_stream(source, rows)
+        self._seeded_sources.add(source)
+        if etag is not None:
+            self._source_etags[source] = etag
+        if not added:
+            return
+        print(f"[ContextIndexer] Seeded {added} file docs from {source}")
+        if persist:
+            try:
+                self.save_snapshot()
+            except Exception as e:
+                print(f"[ContextIndexer] Snapshot save failed: {type(e).__name__}: {e}")
+
+    def _index_stream(self, source: str, rows, batch_size: int = _SEED_BATCH_SIZE):
+        """
+        Embed and add file rows to the corpus store in fixed-size batches.
+
+        A producer thread pulls rows (parsing as it goes) into a bounded
+        queue while this thread embeds, so memory stays at a few batches
+        whatever the corpus size and every batch is searchable as soon as
+        it is added. Returns (docs added, ids of every row seen).
+        """
+        q: queue.Queue = queue.Queue(maxsize=max(1, _SEED_QUEUE_BATCHES))
+        stop = threading.Event()
+        seen_ids = set()
+
+        def produce():
+            try:
+                batch = []
+                for text, meta, did in self._file_docs(source, rows):
+                    if stop.is_set():
+                        return
+                    seen_ids.add(did)
+                    if did in self.store:
+                        continue  # stable content id: chunk already stored
+                    batch.append((text, meta, did))
+                    if len(batch) >= batch_size:
+                        q.put(batch)
+                        batch = []
+                if batch:
+                    q.put(batch)
+            except Exception as e:
+                q.put(e)
+            finally:
+                q.put(None)
+
+        producer = threading.Thread(target=produce, name=f"seed-{source}", daemon=True)
+        producer.start()
+        added, done = 0, False
+        try:
+            while True:
+                item = q.get()
+                if item is None:
+                    done = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                texts = [t for t, _, _ in item]
+                self.store.add(self.embedder.embed(texts), texts, [m for _, m, _ in item], ids=[d for _, _, d in item])
+                added += len(item)
+        finally:
+            if not done:
+                stop.set()
+                while q.get() is not None:  # unblock the producer so it can exit
+                    pass
+            producer.join()
+        return added, seen_ids
+
+    @staticmethod
+    def _file_docs(source: str, rows: list[dict]):
+        """(text, meta, doc id) per non-empty row, first occurrence of each id only."""
+        seen = set()
         for r in rows:
             text = (r.get("text") or "").strip()
             if not text:
@@ -47,32 +201,83 @@ class ContextIndexer:
                 "file": r.get("file"),
                 "loc": r.get("loc"),
             }
-            dh = self._hash_doc(text, meta)
-            if dh in self._doc_seen:
+            did = doc_id(text, meta)
+            if did in seen:
                 continue
-            self._doc_seen.add(dh)
-            texts.append(text)
-            metas.append(meta)
+            seen.add(did)
+            yield text, meta, did
 
-        if not texts:
-            return
+    # ---------------- Incremental File Sync ----------------
+    def sync_files(self, source: str, conn, persist: bool = True, etag: str | None = None) -> dict:
+        """
+        Bring the corpus docs of a file connector in line with its directory.
 
-        emb = self.embedder.embed(texts)
-        self.store.add(emb, texts, metas)
-        self._seeded_sources.add(source)
-        print(f"[ContextIndexer] Seeded {len(texts)} file docs from {source}")
+        Only files whose content hash differs from the manifest stored with
+        the snapshot are parsed and embedded; chunks of deleted files and
+        stale chunks of edited files are removed. New vectors are added
+        before stale ones are dropped, so queries never see a file vanish.
+        `etag` (conn.etag() taken before the scan) is recorded for the source.
+        """
+        with self._sync_lock:
+            prev = self._file_manifests.get(source, {}) if source in self._seeded_sources else {}
+            manifest, changed, deleted = conn.scan_changes(prev)
+
+            stored = self.store.group_ids("file", source=source) if changed or deleted or not prev else {}
+            # files in the store but missing from the tree (e.g. no manifest yet)
+            deleted = sorted(set(deleted) | {f for f in stored if f not in manifest})
+
+            # new chunks become searchable batch by batch; stale ones go after
+            added, fresh = self._index_stream(source, conn.iter_rows(changed, manifest)) if changed else (0, set())
+            stale = [did for f in changed for did in stored.get(f, ()) if did not in fresh]
+            stale += [did for f in deleted for did in stored.get(f, ())]
+            if deleted and hasattr(conn, "forget"):
+                conn.forget(deleted)
+
+            removed = self.store.remove(stale) if stale else 0
+
+            dirty = bool(changed or deleted) or source not in self._seeded_sources
+            self._file_manifests[source] = manifest
+            self._seeded_sources.add(source)
+            if etag is not None:
+                dirty = dirty or self._source_etags.get(source) != etag
+                self._source_etags[source] = etag
+
+            stats = {"changed_files": len(changed), "deleted_files": len(deleted),
+                     "added_docs": added, "removed_docs": removed}
+            if changed or deleted:
+                print(f"[ContextIndexer] Synced {source}: {stats}")
+            if persist and dirty:
+                try:
+                    self.save_snapshot()
+                except Exception as e:
+                    print(f"[ContextIndexer] Snapshot save failed: {type(e).__name__}: {e}")
+            return stats
+
+    def watch_files(self, source: str, conn, interval_s: float = 5.0) -> "FileWatcher":
+        """Keep `source` synced in the background (see indexer/file_watcher.py)."""
+        watcher = self._watchers.get(source)
+        if watcher is None or not watcher.is_alive():
+            watcher = self._watchers[source] = FileWatcher(self, source, conn, interval_s)
+            watcher.start()
+        return watcher
+
+    def stop_watching(self):
+        for watcher in self._watchers.values():
+            watcher.stop()
+        self._watchers.clear()
 
     # ---------------- Active Source Indexing ----------------
-    def index_results(
+    def _active_docs(
             self,
             user_query: str,
             results: Dict[str, List[Dict]],
             schemas: Dict[str, str],
-            queries_by_source: Dict[str, str] | None = None,   # <-- NEW (optional)
+            queries_by_source: Dict[str, str] | None = None,
         ):
             """
-            Indexes results coming from active connectors (SQL, REST, etc.).
+            Textifies results coming from active connectors (SQL, REST, etc.).
             Also adds one LLM-grounded interpretation doc per source (optional).
+            Returns (texts, metas). Blocking: the summaries call the LLM.
             """
             texts, metas = [], []
 
@@ -117,12 +322,61 @@ class ContextIndexer:
                             # don't fail indexing if LLM summary has issues
                             print(f"[ContextIndexer] summarize_with_llm failed for {source}: {e}")
 
+            return self._dedup(texts, metas)
+
+    @staticmethod
+    def _dedup(texts: List[str], metas: List[Dict]):
+        """Drop repeated documents (same doc_id) before they are embedded."""
+        out_t, out_m, seen = [], [], set()
+        for t, m in zip(texts, metas):
+            did = doc_id(t, m)
+            if did in seen:
+                continue
+            seen.add(did)
+            out_t.append(t)
+            out_m.append(m)
+        return out_t, out_m
+
+    def _scratch_store(self, emb, texts: List[str], metas: List[Dict]) -> FaissStore:
+        scratch = FaissStore(self.dim, backend="flat")
+        scratch.add(emb, texts, metas)
+        print(f"[ContextIndexer] Indexed {len(texts)} docs from active connectors (request scope)")
+        return scratch
+
+    def index_results(
+            self,
+            user_query: str,
+            results: Dict[str, List[Dict]],
+            schemas: Dict[str, str],
+            queries_by_source: Dict[str, str] | None = None,   # <-- NEW (optional)
+        ) -> FaissStore | None:
+            """
+            Indexes results coming from active connectors (SQL, REST, etc.).
+
+            Returns a request-scoped scratch store (or None when there is nothing
+            to index). Pass it to retrieve_context_items(scratch=...); it is
+            dropped with the request instead of growing the corpus store.
+            """
+            texts, metas = self._active_docs(user_query, results, schemas, queries_by_source)
             if not texts:
-                return
+                return None
+            return self._scratch_store(self.embedder.embed(texts), texts, metas)
 
-            emb = self.embedder.embed(texts)
-            self.store.add(emb, texts, metas)
-            print(f"[ContextIndexer] Indexed {len(texts)} docs from active connectors")
+    async def index_results_async(
+            self,
+            user_query: str,
+            results: Dict[str, List[Dict]],
+            schemas: Dict[str, str],
+            queries_by_source: Dict[str, str] | None = None,
+        ) -> FaissStore | None:
+            """index_results() for the event loop: LLM summaries run in a thread, embedding via the batcher."""
+            texts, metas = await asyncio.to_thread(
+                self._active_docs, user_query, results, schemas, queries_by_source
+            )
+            if not texts:
+                return None
+            emb = await self.batcher.embed(texts)
+            return self._scratch_store(emb, texts, metas)
 
 
     # ---------------- Retrieval ----------------
@@ -131,24 +385,112 @@ class ContextIndexer:
         items = self.retrieve_context_items(user_query, top_k)
         return [it["text"] for it in items]
 
-    def retrieve_context_items(self, user_query: str, top_k: int = 10) -> List[Dict]:
+    def retrieve_context_items(
+        self,
+        user_query: str,
+        top_k: int = 10,
+        scratch: FaissStore | None = None,
+        mode: str | None = None,
+    ) -> List[Dict]:
         """
-        Returns [{text, meta, score}] for top_k matches.
+        Returns [{id, text, meta, score}] for top_k matches across the corpus
+        store and the optional request-scoped scratch store (a doc present in
+        both is returned once).
+
+        mode: "vector", "lexical" (BM25 only, no embedding) or "hybrid"
+        (default, CB_RETRIEVAL_MODE): BM25 and vector hits fused with
+        reciprocal-rank fusion. In hybrid mode, when every top lexical hit
+        contains all exact entities of the question (ids, ALL-CAPS names,
+        "quoted phrases"), the lexical hits are returned without embedding.
         Never raises; filters out invalid indices and length mismatches.
         """
+        mode = (mode or self.retrieval_mode).lower()
+        lex = self._lexical_items(user_query, top_k, scratch, mode)
+        if mode == "lexical" or self._lexical_fast_path(user_query, lex, top_k):
+            return lex[:top_k]
         try:
             q_emb = self.embedder.embed(user_query)
         except Exception:
+            return lex[:top_k]
+        return self._fuse(self._vector_items(q_emb, top_k, scratch, mode), lex, top_k)
+
+    async def retrieve_context_items_async(
+        self,
+        user_query: str,
+        top_k: int = 10,
+        scratch: FaissStore | None = None,
+        mode: str | None = None,
+    ) -> List[Dict]:
+        """retrieve_context_items() with the query embedded through the batcher."""
+        mode = (mode or self.retrieval_mode).lower()
+        lex = self._lexical_items(user_query, top_k, scratch, mode)
+        if mode == "lexical" or self._lexical_fast_path(user_query, lex, top_k):
+            return lex[:top_k]
+        try:
+            q_emb = await self.batcher.embed(user_query)
+        except Exception:
+            return lex[:top_k]
+        return self._fuse(self._vector_items(q_emb, top_k, scratch, mode), lex, top_k)
+
+    @staticmethod
+    def _fetch_k(top_k: int, mode: str) -> int:
+        # fused lists need some depth below top_k to be worth fusing
+        return top_k * 2 if mode == "hybrid" else top_k
+
+    def _vector_items(self, q_emb, top_k: int, scratch: FaissStore | None, mode: str) -> List[Dict]:
+        k = self._fetch_k(top_k, mode)
+        return self._merge_hits(scratch, lambda store: store.search(q_emb, k))
+
+    def _lexical_items(self, user_query: str, top_k: int, scratch: FaissStore | None, mode: str) -> List[Dict]:
+        if mode == "vector":
             return []
+        k = self._fetch_k(top_k, mode)
+        return self._merge_hits(scratch, lambda store: store.lexical_search(user_query, k))
+
+    @staticmethod
+    def _lexical_fast_path(user_query: str, lex: List[Dict], top_k: int) -> bool:
+        entities = entity_terms(user_query)
+        if not entities or len(lex) < top_k:
+            return False
+        return all(set(entities) <= set(tokenize(it["text"])) for it in lex[:top_k])
+
+    @staticmethod
+    def _fuse(vec: List[Dict], lex: List[Dict], top_k: int) -> List[Dict]:
+        """Reciprocal-rank fusion of two ranked lists keyed by doc id."""
+        if not lex:
+            return vec[:top_k]
+        if not vec:
+            return lex[:top_k]
+        fused: Dict[int, Dict] = {}
+        for items, key in ((vec, "vector_score"), (lex, "lexical_score")):
+            for rank, it in enumerate(items):
+                entry = fused.setdefault(it["id"], dict(it, score=0.0))
+                entry[key] = it["score"]
+                entry["score"] += 1.0 / (_RRF_K + rank + 1)
+        out = sorted(fused.values(), key=lambda it: it["score"], reverse=True)
+        return out[:top_k]
+
+    def _merge_hits(self, scratch: FaissStore | None, search) -> List[Dict]:
+        best: Dict[int, Dict] = {}
+        for store in (self.store, scratch):
+            if store is None:
+                continue
+            for it in self._search_store(store, search):
+                prev = best.get(it["id"])
+                if prev is None or it["score"] > prev["score"]:
+                    best[it["id"]] = it
+
+        return sorted(best.values(), key=lambda it: it["score"], reverse=True)
 
+    def _search_store(self, store: FaissStore, search) -> List[Dict]:
         try:
-            hits = self.store.search(q_emb, top_k) or []
+            hits = search(store) or []
         except Exception:
             return []
 
         out: List[Dict] = []
-        n_docs = len(getattr(self.store, "docs", []))
-        n_meta = len(getattr(self.store, "metas", []))
+        n_docs = len(getattr(store, "docs", []))
+        n_meta = len(getattr(store, "metas", []))
 
         for h in hits:
             # Ensure (idx, score) tuple
@@ -166,10 +508,11 @@ class ContextIndexer:
                 continue
 
             # Safe fetch meta
-            meta = self.store.metas[idx] if idx < n_meta else {}
+            meta = store.metas[idx] if idx < n_meta else {}
             try:
                 out.append({
-                    "text": self.store.docs[idx],
+                    "id": store.ids[idx],
+                    "text": store.docs[idx],
                     "meta": meta,
                     "score": float(score),
                 })
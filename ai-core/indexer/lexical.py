@@ -0,0 +1,112 @@
+# indexer/lexical.py
+"""
+In-process BM25 inverted index, kept next to the vector index on the same
+doc ids. Used for exact-entity questions (client names, student ids, invoice
+numbers) that embedding similarity tends to rank too low.
+"""
+
+from __future__ import annotations
+import re
+import math
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# words/numbers, keeping joined forms like "SUB007", "C-101", "student_id"
+_TOKEN_RE = re.compile(r"[0-9A-Za-zÀ-ɏ]+(?:[-_./][0-9A-Za-zÀ-ɏ]+)*")
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased tokens; joined tokens also contribute their parts."""
+    out: List[str] = []
+    for m in _TOKEN_RE.finditer(text or ""):
+        tok = m.group(0).lower()
+        out.append(tok)
+        if any(c in tok for c in "-_./"):
+            out.extend(p for p in re.split(r"[-_./]", tok) if p)
+    return out
+
+
+def entity_terms(query: str) -> List[str]:
+    """
+    Tokens that name something exactly: anything with a digit (ids, invoice
+    numbers), ALL-CAPS words (ACME) and every token of a "quoted phrase".
+    """
+    terms = []
+    for phrase in _QUOTED_RE.findall(query or ""):
+        terms.extend(tokenize(phrase))
+    for m in _TOKEN_RE.finditer(query or ""):
+        tok = m.group(0)
+        if any(c.isdigit() for c in tok) or (len(tok) >= 2 and tok.isupper()):
+            terms.append(tok.lower())
+    return list(dict.fromkeys(terms))
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_df_ratio: float = 0.5):
+        self.k1 = k1
+        self.b = b
+        # terms in more than this share of docs carry ~no signal; skip scoring them
+        self.max_df_ratio = max_df_ratio
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+        self._total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def __contains__(self, doc_id: int):
+        return doc_id in self.doc_len
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        for did, text in zip(ids, texts):
+            did = int(did)
+            if did in self.doc_len:
+                continue
+            tf = Counter(tokenize(text))
+            for term, n in tf.items():
+                self.postings.setdefault(term, {})[did] = n
+            length = sum(tf.values())
+            self.doc_len[did] = length
+            self._terms[did] = tuple(tf)
+            self._total_len += length
+
+    def remove(self, ids: Iterable[int]):
+        for did in ids:
+            did = int(did)
+            if did not in self.doc_len:
+                continue
+            for term in self._terms.pop(did, ()):
+                plist = self.postings.get(term)
+                if plist is not None:
+                    plist.pop(did, None)
+                    if not plist:
+                        del self.postings[term]
+            self._total_len -= self.doc_len.pop(did)
+
+    def contains_all(self, doc_id: int, terms: Iterable[str]) -> bool:
+        have = self._terms.get(int(doc_id), ())
+        return all(t in have for t in terms)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """[(doc_id, bm25 score)] best first."""
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        avgdl = self._total_len / n
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+        for term in dict.fromkeys(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            df = len(plist)
+            if n > 100 and df > self.max_df_ratio * n:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for did, tf in plist.items():
+                dl = self.doc_len[did]
+                scores[did] = scores.get(did, 0.0) + idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        return heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
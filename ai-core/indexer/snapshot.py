@@ -0,0 +1,217 @@
+# indexer/snapshot.py
+"""
+Versioned on-disk snapshots of a FaissStore (index + docs + metas).
+
+Layout under a snapshot root (e.g. data/context_store):
+
+    CURRENT                     name of the live snapshot (swapped atomically)
+    snap-<utc>-<rand>/
+        MANIFEST.json           {"format": 2, "dim", "backend", "kind", "count", "created", "extra"}
+        index.faiss             faiss.write_index output (loaded with IO_FLAG_MMAP)
+        ids.npy                 int64 doc ids, aligned with docs/metas
+        docs.bin / docs.off     utf-8 texts back to back + uint64 offsets (count + 1)
+        metas.bin / metas.off   one JSON object per record, same offset scheme
+
+Readers never see a half-written snapshot: it is written into a temp dir,
+renamed into place, and only then is CURRENT replaced (os.replace).
+"""
+
+from __future__ import annotations
+import os
+import json
+import mmap
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 2  # 2: IndexIDMap2 index + ids.npy
+KEEP_SNAPSHOTS = 2  # live one + previous (still mmapped by older stores)
+
+INDEX_FILE = "index.faiss"
+IDS_FILE = "ids.npy"
+MANIFEST_FILE = "MANIFEST.json"
+CURRENT_FILE = "CURRENT"
+
+
+# ---------------- Records ----------------
+
+class MmapRecords:
+    """
+    Read-only, memory-mapped sequence of records backed by <name>.bin/<name>.off,
+    with an in-memory tail so the owning store can keep appending after load.
+    """
+
+    def __init__(self, bin_path: str, off_path: str, decode: Callable[[bytes], Any]):
+        self._decode = decode
+        self._offsets = np.load(off_path, mmap_mode="r")
+        self._file = open(bin_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._base_len = max(len(self._offsets) - 1, 0)
+        self._tail: List[Any] = []
+        self._overrides: Dict[int, Any] = {}
+
+    def __len__(self):
+        return self._base_len + len(self._tail)
+
+    def __getitem__(self, i: int):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        if i >= self._base_len:
+            return self._tail[i - self._base_len]
+        if i in self._overrides:
+            return self._overrides[i]
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._decode(self._buf[start:end])
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __setitem__(self, i: int, item: Any):
+        # used for meta refreshes on upsert; stored records are immutable
+        if i < 0:
+            i += len(self)
+        if i < self._base_len:
+            self._overrides[i] = item
+        else:
+            self._tail[i - self._base_len] = item
+
+    def extend(self, items: Iterable[Any]):
+        self._tail.extend(items)
+
+    def append(self, item: Any):
+        self._tail.append(item)
+
+    def head(self, n: int) -> "MmapRecords":
+        """Point-in-time copy of the first n records; shares the mmapped base, copies the rest."""
+        view = object.__new__(MmapRecords)
+        view.__dict__.update(self.__dict__)
+        view._base_len = min(self._base_len, n)
+        view._tail = self._tail[: max(0, n - self._base_len)]
+        view._overrides = {i: v for i, v in self._overrides.items() if i < view._base_len}
+        return view
+
+    def close(self):
+        """Unmap the record file; stored records can't be read afterwards (appended ones can)."""
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+
+def _decode_text(b: bytes) -> str:
+    return b.decode("utf-8")
+
+
+def _decode_meta(b: bytes) -> dict:
+    return json.loads(b) if b else {}
+
+
+def _write_records(dir_path: str, name: str, items: Iterable[Any], encode: Callable[[Any], bytes]) -> int:
+    offsets = [0]
+    with open(os.path.join(dir_path, f"{name}.bin"), "wb") as f:
+        for it in items:
+            b = encode(it)
+            f.write(b)
+            offsets.append(offsets[-1] + len(b))
+        f.flush()
+        os.fsync(f.fileno())
+    # np.save appends .npy unless the name already has it; keep the .off name explicit
+    with open(os.path.join(dir_path, f"{name}.off"), "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.uint64))
+    return len(offsets) - 1
+
+
+# ---------------- Snapshot dirs ----------------
+
+def current_snapshot(root: str) -> Optional[str]:
+    """Absolute path of the live snapshot under root, or None."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(root, name)
+    return path if name and os.path.isdir(path) else None
+
+
+def read_manifest(snap_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(snap_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')!r} in {snap_dir}")
+    return manifest
+
+
+def open_records(snap_dir: str):
+    """Return (docs, metas, ids): memory-mapped sequences plus the id array."""
+    docs = MmapRecords(os.path.join(snap_dir, "docs.bin"), os.path.join(snap_dir, "docs.off"), _decode_text)
+    metas = MmapRecords(os.path.join(snap_dir, "metas.bin"), os.path.join(snap_dir, "metas.off"), _decode_meta)
+    ids = np.load(os.path.join(snap_dir, IDS_FILE))
+    return docs, metas, ids
+
+
+def write_snapshot(
+    root: str,
+    write_index: Callable[[str], None],
+    docs: Iterable[str],
+    metas: Iterable[dict],
+    ids: Callable[[], np.ndarray],
+    manifest: Dict[str, Any],
+    pinned: Iterable[str] = (),
+) -> str:
+    """
+    Write a complete snapshot next to the live one and atomically make it CURRENT.
+    `write_index(path)` must serialize the faiss index to `path`; `ids()` is
+    called after it and returns the doc ids matching the written index.
+    Snapshot dirs in `pinned` (still memory-mapped by the caller) are never pruned.
+    Returns the new snapshot directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = f"snap-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+    tmp_dir = os.path.join(root, f".tmp-{name}")
+    os.makedirs(tmp_dir)
+    try:
+        write_index(os.path.join(tmp_dir, INDEX_FILE))
+        n_docs = _write_records(tmp_dir, "docs", docs, lambda s: s.encode("utf-8"))
+        n_metas = _write_records(tmp_dir, "metas", metas,
+                                 lambda m: json.dumps(m or {}, ensure_ascii=False, default=str).encode("utf-8"))
+        id_arr = np.asarray(ids(), dtype="int64")
+        if not (n_docs == n_metas == len(id_arr)):
+            raise ValueError(f"docs/metas/ids length mismatch ({n_docs}/{n_metas}/{len(id_arr)})")
+        np.save(os.path.join(tmp_dir, IDS_FILE), id_arr)
+
+        manifest = dict(manifest, format=FORMAT_VERSION, count=n_docs,
+                        created=datetime.utcnow().isoformat(timespec="seconds") + "Z")
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        final_dir = os.path.join(root, name)
+        os.rename(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    cur_tmp = os.path.join(root, f"{CURRENT_FILE}.tmp-{uuid.uuid4().hex[:6]}")
+    with open(cur_tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(cur_tmp, os.path.join(root, CURRENT_FILE))
+
+    _prune(root, keep={name, *(os.path.basename(p) for p in pinned)})
+    return final_dir
+
+
+def _prune(root: str, keep: set):
+    snaps = sorted(d for d in os.listdir(root) if d.startswith("snap-"))
+    old = [d for d in snaps if d not in keep][: max(len(snaps) - KEEP_SNAPSHOTS, 0)]
+    for d in old:
+        shutil.rmtree(os.path.join(root, d), ignore_errors=True)
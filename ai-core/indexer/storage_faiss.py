@@ -1,29 +1,499 @@
 # indexer/storage_faiss.py
+"""
+FAISS-backed vector store.
+
+Backends (CB_FAISS_BACKEND or FaissStore(backend=...)):
+    flat   - exact brute-force inner product (IndexFlatIP)
+    hnsw   - graph ANN (IndexHNSWFlat), tuned with efSearch
+    ivf    - inverted lists (IndexIVFFlat), tuned with nprobe
+    ivfpq  - inverted lists + product quantization (IndexIVFPQ), tuned with nprobe
+
+Every store starts flat. Once it holds CB_FAISS_PROMOTE_AT vectors it is
+promoted to the configured ANN backend: the new index is trained and filled
+in a background thread and swapped in atomically, so add()/search() keep
+working (on the flat index) while that happens.
+
+save()/load() persist the whole store (index + docs + metas) as a versioned
+snapshot under `path` (see indexer/snapshot.py); load() memory-maps it.
+
+Environment overrides:
+    CB_FAISS_BACKEND     = "flat" | "hnsw" | "ivf" | "ivfpq"   (default "ivf")
+    CB_FAISS_PROMOTE_AT  = corpus size that triggers promotion (default 50000)
+    CB_FAISS_NPROBE      = IVF lists probed per query           (default 16)
+    CB_FAISS_EF_SEARCH   = HNSW candidate list size per query   (default 64)
+    CB_FAISS_HNSW_M      = HNSW graph degree                    (default 32)
+    CB_FAISS_PQ_M        = PQ sub-quantizers (ivfpq)            (default 48)
+"""
+
+import os
+import math
+import time
+import hashlib
+import threading
 import faiss
 import numpy as np
 
+from indexer import snapshot
+from indexer.lexical import BM25Index
+
+BACKENDS = ("flat", "hnsw", "ivf", "ivfpq")
+
+_DEFAULT_BACKEND = os.getenv("CB_FAISS_BACKEND", "ivf").lower()
+_DEFAULT_PROMOTE_AT = int(os.getenv("CB_FAISS_PROMOTE_AT", "50000"))
+_DEFAULT_NPROBE = int(os.getenv("CB_FAISS_NPROBE", "16"))
+_DEFAULT_EF_SEARCH = int(os.getenv("CB_FAISS_EF_SEARCH", "64"))
+_DEFAULT_HNSW_M = int(os.getenv("CB_FAISS_HNSW_M", "32"))
+_DEFAULT_PQ_M = int(os.getenv("CB_FAISS_PQ_M", "48"))
+
+# faiss wants ~39 training points per centroid (IVF lists and 256-entry PQ codebooks)
+_MIN_POINTS_PER_LIST = 39
+_MIN_PQ_TRAIN = 256 * _MIN_POINTS_PER_LIST
+
+
+# ---------------- Index factories ----------------
+
+def ivf_nlist(n: int) -> int:
+    """Number of IVF lists for a corpus of n vectors (~4*sqrt(n), trainable)."""
+    nlist = int(4 * math.sqrt(max(n, 1)))
+    nlist = min(nlist, n // _MIN_POINTS_PER_LIST, 65536)
+    return max(nlist, 1)
+
+
+def _pq_m(dim: int, wanted: int) -> int:
+    """Largest divisor of dim that is <= wanted (PQ needs dim % m == 0)."""
+    for m in range(min(wanted, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def min_train_size(kind: str) -> int:
+    """Smallest corpus a backend can be built from."""
+    if kind == "ivf":
+        return _MIN_POINTS_PER_LIST
+    if kind == "ivfpq":
+        return _MIN_PQ_TRAIN
+    return 0
+
+
+def build_index(kind: str, dim: int, xb: np.ndarray | None = None,
+                hnsw_m: int = _DEFAULT_HNSW_M, pq_m: int = _DEFAULT_PQ_M):
+    """
+    Create an empty (but trained, when xb is given) inner-product index.
+    IVF backends need xb for training; flat/hnsw ignore it.
+    """
+    if kind == "flat":
+        return faiss.IndexFlatIP(dim)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(40, 2 * hnsw_m)
+        return index
+    if kind in ("ivf", "ivfpq"):
+        if xb is None or xb.shape[0] < min_train_size(kind):
+            raise ValueError(f"{kind} needs at least {min_train_size(kind)} training vectors")
+        nlist = ivf_nlist(xb.shape[0])
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim, pq_m), 8, faiss.METRIC_INNER_PRODUCT)
+        index.train(xb)
+        return index
+    raise ValueError(f"Unknown FAISS backend: {kind!r} (use one of {BACKENDS})")
+
+
+def with_ids(index):
+    """
+    Make `index` addressable by doc id. IVF indexes carry ids natively (and
+    IndexIDMap2's id compaction on remove_ids is only correct for flat-like
+    storage), everything else is wrapped in an IndexIDMap2.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        return index
+    return faiss.IndexIDMap2(index)
+
+
+def _base(index):
+    """Unwrap an IndexIDMap/IndexIDMap2 to the index doing the actual search."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def set_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Apply query-time knobs to whichever backend `index` is."""
+    index = _base(index)
+    if nprobe is not None and hasattr(index, "nprobe"):
+        index.nprobe = int(nprobe)
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(ef_search)
+
+
+def index_kind(index) -> str:
+    """Backend name of a faiss index built by build_index()."""
+    index = _base(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def doc_id(text: str, meta: dict | None = None) -> int:
+    """
+    Stable, content-derived 63-bit document id: the same text from the same
+    source/file/location always maps to the same id, so re-adding it is an upsert.
+    """
+    meta = meta or {}
+    h = hashlib.sha1()
+    h.update(text.encode("utf-8", errors="ignore"))
+    h.update(str(meta.get("file", "")).encode())
+    h.update(str(meta.get("loc", "")).encode())
+    h.update(str(meta.get("source", "")).encode())
+    return int.from_bytes(h.digest()[:8], "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+# ---------------- Store ----------------
+
+def _head(seq, n: int):
+    """First n records, detached from later in-place edits (mmapped records stay mapped)."""
+    return seq.head(n) if hasattr(seq, "head") else seq[:n]
+
+
+def _close_records(*seqs):
+    for seq in seqs:
+        if isinstance(seq, snapshot.MmapRecords):
+            seq.close()
+
+
 class FaissStore:
-    def __init__(self, dim: int, path: str = "data/context.index"):
+    """
+    Vector store with parallel docs/metas/ids lists. Every document has a
+    stable id (doc_id); the faiss index is keyed by those ids (see with_ids), so
+    add() upserts and remove()/remove_where() can drop documents later.
+    A BM25 index over the same ids backs lexical_search().
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        path: str = "data/context_store",
+        backend: str | None = None,
+        promote_at: int | None = None,
+        nprobe: int | None = None,
+        ef_search: int | None = None,
+    ):
         self.path = path
-        self.index = faiss.IndexFlatIP(dim)
+        self.dim = dim
+        self.backend = (backend or _DEFAULT_BACKEND).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown FAISS backend: {self.backend!r} (use one of {BACKENDS})")
+        self.promote_at = _DEFAULT_PROMOTE_AT if promote_at is None else int(promote_at)
+        self.nprobe = nprobe or _DEFAULT_NPROBE
+        self.ef_search = ef_search or _DEFAULT_EF_SEARCH
+
+        self.index = with_ids(build_index("flat", dim))
+        self.kind = "flat"        # backend currently serving queries
         self.docs = []    # List[str]
         self.metas = []   # List[dict]
+        self.ids = []     # List[int], doc_id of docs[i]
+        self._pos = {}    # doc_id -> position in docs/metas/ids
+        self.lexical: BM25Index | None = BM25Index()  # None while being rebuilt after load()
 
-    def add(self, embeddings: np.ndarray, texts: list[str], metas: list[dict]):
+        self._lock = threading.RLock()
+        self._promoting: threading.Thread | None = None
+        self._removals = 0                         # bumped by remove(); invalidates a running promotion
+        self._mmap_index_file: str | None = None  # set while the index is read-only mmapped
+        self._snap_dir: str | None = None         # snapshot the loaded records are mapped from
+        self.snapshot_extra: dict = {}            # caller data restored by load()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, doc_id: int):
+        return int(doc_id) in self._pos
+
+    def add(self, embeddings: np.ndarray, texts: list[str], metas: list[dict], ids: list[int] | None = None):
+        """
+        Upsert documents. `ids` default to doc_id(text, meta). An id that is
+        already stored only has its meta refreshed (same id => same content =>
+        same vector); new ids are appended. Every meta gets an insert/refresh "ts".
+        """
         if len(texts) == 0:
             return
         assert len(texts) == len(metas) == embeddings.shape[0]
-        self.index.add(embeddings)
-        self.docs.extend(texts)
-        self.metas.extend(metas)
+        if ids is None:
+            ids = [doc_id(t, m) for t, m in zip(texts, metas)]
+        assert len(ids) == len(texts)
+
+        now = time.time()
+        with self._lock:
+            self._ensure_writable()
+            rows, new_ids, new_metas, seen = [], [], [], set()
+            for i, (did, meta) in enumerate(zip(ids, metas)):
+                did = int(did)
+                if did in seen:
+                    continue
+                seen.add(did)
+                meta = dict(meta or {}, ts=now)
+                pos = self._pos.get(did)
+                if pos is not None:
+                    self.metas[pos] = meta
+                    continue
+                self._pos[did] = len(self.ids) + len(new_ids)
+                rows.append(i)
+                new_ids.append(did)
+                new_metas.append(meta)
+            if rows:
+                self.index.add_with_ids(np.ascontiguousarray(embeddings[rows]),
+                                        np.asarray(new_ids, dtype="int64"))
+                self.docs.extend(texts[i] for i in rows)
+                self.metas.extend(new_metas)
+                self.ids.extend(new_ids)
+                if self.lexical is not None:
+                    self.lexical.add(new_ids, (texts[i] for i in rows))
+        self._maybe_promote()
+
+    def remove(self, ids) -> int:
+        """Drop documents by id. Returns how many were removed."""
+        with self._lock:
+            drop = {int(i) for i in ids if int(i) in self._pos}
+            if not drop:
+                return 0
+            self._ensure_writable()
+            id_arr = np.fromiter(drop, dtype="int64", count=len(drop))
+            try:
+                self.index.remove_ids(faiss.IDSelectorBatch(id_arr))
+            except RuntimeError:
+                # e.g. HNSW cannot delete in place: rebuild from the survivors
+                self._rebuild_without(drop)
+
+            keep = [i for i, did in enumerate(self.ids) if did not in drop]
+            self.docs = [self.docs[i] for i in keep]
+            self.metas = [self.metas[i] for i in keep]
+            self.ids = [self.ids[i] for i in keep]
+            self._pos = {did: i for i, did in enumerate(self.ids)}
+            if self.lexical is not None:
+                self.lexical.remove(drop)
+            self._removals += 1
+        return len(drop)
+
+    def remove_where(self, source: str | None = None, older_than: float | None = None, **meta_match) -> int:
+        """
+        Drop documents whose meta matches: `source`, any other meta key=value
+        pairs, and/or an insert/refresh "ts" older than `older_than` seconds ago.
+        """
+        if source is not None:
+            meta_match["source"] = source
+        cutoff = time.time() - older_than if older_than is not None else None
+        with self._lock:
+            drop = []
+            for did, meta in zip(self.ids, self.metas):
+                meta = meta or {}
+                if any(meta.get(k) != v for k, v in meta_match.items()):
+                    continue
+                if cutoff is not None and float(meta.get("ts") or 0) >= cutoff:
+                    continue
+                drop.append(did)
+            return self.remove(drop)
+
+    def group_ids(self, key: str, source: str | None = None) -> dict:
+        """{meta[key]: [doc ids]} over the documents of `source` (or all)."""
+        groups: dict = {}
+        with self._lock:
+            for did, meta in zip(self.ids, self.metas):
+                meta = meta or {}
+                if source is not None and meta.get("source") != source:
+                    continue
+                groups.setdefault(meta.get(key), []).append(int(did))
+        return groups
+
+    def _rebuild_without(self, drop: set):
+        base = _base(self.index)
+        all_ids = faiss.vector_to_array(self.index.id_map)
+        mask = ~np.isin(all_ids, np.fromiter(drop, dtype="int64", count=len(drop)))
+        xb = base.reconstruct_n(0, self.index.ntotal)[mask]
+        kind = self.kind if xb.shape[0] >= min_train_size(self.kind) else "flat"
+        index = with_ids(build_index(kind, self.dim, xb))
+        index.add_with_ids(xb, all_ids[mask])
+        set_search_params(index, self.nprobe, self.ef_search)
+        self.index, self.kind = index, kind
 
     def search(self, query_emb: np.ndarray, top_k: int = 5):
-        D, I = self.index.search(query_emb, top_k)
-        # Return (idx, score) so caller can read docs[idx], metas[idx]
-        return [(int(i), float(D[0][j])) for j, i in enumerate(I[0]) if i < len(self.docs)]
+        with self._lock:
+            D, I = self.index.search(query_emb, top_k)
+            pos = self._pos
+            # Return (idx, score) so caller can read docs[idx], metas[idx]
+            return [(pos[int(i)], float(D[0][j])) for j, i in enumerate(I[0]) if int(i) in pos]
+
+    def lexical_search(self, query: str, top_k: int = 5):
+        """BM25 hits as (idx, score), like search(). Empty while the lexical index is rebuilding."""
+        with self._lock:
+            if self.lexical is None:
+                return []
+            pos = self._pos
+            return [(pos[did], score) for did, score in self.lexical.search(query, top_k) if did in pos]
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None):
+        """Change nprobe / efSearch for subsequent searches (see benchmarks/ann_recall.py)."""
+        with self._lock:
+            if nprobe is not None:
+                self.nprobe = int(nprobe)
+            if ef_search is not None:
+                self.ef_search = int(ef_search)
+            set_search_params(self.index, self.nprobe, self.ef_search)
+
+    # ---------------- Promotion (flat -> ANN) ----------------
+    def _promote_threshold(self) -> int:
+        return max(self.promote_at, min_train_size(self.backend))
+
+    def _maybe_promote(self):
+        if self.backend == "flat" or self.kind != "flat":
+            return
+        if self.index.ntotal < self._promote_threshold():
+            return
+        with self._lock:
+            if self._promoting is not None:
+                return
+            self._promoting = threading.Thread(target=self._promote, name="faiss-promote", daemon=True)
+            self._promoting.start()
+
+    def _promote(self):
+        try:
+            with self._lock:
+                n0 = self.index.ntotal
+                removals = self._removals
+                xb = _base(self.index).reconstruct_n(0, n0)
+                xids = faiss.vector_to_array(self.index.id_map)[:n0].copy()
+
+            # Heavy part runs without the lock: queries keep hitting the flat index
+            new_index = with_ids(build_index(self.backend, self.dim, xb))
+            new_index.add_with_ids(xb, xids)
+            del xb
+
+            with self._lock:
+                if self._removals != removals:
+                    # positions shifted under us; try again on the next add()
+                    print("[FaissStore] Promotion raced with a removal, will retry")
+                    return
+                n1 = self.index.ntotal
+                if n1 > n0:  # vectors added while we were building
+                    new_index.add_with_ids(_base(self.index).reconstruct_n(n0, n1 - n0),
+                                           faiss.vector_to_array(self.index.id_map)[n0:n1].copy())
+                set_search_params(new_index, self.nprobe, self.ef_search)
+                self.index = new_index
+                self.kind = self.backend
+            print(f"[FaissStore] Promoted flat -> {self.backend} at {n1} vectors")
+        except Exception as e:
+            # Retry only once the corpus has doubled instead of on every add()
+            self.promote_at = 2 * self.index.ntotal
+            print(f"[FaissStore] Promotion to {self.backend} failed, staying flat: {type(e).__name__}: {e}")
+        finally:
+            self._promoting = None
+
+    def wait_for_promotion(self, timeout: float | None = None):
+        """Block until a running background promotion finishes (tests/benchmarks)."""
+        t = self._promoting
+        if t is not None:
+            t.join(timeout)
+
+    # ---------------- Persistence ----------------
+    def _ensure_writable(self):
+        """mmapped IVF lists are read-only; pull them into memory before the first write."""
+        if self._mmap_index_file and self.kind in ("ivf", "ivfpq"):
+            self.index = faiss.read_index(self._mmap_index_file)
+            set_search_params(self.index, self.nprobe, self.ef_search)
+        self._mmap_index_file = None
+
+    def save(self, extra: dict | None = None) -> str:
+        """
+        Write a new snapshot under self.path and atomically make it current.
+        `extra` is stored in the manifest and comes back as snapshot_extra on load.
+        """
+        state = {}
+
+        def _write_index(path: str):
+            # index and records are captured under one lock hold: a concurrent
+            # remove() would otherwise shift docs/metas/ids against the vectors
+            with self._lock:
+                n = len(self.docs)
+                faiss.write_index(self.index, path)
+                state["n"] = n
+                state["docs"], state["metas"] = _head(self.docs, n), _head(self.metas, n)
+                state["ids"] = self.ids[:n]
+
+        def _records(key):
+            yield from state[key]  # read after _write_index has filled state
+
+        snap_dir = snapshot.write_snapshot(
+            self.path,
+            _write_index,
+            _records("docs"),
+            _records("metas"),
+            lambda: np.asarray(state["ids"], dtype="int64"),
+            {"dim": self.dim, "backend": self.backend, "kind": self.kind, "extra": extra or {}},
+            # our records (and an mmapped index not yet written to) still read from it
+            pinned=[self._snap_dir] if self._snap_dir else [],
+        )
+        n = state["n"]
+        print(f"[FaissStore] Saved snapshot of {n} docs to {snap_dir}")
+        return snap_dir
+
+    def load(self, mmap: bool = True) -> bool:
+        """
+        Replace this store's contents with the current snapshot under self.path.
+        Returns False when there is no snapshot yet.
+        """
+        snap_dir = snapshot.current_snapshot(self.path)
+        if snap_dir is None:
+            return False
+        manifest = snapshot.read_manifest(snap_dir)
+        if int(manifest["dim"]) != self.dim:
+            raise ValueError(f"Snapshot dim {manifest['dim']} != store dim {self.dim}")
+
+        index_file = f"{snap_dir}/{snapshot.INDEX_FILE}"
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP if mmap else 0)
+        docs, metas, ids = snapshot.open_records(snap_dir)
+        if not (index.ntotal == len(docs) == len(metas) == len(ids)):
+            raise ValueError(f"Corrupt snapshot {snap_dir}: index/docs/metas sizes differ")
+
+        with self._lock:
+            old = (self.docs, self.metas)
+            self.index = index
+            self.kind = index_kind(index)
+            self.docs, self.metas = docs, metas
+            self.ids = ids.tolist()
+            self._pos = {did: i for i, did in enumerate(self.ids)}
+            self.lexical = None
+            self._mmap_index_file = index_file if mmap else None
+            self._snap_dir = snap_dir
+            self.snapshot_extra = manifest.get("extra") or {}
+            set_search_params(self.index, self.nprobe, self.ef_search)
+        _close_records(*old)
+        print(f"[FaissStore] Loaded snapshot {snap_dir} ({len(docs)} docs, {self.kind})")
+        threading.Thread(target=self._rebuild_lexical, name="bm25-rebuild", daemon=True).start()
+        self._maybe_promote()
+        return True
 
-    def save(self):
-        faiss.write_index(self.index, self.path)
+    def close(self):
+        """Unmap the loaded snapshot; for a store that has been swapped out and is no longer served."""
+        with self._lock:
+            _close_records(self.docs, self.metas)
+            self._snap_dir = None
 
-    def load(self):
-        self.index = faiss.read_index(self.path)
+    def _rebuild_lexical(self):
+        """Re-tokenize the (mmapped) docs in the background; vector search works meanwhile."""
+        with self._lock:
+            n = len(self.ids)
+            ids, docs = self.ids[:n], self.docs
+        lexical = BM25Index()
+        lexical.add(ids, (docs[i] for i in range(n)))
+        with self._lock:
+            # catch up with anything added/removed while we were tokenizing
+            lexical.remove([did for did in ids if did not in self._pos])
+            tail = range(n, len(self.ids)) if self.ids[:n] == ids else range(len(self.ids))
+            lexical.add((self.ids[i] for i in tail), (self.docs[i] for i in tail))
+            self.lexical = lexical
+        print(f"[FaissStore] Lexical index rebuilt ({len(lexical)} docs)")
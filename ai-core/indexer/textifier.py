@@ -1,5 +1,6 @@
 from typing import List, Dict, Tuple
 from builder.query_builder import LLMQueryBuilder  # reuse your Ollama-based builder
+from connectors.results import ColumnarResult
 
 def _compact_rows(rows: List[Dict], max_rows: int = 30, max_val_len: int = 80) -> Tuple[str, List[str]]:
     """
@@ -30,13 +31,25 @@ class Textifier:
     def structured_to_lines(self, rows: List[Dict], source: str) -> List[str]:
         """
         Deterministic, no-LLM textification of rows (great for exact retrieval + provenance).
+        Accepts row dicts or a ColumnarResult (formatted column by column, no dicts).
         """
+        if isinstance(rows, ColumnarResult):
+            return self._columns_to_lines(rows, source)
         docs = []
         for r in rows:
             parts = [f"{k}={v}" for k, v in r.items() if v not in (None, "")]
             docs.append(f"[{source}] " + " • ".join(parts))
         return docs
 
+    @staticmethod
+    def _columns_to_lines(result: ColumnarResult, source: str) -> List[str]:
+        cells = [
+            [None if v is None or v == "" else f"{name}={v}" for v in col]
+            for name, col in zip(result.columns, result.data)
+        ]
+        prefix = f"[{source}] "
+        return [prefix + " • ".join(c for c in row if c is not None) for row in zip(*cells)]
+
     def summarize_with_llm(
         self,
         user_query: str,
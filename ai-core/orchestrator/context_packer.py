@@ -0,0 +1,106 @@
+# orchestrator/context_packer.py
+"""
+Token-budgeted context packing.
+
+Retrieval returns more candidates than the answer LLM needs. pack_context()
+picks snippets by relevance with MMR-style redundancy removal until the
+profile's context_budget_tokens is spent, so the final prompt stays small
+and dense (shorter prefill on the answering model).
+"""
+
+from __future__ import annotations
+import re
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional dependency / offline
+    _ENC = None
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, else a conservative estimate."""
+    if not text:
+        return 0
+    if _ENC is not None:
+        return len(_ENC.encode(text, disallowed_special=()))
+    # BPE vocabularies average ~4 chars/token on English and split rarer words
+    # and punctuation further; take the larger of both estimates
+    return max(len(text) // 4, int(len(_WORD_RE.findall(text)) * 1.3)) + 1
+
+
+def _shingles(text: str) -> set:
+    return set(w.lower() for w in _WORD_RE.findall(text) if w.isalnum())
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+def pack_context(
+    items: List[Dict],
+    budget_tokens: Optional[int],
+    max_items: Optional[int] = None,
+    mmr_lambda: float = 0.7,
+    dup_threshold: float = 0.9,
+) -> List[Dict]:
+    """
+    Select items ({text, score, ...}, best first) for the prompt.
+
+    Greedy MMR: each step takes the candidate maximizing
+        mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity_to_selected
+    (relevance = min-max normalized score, similarity = word Jaccard),
+    skipping near-duplicates and anything that no longer fits the budget.
+    budget_tokens=None means no token limit (max_items still applies).
+    Returns the chosen items in selection order, each with "tokens" set.
+    """
+    cands = [dict(it) for it in items if (it.get("text") or "").strip()]
+    if not cands:
+        return []
+
+    scores = [float(it.get("score") or 0.0) for it in cands]
+    lo, hi = min(scores), max(scores)
+    span = (hi - lo) or 1.0
+    for it, sc in zip(cands, scores):
+        it["_rel"] = (sc - lo) / span
+        it["_sh"] = _shingles(it["text"])
+        it["tokens"] = count_tokens(it["text"]) + 1  # + newline separator
+
+    selected: List[Dict] = []
+    remaining = budget_tokens if budget_tokens is not None else float("inf")
+    while cands and (max_items is None or len(selected) < max_items):
+        best, best_val, best_i = None, None, -1
+        for i, it in enumerate(cands):
+            if it["tokens"] > remaining:
+                continue
+            red = max((_jaccard(it["_sh"], s["_sh"]) for s in selected), default=0.0)
+            if red >= dup_threshold:
+                continue
+            val = mmr_lambda * it["_rel"] - (1.0 - mmr_lambda) * red
+            if best_val is None or val > best_val:
+                best, best_val, best_i = it, val, i
+        if best is None:
+            break
+        selected.append(best)
+        remaining -= best["tokens"]
+        cands.pop(best_i)
+
+    if not selected and budget_tokens:
+        # every candidate is larger than the whole budget: trim the most relevant one
+        top = max(cands, key=lambda it: it["_rel"])
+        text = top["text"]
+        while text and count_tokens(text) + 1 > budget_tokens:
+            text = text[: int(len(text) * 0.9)]
+        if text:
+            top["text"], top["tokens"] = text, count_tokens(text) + 1
+            selected.append(top)
+
+    for it in selected:
+        it.pop("_rel", None)
+        it.pop("_sh", None)
+    return selected
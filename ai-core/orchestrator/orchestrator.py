@@ -1,13 +1,23 @@
 # orchestrator/orchestrator.py
+import os
 import uuid
 import yaml
 from typing import Dict, Any
 import asyncio
 from builder.query_builder import LLMQueryBuilder
 from indexer.indexer import ContextIndexer
+from orchestrator.context_packer import pack_context
 import time
 import traceback
 
+# Used when the profile does not set context_budget_tokens (e.g. per-request connectors)
+_DEFAULT_CONTEXT_BUDGET = int(os.getenv("CB_CONTEXT_BUDGET_TOKENS", "1200"))
+_CANDIDATES_TOP_K = 30   # retrieved before packing
+_MAX_SNIPPETS = 10
+# How often an already-seeded passive source is checked for changes (etag)
+_PASSIVE_RECHECK_S = float(os.getenv("CB_PASSIVE_RECHECK_S", "30"))
+_SEED_PAGE_SIZE = 256
+
 class ContextOrchestrator:
     """
     Core middleware orchestrator.
@@ -16,7 +26,8 @@ class ContextOrchestrator:
     2. Executes connectors concurrently.
     3. Transforms structured data into textual documents.
     4. Builds embeddings + stores them in FAISS.
-    5. Retrieves relevant snippets (context selection).
+    5. Retrieves relevant snippets and packs them into the profile's token
+       budget (context selection).
     6. Returns a unified context pack to the API server.
     """
 
@@ -38,6 +49,8 @@ class ContextOrchestrator:
 
         # Context indexer (textification + FAISS embedding)
         self.indexer = ContextIndexer(self.builder)
+        self._passive_checked: Dict[str, float] = {}  # source -> last etag check
+        self._passive_syncs: Dict[str, asyncio.Task] = {}  # source -> running re-sync
 
     # ------------------------------------------------------------------
     # Helpers
@@ -53,7 +66,7 @@ class ContextOrchestrator:
         except FileNotFoundError:
             return {"allowed_sources": list(self.connectors.keys()), "merge_strategy": "union"}
 
-    async def _exec_one(self, source: str, ctype: str, schema: dict, user_query: str, conn=None):
+    async def _exec_one(self, source: str, ctype: str, schema, user_query: str, conn=None):
         """
         Always returns: (source, query, rows, latency_ms, error_str)
         Never raises. This is an async coroutine in ALL paths.
@@ -90,16 +103,55 @@ class ContextOrchestrator:
 
 
 
-    def _detect_type(self, schema: dict) -> str:
+    async def _refresh_passive(self, src: str, conn):
         """
-        Simple heuristic to decide connector type from its schema.
+        Seed or re-sync a passive source if its etag moved. The seed-once
+        check runs before any data is produced: an unchanged source costs
+        one etag() (a stat walk for files) at most every _PASSIVE_RECHECK_S.
+
+        An already seeded source is re-synced by a background task (one per
+        source) and the request answers from the current index; only the
+        first seed is awaited, since there is nothing to answer from yet.
         """
-        for v in schema.values():
-            if "fields" in v:
-                return "sql"
-            if "params" in v:
-                return "rest"
-        return "sql"
+        seeded = self.indexer.is_seeded(src)
+        task = self._passive_syncs.get(src)
+        if task is None:
+            if seeded and time.time() - self._passive_checked.get(src, 0.0) < _PASSIVE_RECHECK_S:
+                return
+            task = self._passive_syncs[src] = asyncio.create_task(self._sync_passive(src, conn))
+            task.add_done_callback(lambda t, src=src: self._passive_sync_done(src, t))
+        if not seeded:
+            await asyncio.shield(task)
+
+    def _passive_sync_done(self, src: str, task: asyncio.Task):
+        if self._passive_syncs.get(src) is task:
+            del self._passive_syncs[src]
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            print(f"[Orch] Passive sync of {src} failed: {type(e).__name__}: {e}")
+
+    async def _sync_passive(self, src: str, conn):
+        seeded = self.indexer.is_seeded(src)
+        etag = await asyncio.to_thread(conn.etag) if hasattr(conn, "etag") else None
+        self._passive_checked[src] = time.time()
+        if seeded and (etag is None or etag == self.indexer.source_etag(src)):
+            return  # already in the corpus store (or restored from a snapshot)
+
+        if hasattr(conn, "scan_changes"):
+            # incremental: only files changed since the stored manifest are re-ingested
+            await asyncio.to_thread(self.indexer.sync_files, src, conn, True, etag)
+            return
+
+        if seeded:
+            self.indexer.forget_source(src)
+        if hasattr(conn, "iter_chunks"):
+            rows = (row for page in conn.iter_chunks(_SEED_PAGE_SIZE) for row in page)
+        elif hasattr(conn, "list_all_async"):
+            rows = await conn.list_all_async()
+        else:
+            rows = await asyncio.to_thread(conn.list_all)
+        schema_txt = conn.compiled_schema().text
+        await asyncio.to_thread(self.indexer.seed_static_corpus, src, rows, schema_txt, True, etag)
 
     # ------------------------------------------------------------------
     # Main orchestration logic
@@ -130,31 +182,35 @@ class ContextOrchestrator:
         trace_id = str(uuid.uuid4())
         notes: list[str] = []
 
-        # 0) Seed passive sources (files, etc.) — once, no LLM, no execute()
+        # 0) Seed/sync passive sources (files, etc.) — only when changed, no LLM, no execute()
         for src in allowed:
             conn = connectors[src]
             if getattr(conn, "is_passive", False):
                 try:
-                    if hasattr(conn, "list_all_async"):
-                        rows = await conn.list_all_async()
-                    else:
-                        rows = await asyncio.to_thread(conn.list_all)
-                    schema_txt = self._format_schema(conn.schema())
-                    self.indexer.seed_static_corpus(src, rows, schema_txt)
+                    await self._refresh_passive(src, conn)
                 except Exception as e:
                     # Passive failures shouldn't break the request
                     notes.append(f"{src} passive seed error: {type(e).__name__}: {e}")
 
         # 1) Create tasks ONLY for active (non-passive) sources
         tasks: list[asyncio.Task] = []
+        compiled_schemas = {}  # source -> CompiledSchema, shared by the builder and the indexer
         for src in allowed:
             conn = connectors[src]
             if getattr(conn, "is_passive", False):
                 continue
-            schema = conn.schema()
-            ctype = self._detect_type(schema)
+            try:
+                if getattr(conn, "schema_ready", True):
+                    compiled = conn.compiled_schema()
+                else:
+                    # cold schema catalog: the reflection runs off the event loop
+                    compiled = await asyncio.to_thread(conn.compiled_schema)
+                compiled_schemas[src] = compiled
+            except Exception as e:
+                notes.append(f"{src} schema collect error: {type(e).__name__}: {e}")
+                continue
             # pass the connector explicitly so _exec_one doesn't read self.connectors
-            coro = self._exec_one(src, ctype, schema, user_query, conn=conn)
+            coro = self._exec_one(src, compiled.kind, compiled, user_query, conn=conn)
             if not asyncio.iscoroutine(coro):
                 # extremely defensive: should never happen if _exec_one is async
                 async def _wrap_immediate(v): return v
@@ -178,6 +234,7 @@ class ContextOrchestrator:
         schemas: dict[str, str] = {}
         citations: list[dict] = []
         queries: dict[str, str] = {}
+        cache_stats: dict[str, str] = {}  # source -> "hit" | "revalidated" | "miss" (result caches)
 
         for tup in results:
             # expect (source, q, rows, ms, err)
@@ -185,12 +242,8 @@ class ContextOrchestrator:
                 notes.append("malformed result from a source (expected 5-tuple)")
                 continue
             src, q, rows, ms, err = tup
-            try:
-                schema = connectors[src].schema()
-                schemas[src] = self._format_schema(schema)
-            except Exception as e:
-                schemas[src] = ""
-                notes.append(f"{src} schema collect error: {type(e).__name__}: {e}")
+            compiled = compiled_schemas.get(src)
+            schemas[src] = compiled.text if compiled is not None else ""
 
             if q:
                 queries[src] = q
@@ -198,11 +251,18 @@ class ContextOrchestrator:
                 notes.append(f"{src} error: {err}")
             else:
                 structured_results[src] = rows or []
+                if getattr(rows, "truncated", False):
+                    notes.append(f"{src}: result cut at the connector's row budget ({len(rows)} rows)")
+                status = getattr(rows, "cache", None)
+                if status:
+                    cache_stats[src] = status
                 citations.append({"source": src, "query": q, "latency_ms": int(ms)})
 
-        # 4) Index active-source rows (passives already seeded)
+        # 4) Index active-source rows into a request-scoped scratch store
+        #    (passives already seeded into the long-lived corpus store)
+        scratch = None
         try:
-            self.indexer.index_results(
+            scratch = await self.indexer.index_results_async(
                 user_query,
                 structured_results,
                 schemas,
@@ -211,13 +271,19 @@ class ContextOrchestrator:
         except Exception as e:
             notes.append(f"index_results error: {type(e).__name__}: {e}")
 
-        # 5) Retrieve top-K contextual items (text + meta)
+        # 5) Retrieve candidates, then pack the best non-redundant ones into the token budget
         try:
-            items = self.indexer.retrieve_context_items(user_query, top_k=10)
+            items = await self.indexer.retrieve_context_items_async(
+                user_query, top_k=_CANDIDATES_TOP_K, scratch=scratch
+            )
         except Exception as e:
             notes.append(f"retrieve_context_items error: {type(e).__name__}: {e}")
             items = []
 
+        budget = int(profile.get("context_budget_tokens") or _DEFAULT_CONTEXT_BUDGET)
+        items = pack_context(items, budget_tokens=budget, max_items=_MAX_SNIPPETS)
+        context_tokens = sum(it.get("tokens", 0) for it in items)
+
         snippets = [it.get("text", "") for it in items]
         context_text = "\n".join(snippets)
 
@@ -263,6 +329,9 @@ class ContextOrchestrator:
             "queries": queries,
             "notes": notes,
             "elapsed_ms": elapsed_ms,
+            "context_tokens": context_tokens,
+            "context_budget_tokens": budget,
+            "cache": self._cache_summary(cache_stats),
         }
 
 
@@ -273,16 +342,14 @@ class ContextOrchestrator:
     # Utilities
     # ------------------------------------------------------------------
 
-    def _format_schema(self, schema: dict) -> str:
-        """
-        Converts connector schema to plain text for LLM prompts.
-        """
-        lines = []
-        for name, detail in schema.items():
-            if "fields" in detail:
-                fields = ", ".join(detail["fields"])
-                lines.append(f"{name}({fields})")
-            elif "params" in detail:
-                params = ", ".join(detail["params"])
-                lines.append(f"{name}?{params}")
-        return "\n".join(lines)
+    @staticmethod
+    def _cache_summary(by_source: dict) -> dict:
+        # "revalidated": a 304 let the cached body be reused
+        hits = sum(1 for v in by_source.values() if v in ("hit", "revalidated"))
+        total = len(by_source)
+        return {
+            "sources": by_source,
+            "hits": hits,
+            "misses": total - hits,
+            "hit_rate": round(hits / total, 3) if total else None,
+        }
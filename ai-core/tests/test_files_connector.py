@@ -0,0 +1,61 @@
+# tests/test_files_connector.py
+import os
+import time
+
+import pytest
+
+from connectors import files_connector
+from connectors.files_connector import CSV_DEFAULTS, _csv_groups, parse_files
+
+
+def _flaky_ingest(path: str, *args):
+    """Stand-in for _ingest_file, run in the spawned parse workers."""
+    name = os.path.basename(path)
+    if name.startswith("hang"):
+        time.sleep(60)
+    if name.startswith("slow"):
+        time.sleep(1)
+    if name.startswith("crash"):
+        os._exit(1)
+    return [("1", name)]
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    monkeypatch.setattr(files_connector, "_ingest_file", _flaky_ingest)
+
+
+def _parse(paths, **kw):
+    return dict(parse_files([f"/docs/{p}" for p in paths], **kw))
+
+
+# ---------------- Parse pool ----------------
+
+def test_stuck_worker_is_killed_and_others_finish(flaky):
+    t0 = time.monotonic()
+    out = _parse(["a.txt", "hang.pdf", "b.txt", "c.txt"], workers=2, timeout_s=3)
+    assert time.monotonic() - t0 < 30  # nowhere near the 60s the stuck parse would take
+    assert out == {
+        "/docs/a.txt": [("1", "a.txt")],
+        "/docs/hang.pdf": [],
+        "/docs/b.txt": [("1", "b.txt")],
+        "/docs/c.txt": [("1", "c.txt")],
+    }
+
+
+def test_crashing_worker_only_loses_its_own_file(flaky):
+    # slow.txt is still being parsed when the other worker dies
+    out = _parse(["slow.txt", "crash.pdf", "b.txt", "c.txt", "d.txt"], workers=2, timeout_s=30)
+    assert out["/docs/crash.pdf"] == []
+    assert all(out[f"/docs/{p}"] == [("1", p)] for p in ("slow.txt", "b.txt", "c.txt", "d.txt"))
+
+
+# ---------------- CSV ingestion ----------------
+
+def test_csv_group_means_skip_missing_values_across_chunks(tmp_path):
+    path = tmp_path / "t.csv"
+    path.write_text("k,a,b\nx,1,\nx,,4\ny,2,6\nx,3,\ny,,\ny,2,4\n")
+    out = _csv_groups(str(path), ["k", "a", "b"], {**CSV_DEFAULTS, "group_by": "k", "chunksize": 2})
+    assert out.loc["k=x", ["rows", "a_mean", "b_mean"]].tolist() == [3, 2.0, 4.0]
+    assert out.loc["k=y", ["rows", "a_mean", "b_mean"]].tolist() == [3, 2.0, 5.0]
+    assert (out.loc["k=y", "a_min"], out.loc["k=y", "b_max"]) == (2.0, 6.0)
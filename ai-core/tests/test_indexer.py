@@ -0,0 +1,352 @@
+# tests/test_indexer.py
+import asyncio
+import hashlib
+import os
+import time
+
+import numpy as np
+import pytest
+
+from connectors import file_manifest, files_connector
+from connectors.files_connector import FilesConnector
+from indexer import embeddings
+from indexer import indexer as indexer_module
+from indexer.batcher import EmbeddingBatcher
+from indexer.indexer import ContextIndexer
+from indexer.storage_faiss import FaissStore
+from orchestrator.context_packer import count_tokens, pack_context
+
+DIM = 32
+
+
+class FakeEmbedder:
+    """Deterministic unit vectors: equal texts embed equally, different texts ~orthogonally."""
+
+    is_loaded = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        self.calls += 1
+        out = []
+        for t in texts:
+            seed = int.from_bytes(hashlib.sha1(t.encode("utf-8")).digest()[:4], "big")
+            v = np.random.default_rng(seed).standard_normal(DIM).astype("float32")
+            out.append(v / np.linalg.norm(v))
+        return np.vstack(out) if out else np.zeros((0, DIM), dtype="float32")
+
+
+class FakeLLM:
+    def _call_ollama(self, system, prompt):
+        return "summary of the rows"
+
+
+@pytest.fixture
+def ix(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexer_module, "get_embedding_model", FakeEmbedder)
+    return ContextIndexer(FakeLLM(), dim=DIM, snapshot_dir=str(tmp_path / "store"), load_snapshot=False)
+
+
+# ---------------- Embedding micro-batcher ----------------
+
+def test_concurrent_embeds_share_one_encode():
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch=64, max_wait_ms=50)
+    requests = [["a", "b"], ["c"], "d", ["e", "f", "g"]]
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(r) for r in requests))
+
+    results = asyncio.run(run())
+    assert embedder.calls == 1
+    for r, vecs in zip(requests, results):
+        assert np.array_equal(vecs, FakeEmbedder().embed(r))
+    stats = batcher.stats()
+    assert (stats["requests"], stats["texts"], stats["batches"], stats["largest_batch"]) == (4, 7, 1, 7)
+
+
+def test_full_batch_is_flushed_without_waiting():
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch=2, max_wait_ms=200)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(t) for t in ("a", "b", "c")))
+
+    assert [len(v) for v in asyncio.run(run())] == [1, 1, 1]
+    assert (batcher.batches, batcher.largest_batch) == (2, 2)
+
+
+def test_encode_errors_reach_every_caller_in_the_batch():
+    class Broken(FakeEmbedder):
+        def embed(self, texts):
+            raise RuntimeError("model unavailable")
+
+    batcher = EmbeddingBatcher(Broken(), max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [RuntimeError, RuntimeError]
+    batcher.embedder = FakeEmbedder()
+    assert asyncio.run(batcher.embed("a")).shape == (1, DIM)  # the worker survives a failed batch
+
+
+# ---------------- Embedding model ----------------
+
+def test_default_cache_is_opened_on_first_embed(monkeypatch):
+    class DictCache:
+        def __init__(self):
+            self.data = {}
+
+        def get_many(self, ns, keys):
+            return {k: self.data[k] for k in keys if k in self.data}
+
+        def put_many(self, ns, vecs):
+            self.data.update(vecs)
+
+    opened = []
+
+    def default_cache():
+        opened.append(DictCache())
+        return opened[-1]
+
+    monkeypatch.setattr(embeddings, "get_default_cache", default_cache)
+    model = embeddings.EmbeddingModel()
+    monkeypatch.setattr(model, "_encode", FakeEmbedder().embed)
+    assert opened == []  # constructing a model never touches the cache
+
+    model.embed(["a", "b"])
+    model.embed("a")
+    assert len(opened) == 1 and set(opened[0].data) == {embeddings.text_key("a"), embeddings.text_key("b")}
+    assert embeddings.EmbeddingModel(cache=False).cache is None
+
+
+# ---------------- Active sources ----------------
+
+def test_index_results_dedups_rows(ix):
+    rows = [{"id": 1, "name": "Ada"}, {"id": 2, "name": "Bob"}, {"id": 1, "name": "Ada"}]
+    scratch = ix.index_results("who?", {"sql_connector": rows}, {"sql_connector": "users(id, name)"})
+    texts = list(scratch.docs)
+    assert len(texts) == len(set(texts)) == 3  # two distinct rows + the LLM summary
+    assert "[sql_connector] summary of the rows" in texts
+    assert len(ix.store) == 0  # active rows never reach the corpus store
+
+
+def test_doc_in_corpus_and_scratch_is_returned_once(ix):
+    text, meta = "[sql_connector] id=1 • name=Ada", {"source": "sql_connector", "type": "row"}
+    ix.store.add(ix.embedder.embed([text]), [text], [meta])
+    scratch = FaissStore(DIM, backend="flat")
+    scratch.add(ix.embedder.embed([text]), [text], [meta])
+
+    items = ix.retrieve_context_items(text, top_k=5, scratch=scratch, mode="vector")
+    assert [it["text"] for it in items] == [text]
+
+
+# ---------------- Hybrid retrieval ----------------
+
+def _item(did: int, score: float) -> dict:
+    return {"id": did, "text": f"doc {did}", "meta": {}, "score": score}
+
+
+def test_rrf_prefers_docs_ranked_by_both():
+    vec = [_item(1, 0.9), _item(2, 0.8), _item(3, 0.7)]
+    lex = [_item(4, 12.0), _item(2, 9.0), _item(5, 1.0)]
+    fused = ContextIndexer._fuse(vec, lex, top_k=3)
+    assert [it["id"] for it in fused] == [2, 1, 4]
+    assert fused[0]["vector_score"] == 0.8 and fused[0]["lexical_score"] == 9.0
+    assert fused[0]["score"] == pytest.approx(2 / 62)
+
+
+def test_rrf_with_one_empty_list():
+    vec = [_item(1, 0.9), _item(2, 0.8)]
+    assert ContextIndexer._fuse(vec, [], top_k=1) == vec[:1]
+    assert ContextIndexer._fuse([], vec, top_k=5) == vec
+
+
+def _seed(ix, texts):
+    metas = [{"source": "files_connector", "type": "files", "loc": i} for i in range(len(texts))]
+    ix.store.add(ix.embedder.embed(texts), texts, metas)
+
+
+def test_entity_query_takes_the_lexical_fast_path(ix):
+    _seed(ix, ["invoice INV-7781 paid by ACME", "invoice INV-1200 paid by Contoso", "general billing policy"])
+    calls = ix.embedder.calls
+    items = ix.retrieve_context_items("status of INV-7781", top_k=1)
+    assert items[0]["text"] == "invoice INV-7781 paid by ACME"
+    assert ix.embedder.calls == calls  # answered without embedding the query
+
+
+def test_hybrid_fuses_vector_and_lexical_hits(ix):
+    texts = ["refund policy for late orders", "shipping times by region", "late fees on invoices"]
+    _seed(ix, texts)
+    calls = ix.embedder.calls
+    # vector side: the exact text embeds identically; lexical side: "late" hits docs 0 and 2
+    items = ix.retrieve_context_items("refund policy for late orders", top_k=3, mode="hybrid")
+    assert ix.embedder.calls == calls + 1
+    assert items[0]["text"] == texts[0]
+    assert "vector_score" in items[0] and "lexical_score" in items[0]
+    lex = ix.retrieve_context_items("late", top_k=3, mode="lexical")
+    assert {it["text"] for it in lex} == {texts[0], texts[2]}
+
+
+# ---------------- Context packing ----------------
+
+def _snippet(text, score):
+    return {"text": text, "score": score}
+
+
+def test_pack_context_stays_within_budget():
+    items = [_snippet(f"snippet {i} " + "word " * (10 * (i + 1)), 1.0 - i / 10) for i in range(6)]
+    budget = count_tokens(items[0]["text"]) + count_tokens(items[1]["text"]) + 2
+    packed = pack_context(items, budget)
+    assert [it["text"] for it in packed] == [items[0]["text"], items[1]["text"]]
+    assert sum(it["tokens"] for it in packed) <= budget
+    assert len(pack_context(items, None, max_items=3)) == 3
+
+
+def test_pack_context_mmr_prefers_novel_snippets():
+    items = [
+        _snippet("alpha beta gamma delta", 1.0),
+        _snippet("alpha beta gamma delta", 0.99),      # exact duplicate: dropped
+        _snippet("alpha beta gamma epsilon", 0.95),    # relevant but redundant
+        _snippet("orders shipped last week", 0.9),     # slightly less relevant, new information
+        _snippet("unrelated filler", 0.0),
+    ]
+    packed = pack_context(items, None, max_items=3)
+    assert [it["text"] for it in packed] == [
+        "alpha beta gamma delta", "orders shipped last week", "alpha beta gamma epsilon",
+    ]
+
+
+def test_pack_context_trims_an_oversized_top_snippet():
+    text = "token " * 400
+    packed = pack_context([_snippet(text, 1.0)], 50)
+    assert len(packed) == 1
+    assert packed[0]["tokens"] <= 50 and text.startswith(packed[0]["text"])
+    assert "_rel" not in packed[0] and "_sh" not in packed[0]
+
+
+# ---------------- Incremental file sync ----------------
+
+def _files_conn(root):
+    return FilesConnector("files_connector", {"root_dir": str(root), "extensions": [".txt"], "text_cache_dir": ""})
+
+
+def _corpus(ix) -> dict:
+    """{file basename: [doc texts]} of the corpus store."""
+    out = {}
+    for i in range(len(ix.store)):
+        out.setdefault(os.path.basename(ix.store.metas[i]["file"]), []).append(ix.store.docs[i])
+    return out
+
+
+def _write(path, text, mtime_bump: int = 0):
+    path.write_text(text)
+    if mtime_bump:
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + mtime_bump))
+
+
+def test_sync_files_add_edit_delete(ix, tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    _write(root / "a.txt", "alpha contract terms")
+    _write(root / "b.txt", "beta onboarding guide")
+    conn = _files_conn(root)
+
+    stats = ix.sync_files("files_connector", conn, persist=False)
+    assert stats == {"changed_files": 2, "deleted_files": 0, "added_docs": 2, "removed_docs": 0}
+    assert sorted(_corpus(ix)) == ["a.txt", "b.txt"]
+
+    # nothing changed / touched without an edit: nothing is parsed or embedded
+    calls = ix.embedder.calls
+    assert ix.sync_files("files_connector", conn, persist=False)["changed_files"] == 0
+    _write(root / "a.txt", "alpha contract terms", mtime_bump=10**9)
+    assert ix.sync_files("files_connector", conn, persist=False)["changed_files"] == 0
+    assert ix.embedder.calls == calls
+
+    # edit: the stale chunk goes, the new one is searchable
+    _write(root / "a.txt", "alpha contract terms, amended", mtime_bump=2 * 10**9)
+    stats = ix.sync_files("files_connector", conn, persist=False)
+    assert stats == {"changed_files": 1, "deleted_files": 0, "added_docs": 1, "removed_docs": 1}
+    (a_doc,) = _corpus(ix)["a.txt"]
+    assert a_doc.endswith("alpha contract terms, amended")
+    assert ix.retrieve_context_items("amended", top_k=1, mode="lexical")[0]["text"] == a_doc
+
+    # delete
+    (root / "b.txt").unlink()
+    stats = ix.sync_files("files_connector", conn, persist=False)
+    assert stats == {"changed_files": 0, "deleted_files": 1, "added_docs": 0, "removed_docs": 1}
+    assert sorted(_corpus(ix)) == ["a.txt"]
+    assert ix.retrieve_context_items("onboarding", top_k=1, mode="lexical") == []
+
+
+def test_watch_files_restarts_a_stopped_watcher(ix, tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    _write(root / "a.txt", "alpha contract terms")
+    conn = _files_conn(root)
+
+    watcher = ix.watch_files("files_connector", conn, interval_s=0.1)
+    for _ in range(100):
+        if ix.source_etag("files_connector"):
+            break
+        time.sleep(0.05)
+    assert sorted(_corpus(ix)) == ["a.txt"]
+    assert ix.source_etag("files_connector") == conn.etag()
+    watcher.stop()
+    watcher.join(5)
+    assert not watcher.is_alive()
+
+    again = ix.watch_files("files_connector", conn, interval_s=0.1)
+    assert again is not watcher and again.is_alive()
+    ix.stop_watching()
+    again.join(5)
+    assert not again.is_alive()
+
+
+def test_sync_state_survives_a_snapshot(ix, tmp_path, monkeypatch):
+    root = tmp_path / "docs"
+    root.mkdir()
+    _write(root / "a.txt", "alpha contract terms")
+    conn = _files_conn(root)
+    ix.sync_files("files_connector", conn, persist=True, etag=conn.etag())
+
+    monkeypatch.setattr(indexer_module, "get_embedding_model", FakeEmbedder)
+    restarted = ContextIndexer(FakeLLM(), dim=DIM, snapshot_dir=ix.snapshot_dir)
+    assert restarted.is_seeded("files_connector")
+    assert restarted.source_etag("files_connector") == conn.etag()
+    stats = restarted.sync_files("files_connector", conn, persist=False)
+    assert stats["changed_files"] == stats["deleted_files"] == 0
+    assert restarted.embedder.calls == 0
+
+
+def test_text_cache_hits_reuse_the_manifest_hash(ix, tmp_path, monkeypatch):
+    # cache .txt extraction like PDF/DOCX, and count parses and hashes
+    monkeypatch.setattr(files_connector, "_extractor_id", lambda kind: "txt:test:v1" if kind == "txt" else None)
+    parsed, hashed = [], []
+    ingest_txt, file_hash = files_connector._ingest_txt, file_manifest.file_hash
+    monkeypatch.setattr(files_connector, "_ingest_txt", lambda p, *a: parsed.append(p) or ingest_txt(p, *a))
+    monkeypatch.setattr(file_manifest, "file_hash", lambda p: hashed.append(p) or file_hash(p))
+
+    root = tmp_path / "docs"
+    root.mkdir()
+    _write(root / "a.txt", "alpha contract terms")
+    conn = FilesConnector("files_connector", {"root_dir": str(root), "extensions": [".txt"],
+                                              "text_cache_dir": str(tmp_path / "text_cache")})
+
+    ix.sync_files("files_connector", conn, persist=False)
+    assert (len(parsed), len(hashed)) == (1, 1)  # the scan hashed it; extraction reused that hash
+
+    ix.forget_source("files_connector")
+    ix.sync_files("files_connector", conn, persist=False)
+    assert (len(parsed), len(hashed)) == (1, 2)  # re-indexed from the cache, not re-parsed
+    assert _corpus(ix)["a.txt"][0].endswith("alpha contract terms")
+
+    _write(root / "a.txt", "alpha contract terms, amended", mtime_bump=10**9)
+    ix.sync_files("files_connector", conn, persist=False)
+    assert (len(parsed), len(hashed)) == (2, 3)  # new content hash: a miss
+    assert _corpus(ix)["a.txt"][0].endswith("alpha contract terms, amended")
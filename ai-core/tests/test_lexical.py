@@ -0,0 +1,39 @@
+# tests/test_lexical.py
+from indexer.lexical import BM25Index, entity_terms, tokenize
+
+
+def test_tokenize_keeps_joined_forms_and_parts():
+    assert tokenize("Invoice INV-2024/07 for student_id SUB007") == [
+        "invoice", "inv-2024/07", "inv", "2024", "07", "for", "student_id", "student", "id", "sub007",
+    ]
+
+
+def test_entity_terms():
+    assert entity_terms('What did ACME pay on invoice 4411 for "blue widgets"?') == [
+        "blue", "widgets", "acme", "4411",
+    ]
+    assert entity_terms("how many students are enrolled") == []
+
+
+def test_bm25_ranks_exact_entity_first():
+    idx = BM25Index()
+    idx.add([1, 2, 3], [
+        "client Contoso paid invoice 1001",
+        "client ACME paid invoice 1002",
+        "client ACME opened a ticket about invoices",
+    ])
+    hits = idx.search("invoice 1002", top_k=3)
+    assert hits[0][0] == 2
+    assert {d for d, _ in idx.search("acme", top_k=3)} == {2, 3}
+    assert idx.search("nothing matches", top_k=3) == []
+
+
+def test_bm25_remove():
+    idx = BM25Index()
+    idx.add([1, 2], ["alpha beta", "beta gamma"])
+    idx.add([1], ["ignored: id already indexed"])
+    idx.remove([1])
+    assert 1 not in idx and len(idx) == 1
+    assert idx.search("alpha") == []
+    assert [d for d, _ in idx.search("beta")] == [2]
+    assert idx.contains_all(2, ["beta", "gamma"]) and not idx.contains_all(2, ["alpha"])
@@ -0,0 +1,64 @@
+# tests/test_orchestrator.py
+import asyncio
+import os
+import threading
+
+import pytest
+
+from connectors.files_connector import FilesConnector
+from indexer.indexer import ContextIndexer
+from orchestrator import orchestrator as orchestrator_module
+from orchestrator.orchestrator import ContextOrchestrator
+from tests.test_indexer import DIM, FakeLLM, ix  # noqa: F401  (ix is a fixture)
+
+
+class GatedFiles(FilesConnector):
+    """FilesConnector whose etag() blocks while `gate` is cleared."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def etag(self):
+        self.gate.wait(10)
+        return super().etag()
+
+
+@pytest.fixture
+def orch(ix, monkeypatch):
+    monkeypatch.setattr(orchestrator_module, "ContextIndexer", lambda builder: ix)
+    monkeypatch.setattr(orchestrator_module, "_PASSIVE_RECHECK_S", 0.0)
+    return ContextOrchestrator(FakeLLM(), {})
+
+
+def _files(ix) -> set:
+    return {os.path.basename(ix.store.metas[i]["file"]) for i in range(len(ix.store))}
+
+
+# ---------------- Passive sources ----------------
+
+def test_seeded_source_resyncs_in_the_background(orch, tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "a.txt").write_text("alpha contract terms")
+    conn = GatedFiles("files_connector", {"root_dir": str(root), "extensions": [".txt"], "text_cache_dir": ""})
+
+    async def run():
+        await orch._refresh_passive("files_connector", conn)  # first seed is awaited
+        assert _files(orch.indexer) == {"a.txt"} and not orch._passive_syncs
+
+        (root / "b.txt").write_text("beta onboarding guide")
+        conn.gate.clear()
+        for _ in range(3):  # answered from the current index, one re-sync in flight
+            await asyncio.wait_for(orch._refresh_passive("files_connector", conn), 1)
+        assert list(orch._passive_syncs) == ["files_connector"]
+        assert _files(orch.indexer) == {"a.txt"}
+
+        task = orch._passive_syncs["files_connector"]
+        conn.gate.set()
+        await task
+        await asyncio.sleep(0)  # done callback
+        assert _files(orch.indexer) == {"a.txt", "b.txt"} and not orch._passive_syncs
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+# tests/test_registry.py
+import time
+
+from connectors.registry import ConnectorRegistry, config_key
+
+
+class FakeConn:
+    def __init__(self, name):
+        self.name = name
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+def _factory(name):
+    return lambda: FakeConn(name)
+
+
+def test_config_key_ignores_key_order():
+    assert config_key("SQL", {"a": 1, "b": {"x": 1, "y": 2}}) == config_key("sql", {"b": {"y": 2, "x": 1}, "a": 1})
+    assert config_key("sql", {"a": 1}) != config_key("sql", {"a": 2})
+
+
+def test_same_spec_returns_the_cached_connector():
+    reg = ConnectorRegistry(max_entries=4, ttl_s=0)
+    a = reg.get_or_create("sql", {"url": "a"}, _factory("a"))
+    again = reg.get_or_create("sql", {"url": "a"}, _factory("other"))
+    assert again is a
+    assert reg.stats()["borrowed"] == 1
+    reg.release(a)
+    reg.release(again)
+    stats = reg.stats()
+    assert (stats["hits"], stats["misses"], stats["borrowed"], stats["size"]) == (1, 1, 0, 1)
+    assert a.closed == 0
+
+
+def test_evicted_connector_is_closed_after_its_last_release():
+    reg = ConnectorRegistry(max_entries=1, ttl_s=0)
+    a = reg.get_or_create("sql", {"url": "a"}, _factory("a"))
+    b = reg.get_or_create("sql", {"url": "b"}, _factory("b"))  # evicts a while a request still uses it
+    assert a.closed == 0 and reg.stats()["retired_in_use"] == 1
+
+    reg.release(a)
+    assert a.closed == 1 and reg.stats()["retired_in_use"] == 0
+    reg.release(a)  # stray release: ignored
+    assert a.closed == 1
+
+    # a connector that is not borrowed is closed right away
+    reg.release(b)
+    reg.get_or_create("sql", {"url": "c"}, _factory("c"))
+    assert b.closed == 1 and reg.stats()["evictions"] == 2
+
+
+def test_idle_entries_expire_but_borrowed_ones_stay():
+    reg = ConnectorRegistry(max_entries=4, ttl_s=0.05)
+    idle = reg.get_or_create("sql", {"url": "idle"}, _factory("idle"))
+    busy = reg.get_or_create("sql", {"url": "busy"}, _factory("busy"))
+    reg.release(idle)
+    time.sleep(0.1)
+
+    reg.get_or_create("sql", {"url": "new"}, _factory("new"))
+    assert idle.closed == 1 and busy.closed == 0
+    assert reg.get_or_create("sql", {"url": "busy"}, _factory("other")) is busy
+
+
+def test_close_all_closes_borrowed_and_retired():
+    reg = ConnectorRegistry(max_entries=1, ttl_s=0)
+    a = reg.get_or_create("sql", {"url": "a"}, _factory("a"))
+    b = reg.get_or_create("sql", {"url": "b"}, _factory("b"))
+    reg.close_all()
+    assert (a.closed, b.closed) == (1, 1)
+    assert reg.stats()["size"] == reg.stats()["borrowed"] == 0
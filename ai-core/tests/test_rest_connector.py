@@ -0,0 +1,207 @@
+# tests/test_rest_connector.py
+import asyncio
+import json
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from connectors.base import BaseConnector
+from connectors.rest_cache import RESTResponseCache, freshness, normalize_url
+from connectors.rest_connector import RESTConnector
+
+
+class _API(BaseHTTPRequestHandler):
+    """Tiny API whose responses carry whatever caching headers the test sets."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    routes = {}    # path -> {"body": ..., "headers": {...}} or {"redirect": location}
+    requests = []  # (path, If-None-Match) per request received
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        route = self.routes.get(path)
+        etag = self.headers.get("If-None-Match")
+        self.requests.append((path, etag))
+        if route is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if "redirect" in route:
+            self.send_response(302)
+            self.send_header("Location", route["redirect"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        headers = route.get("headers", {})
+        if etag is not None and etag == headers.get("ETag"):
+            self.send_response(304)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            return
+        body = json.dumps(route["body"]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    _API.routes, _API.requests = {}, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _API)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield _API, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def rest(api):
+    handler, base_url = api
+    conn = RESTConnector("rest_connector", {"base_url": base_url, "endpoints": {
+        "/customers": {"method": "GET", "params": ["region"]},
+        "/tickets": {"method": "GET", "params": ["client"], "cache_ttl_s": 60},
+    }})
+    conn.cache = RESTResponseCache()  # private instance, not the process-wide one
+    yield handler, conn
+    conn.close()
+
+
+# ---------------- Pooled clients ----------------
+
+def test_sync_and_async_follow_redirects(rest):
+    api, conn = rest
+    api.routes["/customers"] = {"body": [{"id": 1}]}
+    api.routes["/clients"] = {"redirect": "/customers"}
+
+    assert conn.execute("GET /clients") == [{"id": 1}]
+    assert asyncio.run(conn.execute_async("GET /clients?region=EU")) == [{"id": 1}]
+    assert [path for path, _ in api.requests] == ["/clients", "/customers", "/clients", "/customers"]
+
+
+def test_async_client_is_shared_within_a_loop_and_closed_on_it(rest):
+    api, conn = rest
+    api.routes["/customers"] = {"body": [{"id": 1}]}
+
+    async def run():
+        await asyncio.gather(*(conn.execute_async("GET /customers") for _ in range(5)))
+        client = conn._client
+        assert client is not None
+        await conn.execute_async("GET /customers")
+        assert conn._client is client
+        conn.close()  # on the client's own loop: aclose() runs as a tracked task
+        await asyncio.gather(*BaseConnector._closing)
+        assert client.is_closed
+
+    asyncio.run(run())
+    assert len(api.requests) == 6
+
+
+# ---------------- Freshness rules ----------------
+
+def _h(**headers):
+    return CaseInsensitiveDict({k.replace("_", "-"): v for k, v in headers.items()})
+
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Api.Example.com:80/customers?region=EU&name=a#top") == \
+        normalize_url("http://api.example.com/customers?name=a&region=EU")
+    assert normalize_url("https://api.example.com:8443") == "https://api.example.com:8443/"
+
+
+def test_freshness():
+    assert freshness(_h(cache_control="no-store")) is None
+    assert freshness(_h(cache_control="private, max-age=60")) is None
+    assert freshness(_h(cache_control="no-cache, max-age=60")) == 0.0
+    assert freshness(_h(cache_control="max-age=60", age="15")) == 45.0
+    assert freshness(_h(cache_control="max-age=60, s-maxage=10")) == 10.0
+    date = formatdate(1_700_000_000, usegmt=True)
+    assert freshness(_h(expires=formatdate(1_700_000_030, usegmt=True), date=date)) == 30.0
+    assert freshness(_h(expires="0")) == 0.0  # invalid Expires: already stale
+    assert freshness(_h(), default_ttl_s=5) == 5.0
+    assert freshness(_h()) == 0.0
+
+
+def test_put_skips_responses_with_nothing_to_reuse():
+    cache = RESTResponseCache()
+    assert cache.put("k", b"x", _h()) is None                              # stale, no validator
+    assert cache.put("k", b"x", _h(cache_control="no-store", etag='"1"')) is None
+    entry = cache.put("k", b"x", _h(etag='"1"'))                           # stale but revalidatable
+    assert entry is not None and not entry.fresh and entry.revalidatable
+    assert entry.conditional_headers() == {"If-None-Match": '"1"'}
+    assert cache.get("k").content() == b"x"
+
+
+# ---------------- Connector round trips ----------------
+
+def test_fresh_response_is_served_without_a_request(rest):
+    api, conn = rest
+    api.routes["/customers"] = {"body": [{"name": "ACME"}], "headers": {"Cache-Control": "max-age=60"}}
+    first = conn.execute("GET /customers?region=EU&x=1")
+    second = conn.execute("GET /customers?x=1&region=EU")
+    assert first == second == [{"name": "ACME"}]
+    assert (first.cache, second.cache) == ("miss", "hit")
+    assert len(api.requests) == 1
+
+
+def test_stale_entry_is_revalidated_with_304(rest):
+    api, conn = rest
+    api.routes["/customers"] = {"body": [{"name": "ACME"}], "headers": {"Cache-Control": "no-cache", "ETag": '"v1"'}}
+    assert conn.execute("GET /customers").cache == "miss"
+    again = conn.execute("GET /customers")
+    assert again == [{"name": "ACME"}] and again.cache == "revalidated"
+    assert api.requests == [("/customers", None), ("/customers", '"v1"')]
+
+    # the resource changed: a full 200 replaces the entry
+    api.routes["/customers"] = {"body": [{"name": "Contoso"}], "headers": {"Cache-Control": "no-cache", "ETag": '"v2"'}}
+    changed = conn.execute("GET /customers")
+    assert changed == [{"name": "Contoso"}] and changed.cache == "miss"
+    assert api.requests[-1] == ("/customers", '"v1"')
+
+    stats = conn.cache.stats()
+    assert (stats["hits"], stats["revalidated"], stats["misses"]) == (0, 1, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
+
+
+def test_304_renews_freshness(rest):
+    api, conn = rest
+    api.routes["/customers"] = {"body": [{"name": "ACME"}], "headers": {"Cache-Control": "max-age=0", "ETag": '"v1"'}}
+    conn.execute("GET /customers")
+    api.routes["/customers"]["headers"] = {"Cache-Control": "max-age=60", "ETag": '"v1"'}
+    assert conn.execute("GET /customers").cache == "revalidated"
+    assert conn.execute("GET /customers").cache == "hit"
+    assert len(api.requests) == 2
+
+
+def test_endpoint_ttl_applies_without_cache_headers(rest):
+    api, conn = rest
+    api.routes["/tickets"] = {"body": [{"id": 1}]}
+    api.routes["/customers"] = {"body": [{"id": 2}]}
+    assert [conn.execute("GET /tickets").cache for _ in range(2)] == ["miss", "hit"]
+    assert [conn.execute("GET /customers").cache for _ in range(2)] == ["miss", "miss"]
+
+
+def test_async_path_revalidates_too(rest):
+    api, conn = rest
+    api.routes["/customers"] = {"body": [{"name": "ACME"}], "headers": {"Cache-Control": "no-cache", "ETag": '"v1"'}}
+
+    async def run():
+        try:
+            return [(await conn.execute_async("GET /customers")).cache for _ in range(2)]
+        finally:
+            conn.close()  # the httpx client belongs to this loop
+
+    assert asyncio.run(run()) == ["miss", "revalidated"]
+    assert api.requests[-1] == ("/customers", '"v1"')
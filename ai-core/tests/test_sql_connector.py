@@ -0,0 +1,309 @@
+# tests/test_sql_connector.py
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from connectors.base import BaseConnector
+from connectors.results import ColumnarResult, RowList
+from connectors.sql_cache import DataVersion, SQLResultCache, normalize_sql
+from connectors.sql_connector import SQLConnector
+from connectors.schema_catalog import SchemaCatalog
+from connectors.sql_guard import QueryRejected, SQLGuard, add_limit, strip_comments
+
+
+def _make_db(path, n: int = 50):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer TEXT, amount REAL)")
+    con.executemany("INSERT INTO orders VALUES (?, ?, ?)", [(i, f"c{i % 5}", i * 1.5) for i in range(1, n + 1)])
+    con.commit()
+    con.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "shop.db")
+    _make_db(path)
+    return path
+
+
+@pytest.fixture
+def make_conn(db_path):
+    made = []
+
+    def make(**config):
+        conn = SQLConnector("sql_connector", {"connection_string": f"sqlite:///{db_path}", **config})
+        made.append(conn)
+        return conn
+
+    yield make
+    for conn in made:
+        conn.close()
+
+
+# ---------------- Row budget / columnar results ----------------
+
+def test_columnar_result_behaves_like_rows():
+    res = ColumnarResult.from_rows(["id", "name"], [(1, "a"), (2, "b"), (3, "c")], truncated=True)
+    assert len(res) == 3 and res.data == [[1, 2, 3], ["a", "b", "c"]]
+    assert res[1] == {"id": 2, "name": "b"}
+    assert list(res)[2] == {"id": 3, "name": "c"}
+    head = res[:2]
+    assert isinstance(head, ColumnarResult) and len(head) == 2 and head.truncated
+    rows = res.to_rows()
+    assert isinstance(rows, RowList) and rows.truncated and rows[0] == {"id": 1, "name": "a"}
+    assert res.to_dict()["truncated"] is True
+    assert not ColumnarResult.from_rows(["id"], [])
+
+
+def test_unbounded_select_stops_at_row_budget(make_conn):
+    conn = make_conn(max_rows=10, fetch_size=3, cache=False)
+    rows = conn.execute("SELECT * FROM orders")
+    assert isinstance(rows, RowList)
+    assert len(rows) == 10 and rows.truncated
+    assert rows[0] == {"id": 1, "customer": "c1", "amount": 1.5}
+
+
+def test_result_at_budget_is_not_truncated(make_conn):
+    conn = make_conn(max_rows=10, fetch_size=4, cache=False)
+    assert not conn.execute("SELECT id FROM orders WHERE id <= 10").truncated
+    assert conn.execute("SELECT id FROM orders WHERE id <= 11").truncated
+
+
+def test_columnar_format(make_conn):
+    conn = make_conn(max_rows=10, result_format="columnar", cache=False)
+    res = conn.execute("SELECT id, amount FROM orders ORDER BY id")
+    assert isinstance(res, ColumnarResult)
+    assert res.columns == ["id", "amount"] and res.data[0] == list(range(1, 11))
+    assert res.truncated
+    assert isinstance(conn.execute("SELECT id FROM orders", columnar=False), RowList)
+
+
+def test_execute_async_applies_the_budget(make_conn):
+    conn = make_conn(max_rows=7, cache=False)
+    rows = asyncio.run(conn.execute_async("SELECT * FROM orders"))
+    assert len(rows) == 7 and rows.truncated
+
+
+def test_only_select_is_allowed(make_conn):
+    conn = make_conn(cache=False)
+    with pytest.raises(ValueError):
+        conn.execute("DELETE FROM orders")
+
+
+# ---------------- Async engine ----------------
+
+def test_close_on_a_running_loop_disposes_in_a_tracked_task(make_conn):
+    conn = make_conn()
+
+    async def run():
+        assert len(await conn.execute_async("SELECT * FROM orders")) == 50
+        conn.close()
+        tasks = set(BaseConnector._closing)
+        assert tasks  # held until done, not a dropped fire-and-forget task
+        await asyncio.gather(*tasks)
+        await asyncio.sleep(0)  # done callbacks
+        assert not tasks & BaseConnector._closing
+
+    asyncio.run(run())
+
+
+def test_failed_async_close_is_reported(make_conn, capsys):
+    conn = make_conn()
+
+    async def broken_dispose():
+        raise RuntimeError("pool gone")
+
+    async def run():
+        conn._close_on_loop(asyncio.get_running_loop(), broken_dispose())
+        await asyncio.gather(*BaseConnector._closing, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert not BaseConnector._closing
+    assert "sql_connector: close failed: RuntimeError: pool gone" in capsys.readouterr().out
+
+
+# ---------------- Result cache ----------------
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("  SELECT *\n  FROM Orders WHERE customer = 'C1 ' ;") == \
+        "select * from orders where customer = 'C1 '"
+    assert SQLResultCache.key("db", "select 1", 10) == SQLResultCache.key("db", "SELECT   1;", 10)
+    assert SQLResultCache.key("db", "select 1", 10) != SQLResultCache.key("db", "select 1", 20)
+
+
+def test_cache_hit_needs_same_version_and_live_ttl():
+    cache = SQLResultCache(max_entries=2, ttl_s=60)
+    res = ColumnarResult.from_rows(["x"], [(1,)])
+    cache.put("k", ("v1",), res)
+    assert cache.get("k", ("v1",)) is res
+    assert cache.get("k", ("v2",)) is None  # data moved: entry dropped
+    assert cache.get("k", ("v1",)) is None
+    cache.put("k", ("v1",), res, ttl_s=0)
+    assert cache.get("k", ("v1",)) is None  # expired
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 3, 1)
+    assert stats["hit_rate"] == 0.25
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SQLResultCache(max_entries=2, ttl_s=60)
+    for k in ("a", "b"):
+        cache.put(k, None, ColumnarResult.from_rows(["x"], [(k,)]))
+    cache.get("a", None)
+    cache.put("c", None, ColumnarResult.from_rows(["x"], [("c",)]))
+    assert cache.get("b", None) is None
+    assert cache.get("a", None) is not None and cache.get("c", None) is not None
+
+
+def test_write_to_sqlite_invalidates_cached_results(make_conn, db_path):
+    conn = make_conn()
+    conn.cache = SQLResultCache()  # private instance, not the process-wide one
+    q = "SELECT count(*) AS n FROM orders"
+    first = conn.execute(q)
+    assert first.cache == "miss" and first[0]["n"] == 50
+    second = conn.execute("select COUNT(*) as n from orders;")
+    assert second.cache == "hit" and second[0]["n"] == 50
+
+    writer = sqlite3.connect(db_path)
+    writer.execute("INSERT INTO orders VALUES (51, 'c1', 1.0)")
+    writer.commit()
+    writer.close()
+
+    third = conn.execute(q)
+    assert third.cache == "miss" and third[0]["n"] == 51
+    assert conn.cache.invalidations == 1
+    assert conn.execute(q).cache == "hit"
+
+
+def test_version_queries_for_non_file_engines():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as c:
+        c.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY)"))
+        c.execute(text("INSERT INTO orders VALUES (1)"))
+    dv = DataVersion(engine, {"Orders": "SELECT max(id) FROM orders"})
+    before = dv.current("select * from orders")
+    assert before == (("orders", 1),)
+    assert dv.current("select * from customers") is None  # no probe: TTL only
+    with engine.begin() as c:
+        c.execute(text("INSERT INTO orders VALUES (2)"))
+    assert dv.current("select * from orders") != before
+
+
+# ---------------- Cost guard ----------------
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM orders", "SELECT * FROM orders LIMIT 100"),
+    ("SELECT * FROM orders;  ", "SELECT * FROM orders LIMIT 100"),
+    ("SELECT * FROM orders LIMIT 5", "SELECT * FROM orders LIMIT 5"),
+    ("SELECT * FROM orders limit 5000 OFFSET 10", "SELECT * FROM orders limit 100 OFFSET 10"),
+    # MySQL `LIMIT offset, count`: only the count is capped
+    ("SELECT * FROM orders LIMIT 5000, 10", "SELECT * FROM orders LIMIT 5000, 10"),
+    ("SELECT * FROM orders LIMIT 0, 100000", "SELECT * FROM orders LIMIT 0, 100"),
+    # a trailing comment would swallow an appended LIMIT
+    ("SELECT * FROM orders -- all of them", "SELECT * FROM orders LIMIT 100"),
+    ("SELECT * FROM orders /* big */ LIMIT 5000", "SELECT * FROM orders   LIMIT 100"),
+    ("SELECT * FROM orders LIMIT 5000 -- note", "SELECT * FROM orders LIMIT 100"),
+    # comment markers inside literals are data
+    ("SELECT '--x' AS a FROM orders", "SELECT '--x' AS a FROM orders LIMIT 100"),
+])
+def test_add_limit(sql, expected):
+    assert add_limit(sql, 100) == expected
+
+
+def test_strip_comments_keeps_quoted_text():
+    assert strip_comments("SELECT \"a--b\", '/*x*/' /* c */ FROM t -- d").split() == \
+        ["SELECT", '"a--b",', "'/*x*/'", "FROM", "t"]
+
+
+def test_cross_join_is_rejected_by_plan_estimate(make_conn):
+    conn = make_conn(cache=False, guard={"max_plan_rows": 1000})
+    with pytest.raises(QueryRejected):
+        conn.execute("SELECT * FROM orders a, orders b")  # 50 x 50 row visits
+    with pytest.raises(QueryRejected):
+        conn.execute("SELECT * FROM orders a CROSS JOIN orders b WHERE a.amount > 10")
+    # primary-key lookups are SEARCHes, not scans: allowed
+    assert len(conn.execute("SELECT * FROM orders a JOIN orders b ON b.id = a.id")) == 50
+
+
+def test_statement_timeout_interrupts_sqlite(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    guard = SQLGuard("sqlite", {"statement_timeout_s": 0.2})
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            with guard.statement_timeout(conn):
+                conn.execute(text("SELECT count(*) FROM orders a, orders b, orders c, orders d, orders e"))
+        # the handler is removed afterwards: later queries on the connection run normally
+        assert conn.execute(text("SELECT count(*) FROM orders")).scalar() == 50
+    engine.dispose()
+
+
+# ---------------- Schema catalog ----------------
+
+@pytest.fixture
+def engine(db_path):
+    con = sqlite3.connect(db_path)
+    con.execute("CREATE TABLE secrets (id INTEGER PRIMARY KEY, token TEXT)")
+    con.execute("CREATE VIEW big_orders AS SELECT * FROM orders WHERE amount > 30")
+    con.commit()
+    con.close()
+    engine = create_engine(f"sqlite:///{db_path}")
+    yield engine
+    engine.dispose()
+
+
+def _wait_for_refresh(catalog):
+    if catalog._refreshing is not None:
+        catalog._refreshing.join(5)
+
+
+def test_catalog_yaml_mode_keeps_listed_tables_and_fields(engine):
+    overrides = {"orders": {"description": "One row per order", "fields": ["id", "amount", "gone"]},
+                 "missing": {"description": "not in the database"}}
+    compiled = SchemaCatalog(engine, overrides).compiled()
+    assert compiled.tables == {"orders": {"description": "One row per order", "fields": ["id", "amount"]}}
+    assert compiled.text == "orders(id, amount)  -- One row per order"
+    assert compiled.kind == "sql"
+
+
+def test_catalog_all_mode_reflects_tables_and_views(engine):
+    catalog = SchemaCatalog(engine, {"orders": {"description": "One row per order"}}, mode="all", exclude=["Secrets"])
+    tables = catalog.compiled().tables
+    assert sorted(tables) == ["big_orders", "orders"]
+    assert tables["orders"] == {"description": "One row per order", "fields": ["id", "customer", "amount"]}
+
+
+def test_catalog_reflects_again_only_when_the_schema_version_moves(engine, db_path):
+    catalog = SchemaCatalog(engine, mode="all", recheck_s=0)
+    assert not catalog.ready
+    catalog.warm()
+    _wait_for_refresh(catalog)
+    assert catalog.ready and catalog.reflections == 1
+    first = catalog.compiled()
+    _wait_for_refresh(catalog)
+    assert catalog.reflections == 1  # version checked, nothing reflected
+
+    con = sqlite3.connect(db_path)
+    con.execute("ALTER TABLE orders ADD COLUMN status TEXT")
+    con.commit()
+    con.close()
+    assert catalog.compiled() is first  # served while the check runs in the background
+    _wait_for_refresh(catalog)
+    assert catalog.reflections == 2
+    assert catalog.compiled().tables["orders"]["fields"][-1] == "status"
+    assert catalog.compiled().hash != first.hash
+
+
+def test_catalog_invalidate_forces_a_reflection(engine):
+    catalog = SchemaCatalog(engine, mode="all", recheck_s=3600)
+    first = catalog.compiled()
+    assert catalog.compiled() is first and catalog.reflections == 1
+    catalog.invalidate()
+    catalog.compiled()
+    _wait_for_refresh(catalog)
+    assert catalog.reflections == 2
+    assert catalog.compiled().hash == first.hash
@@ -0,0 +1,206 @@
+# tests/test_storage_faiss.py
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from indexer.storage_faiss import FaissStore, doc_id, min_train_size
+
+DIM = 16
+
+
+def _vecs(n: int, seed: int = 0) -> np.ndarray:
+    x = np.random.default_rng(seed).standard_normal((n, DIM)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _docs(n: int, prefix: str = "doc"):
+    return [f"{prefix} {i}" for i in range(n)], [{"source": "t", "loc": i} for i in range(n)]
+
+
+def _store(tmp_path, backend: str = "flat", promote_at: int = 0) -> FaissStore:
+    return FaissStore(DIM, path=str(tmp_path / "store"), backend=backend, promote_at=promote_at, nprobe=64)
+
+
+def _top(store: FaissStore, vec: np.ndarray) -> str:
+    idx, _ = store.search(vec[None, :], 1)[0]
+    return store.docs[idx]
+
+
+# ---------------- ANN backends ----------------
+
+def test_flat_store_is_not_promoted(tmp_path):
+    store = _store(tmp_path, "flat")
+    texts, metas = _docs(100)
+    store.add(_vecs(100), texts, metas)
+    assert store.kind == "flat"
+
+
+def test_promotes_to_ivf_once_trainable(tmp_path):
+    store = _store(tmp_path, "ivf", promote_at=0)
+    n = min_train_size("ivf")
+    xb = _vecs(4 * n)
+    texts, metas = _docs(4 * n)
+    store.add(xb[: n - 1], texts[: n - 1], metas[: n - 1])
+    store.wait_for_promotion(10)
+    assert store.kind == "flat"  # too few vectors to train
+
+    store.add(xb[n - 1:], texts[n - 1:], metas[n - 1:])
+    store.wait_for_promotion(10)
+    assert store.kind == "ivf"
+    assert store.index.ntotal == len(store) == 4 * n
+    for i in (0, n, 3 * n):
+        assert _top(store, xb[i]) == texts[i]
+
+
+def test_hnsw_remove_rebuilds(tmp_path):
+    store = _store(tmp_path, "hnsw", promote_at=0)
+    xb = _vecs(50)
+    texts, metas = _docs(50)
+    store.add(xb, texts, metas)
+    store.wait_for_promotion(10)
+    assert store.kind == "hnsw"
+
+    assert store.remove([doc_id(texts[0], metas[0])]) == 1
+    assert len(store) == store.index.ntotal == 49
+    assert _top(store, xb[0]) != texts[0]
+    assert _top(store, xb[1]) == texts[1]
+
+
+# ---------------- Snapshots ----------------
+
+def test_snapshot_round_trip(tmp_path):
+    store = _store(tmp_path)
+    xb = _vecs(20)
+    texts, metas = _docs(20)
+    store.add(xb, texts, metas)
+    store.save(extra={"seeded_sources": ["t"]})
+
+    loaded = _store(tmp_path)
+    assert loaded.load()
+    assert list(loaded.docs) == texts
+    assert [m["loc"] for m in loaded.metas] == list(range(20))
+    assert loaded.ids == store.ids
+    assert loaded.snapshot_extra == {"seeded_sources": ["t"]}
+    assert _top(loaded, xb[7]) == texts[7]
+
+
+def test_load_without_snapshot(tmp_path):
+    assert not _store(tmp_path).load()
+
+
+def test_ivf_mmap_load_then_write(tmp_path):
+    n = 4 * min_train_size("ivf")
+    xb = _vecs(n + 10)
+    texts, metas = _docs(n + 10)
+    store = _store(tmp_path, "ivf")
+    store.add(xb[:n], texts[:n], metas[:n])
+    store.wait_for_promotion(10)
+    assert store.kind == "ivf"
+    store.save()
+
+    loaded = _store(tmp_path, "ivf")
+    assert loaded.load(mmap=True)
+    assert loaded.kind == "ivf"
+    # mmapped inverted lists are read-only: writes must go to an in-memory copy
+    loaded.add(xb[n:], texts[n:], metas[n:])
+    assert loaded.remove([doc_id(texts[0], metas[0])]) == 1
+    assert len(loaded) == loaded.index.ntotal == n + 9
+    assert _top(loaded, xb[n + 5]) == texts[n + 5]
+    assert _top(loaded, xb[1]) == texts[1]
+
+    loaded.save()
+    again = _store(tmp_path, "ivf")
+    assert again.load()
+    assert len(again) == n + 9
+    assert texts[0] not in list(again.docs)
+    assert _top(again, xb[n + 9]) == texts[n + 9]
+    # the on-disk records stay aligned with the vectors after the rewrite
+    for i in range(0, len(again), 17):
+        assert again.ids[i] == doc_id(again.docs[i], {"source": "t", "loc": again.metas[i]["loc"]})
+
+
+def test_saves_keep_the_snapshot_a_store_is_mapped_to(tmp_path):
+    n = 4 * min_train_size("ivf")
+    xb = _vecs(n + 1)
+    texts, metas = _docs(n + 1)
+    store = _store(tmp_path, "ivf")
+    store.add(xb[:n], texts[:n], metas[:n])
+    store.wait_for_promotion(10)
+    store.save()
+
+    loaded = _store(tmp_path, "ivf")
+    assert loaded.load(mmap=True)
+    for _ in range(3):
+        loaded.save()  # prunes older snapshots, but not the one loaded reads from
+    assert len([d for d in os.listdir(tmp_path / "store") if d.startswith("snap-")]) == 2
+    loaded.add(xb[n:], texts[n:], metas[n:])  # first write re-reads the mapped index
+    assert _top(loaded, xb[n]) == texts[n] and _top(loaded, xb[3]) == texts[3]
+
+    loaded.close()
+    with pytest.raises(ValueError):
+        loaded.docs[0]  # unmapped
+
+
+def test_save_during_removes_stays_aligned(tmp_path):
+    store = _store(tmp_path)
+    xb = _vecs(400)
+    texts, metas = _docs(400)
+    store.add(xb, texts, metas)
+    ids = list(store.ids)
+
+    def remove_some():
+        for i in range(0, 400, 8):
+            store.remove(ids[i:i + 4])
+
+    t = threading.Thread(target=remove_some)
+    t.start()
+    for _ in range(5):
+        store.save()
+    t.join()
+
+    loaded = _store(tmp_path)
+    assert loaded.load()
+    for i in range(len(loaded)):
+        assert loaded.ids[i] == doc_id(loaded.docs[i], {"source": "t", "loc": loaded.metas[i]["loc"]})
+    assert _top(loaded, xb[5]) == texts[5]
+
+
+# ---------------- Upsert / removal ----------------
+
+def test_add_is_an_upsert(tmp_path):
+    store = _store(tmp_path)
+    xb = _vecs(3)
+    texts, metas = _docs(3)
+    store.add(xb, texts, metas)
+    first_ts = store.metas[1]["ts"]
+
+    refreshed = [dict(m, note="again") for m in metas]
+    store.add(xb, texts, refreshed)
+    assert len(store) == store.index.ntotal == 3
+    assert store.metas[1]["note"] == "again"
+    assert store.metas[1]["ts"] >= first_ts
+
+    # duplicates inside one batch are stored once
+    store.add(np.vstack([xb[0], xb[0]]), ["new", "new"], [{"source": "t"}, {"source": "t"}])
+    assert len(store) == store.index.ntotal == 4
+
+
+def test_remove_where_and_group_ids(tmp_path):
+    store = _store(tmp_path)
+    xb = _vecs(6)
+    texts = [f"row {i}" for i in range(6)]
+    metas = [{"source": "a" if i < 4 else "b", "file": f"f{i % 2}"} for i in range(6)]
+    store.add(xb, texts, metas)
+
+    groups = store.group_ids("file", source="a")
+    assert sorted(groups) == ["f0", "f1"] and sum(len(v) for v in groups.values()) == 4
+
+    assert store.remove_where(source="a", file="f0") == 2
+    assert len(store) == store.index.ntotal == 4
+    assert {store.docs[i] for i in range(len(store))} == {"row 1", "row 3", "row 4", "row 5"}
+    assert _top(store, xb[5]) == "row 5"
+    assert store.remove_where(older_than=3600) == 0
+    assert store.remove_where(older_than=0) == 4
+    assert len(store) == 0
@@ -0,0 +1,43 @@
+# tests/test_tabular_connector.py
+import duckdb
+import pytest
+
+from connectors.tabular_connector import TabularConnector
+
+
+@pytest.fixture
+def tab(tmp_path):
+    root = tmp_path / "tables"
+    root.mkdir()
+    rows = [f"{dept},{i},{i * 10}" for i, dept in enumerate(["ops", "hr", "ops", "it", "ops", "hr"], start=1)]
+    (root / "Dues 2024.csv").write_text("dept,id,amount\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    (root / "notes.txt").write_text("not a table", encoding="utf-8")
+    return TabularConnector("tabular_connector", {"root_dir": str(root), "max_rows": 4})
+
+
+def test_files_become_tables(tab):
+    assert tab.schema() == {"dues_2024": {"description": "Rows of Dues 2024.csv",
+                                          "fields": ["dept", "id", "amount"]}}
+
+
+def test_query_aggregates_over_the_file(tab):
+    rows = tab.execute("SELECT dept, sum(amount) AS total FROM dues_2024 GROUP BY dept ORDER BY dept;")
+    assert rows == [{"dept": "hr", "total": 80}, {"dept": "it", "total": 40}, {"dept": "ops", "total": 90}]
+    capped = tab.execute("SELECT * FROM dues_2024")
+    assert len(capped) == 4 and capped.truncated  # max_rows
+    assert not tab.execute("SELECT * FROM dues_2024 LIMIT 4").truncated
+
+
+def test_only_select_is_allowed(tab):
+    with pytest.raises(ValueError):
+        tab.execute("DROP VIEW dues_2024")
+
+
+def test_files_outside_root_dir_are_not_readable(tab):
+    with pytest.raises(duckdb.Error):
+        tab.execute("SELECT * FROM read_csv('/etc/passwd')")
+    with pytest.raises(duckdb.Error):
+        tab.execute("SELECT * FROM read_text('/etc/hostname')")
+    # the sandbox can't be switched off from a query either
+    with pytest.raises(duckdb.Error):
+        tab.execute("SELECT * FROM (SELECT 1) t; SET enable_external_access = true")
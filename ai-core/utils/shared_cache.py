@@ -0,0 +1,49 @@
+# utils/shared_cache.py
+"""Process-wide cache instances and the stats() dict GET /metrics reports for them."""
+
+import threading
+from typing import Callable, Optional
+
+
+def hit_rate(served: int, lookups: int) -> float:
+    return round(served / lookups, 3) if lookups else 0.0
+
+
+class SharedCache:
+    """One lazily built instance per process; get() is None when disabled or the build failed."""
+
+    def __init__(self, name: str, factory: Callable[[], object], enabled: bool = True):
+        self.name = name
+        self.factory = factory
+        self.enabled = enabled
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[object]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._instance is None:
+                try:
+                    self._instance = self.factory()
+                except Exception as e:
+                    print(f"[{self.name}] disabled: {type(e).__name__}: {e}")
+                    return None
+            return self._instance
+
+
+class CacheStats:
+    """Mixin for caches that count lookups; subclasses report sizes/limits in _usage()."""
+
+    served_counters = ("hits",)              # lookups answered from the cache
+    lookup_counters = ("hits", "misses")     # every lookup lands in exactly one
+    extra_counters = ()                      # reported, not part of the hit rate
+
+    def _usage(self) -> dict:
+        return {}
+
+    def stats(self) -> dict:
+        counts = {c: getattr(self, c) for c in self.lookup_counters + self.extra_counters}
+        served = sum(counts[c] for c in self.served_counters)
+        lookups = sum(counts[c] for c in self.lookup_counters)
+        return {**self._usage(), **counts, "hit_rate": hit_rate(served, lookups)}